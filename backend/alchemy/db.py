@@ -5,10 +5,22 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
 
-from foodgram_fastapi.settings import DATABASE_URL
+from alchemy.slow_queries import install_slow_query_log
+from foodgram_fastapi.settings import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+)
 
 
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+install_slow_query_log(engine)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
@@ -1,17 +1,87 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable
 
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from alchemy.db import async_session_maker
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Генератор асингхронной сессии, при возникновении ошибок, транзакция роллбекается."""
+@event.listens_for(Session, "after_begin")
+def apply_statement_timeout(
+    session: Session,
+    transaction: SessionTransaction,
+    connection: Connection,
+) -> None:
+    """SET LOCAL действует до конца транзакции, поэтому ставится в начале каждой."""
+    statement_timeout = session.info.get("statement_timeout")
+    if statement_timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_timeout * 1000)}")
+
+
+@event.listens_for(Session, "after_commit")
+def run_on_commit(session: Session) -> None:
+    session.info.pop("on_rollback", None)
+    for callback in session.info.pop("on_commit", ()):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_on_commit(session: Session) -> None:
+    session.info.pop("on_commit", None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def run_on_rollback(
+    session: Session,
+    previous_transaction: SessionTransaction | None = None,
+) -> None:
+    # Откат SAVEPOINT внешнюю транзакцию не отменяет.
+    if previous_transaction is None or previous_transaction.parent is None:
+        for callback in session.info.pop("on_rollback", ()):
+            callback()
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Вызов после коммита текущей транзакции сессии, при откате отбрасывается.
+    Для кэшей процесса, которые нельзя обновлять данными незакоммиченной транзакции.
+    """
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+def on_rollback(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Вызов после отката текущей транзакции сессии, при коммите отбрасывается.
+    Для побочных эффектов вне БД, которые транзакция должна отменить (загруженные файлы).
+    """
+    session.info.setdefault("on_rollback", []).append(callback)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия запроса - единица работы (unit of work).
+
+    Репозитории не коммитят, только flush-ат при необходимости. После успешного обработчика
+    транзакция коммитится здесь ровно один раз, при ошибке - роллбекается. Выход из
+    зависимости выполняется до отправки ответа, поэтому ошибка коммита доходит до клиента.
+    Исключение - потоковый импорт (`RecipeExchangeRepository`), он коммитит по пачкам.
+    Если у маршрута есть бюджет (`RequestBudget`), запросы ограничены его statement_timeout.
+    """
     async with async_session_maker() as session:
+        budget = getattr(request.state, "budget", None)
+        if budget is not None:
+            session.info["statement_timeout"] = budget.statement_timeout
         try:
             yield session
+            if session.in_transaction():
+                await session.commit()
         except Exception:
             await session.rollback()
+            # Если транзакция не начиналась, откат проходит без событий.
+            run_on_rollback(session.sync_session)
             raise
         finally:
             await session.close()
@@ -0,0 +1,300 @@
+"""
+Журнал медленных SQL запросов движка `alchemy.db.engine`.
+
+Запрос дольше SLOW_QUERY_THRESHOLD пишется в лог `slow_queries` с отпечатком
+(нормализованный SQL без литералов и с свернутыми списками параметров), временем,
+маршрутом и замаскированными параметрами, и агрегируется по отпечатку в памяти
+процесса (`/admin/slow-queries/`). Для доли SLOW_QUERY_EXPLAIN_RATE SELECT запросов
+фоном снимается `EXPLAIN (ANALYZE, BUFFERS)` на отдельном соединении в read only
+транзакции, которая откатывается; одновременно выполняется не больше одного EXPLAIN.
+
+Запросы, завершившиеся ошибкой, тоже учитываются (событие `handle_error`): отмененные
+по statement_timeout или дедлайну помечаются `cancelled`, их план снимается без ANALYZE -
+повторное выполнение снова упрется в таймаут.
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import re
+from collections import Counter
+from contextvars import ContextVar
+from datetime import date, datetime
+from time import perf_counter, time
+from typing import Any
+
+import asyncpg
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    DATABASE_URL,
+    SLOW_QUERY_THRESHOLD,
+    SLOW_QUERY_EXPLAIN_RATE,
+    SLOW_QUERY_EXPLAIN_TIMEOUT,
+    SLOW_QUERY_MAX_FINGERPRINTS,
+)
+
+
+logger = logging.getLogger("slow_queries")
+
+# Маршрут (`GET /recipes/`) или фоновая задача, от имени которых идут запросы.
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+_PLACEHOLDER = re.compile(r"\$\d+(?:::\w+(?:\[\])*)?|%\(\w+\)s|(?<![:\w]):\w+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"\(\?\+?\)(?:\s*,\s*\(\?\+?\))+")
+_SPACE = re.compile(r"\s+")
+
+_EXPLAINABLE = ("select", "with")
+# query_canceled: statement_timeout или отмена запроса.
+_QUERY_CANCELED = "57014"
+
+
+def normalize(statement: str) -> str:
+    """SQL без значений: литералы и параметры - `?`, списки - `(?+)`, VALUES - одна строка."""
+    normalized = _PLACEHOLDER.sub("?", statement)
+    normalized = _STRING.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _LIST.sub("(?+)", normalized)
+    normalized = _ROWS.sub("(?+), ...", normalized)
+    return _SPACE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def redact(value: Any) -> Any:
+    """Числа, bool и None как есть (это id и лимиты), остальное - тип и размер."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return f"<{type(value).__name__}>"
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value[:10]] + (["..."] if len(value) > 10 else [])
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    try:
+        size = len(value)
+    except TypeError:
+        return f"<{type(value).__name__}>"
+    return f"<{type(value).__name__}:{size}>"
+
+
+class QueryStats:
+    """Агрегат по одному отпечатку."""
+
+    __slots__ = (
+        "fingerprint", "statement", "count", "total", "max", "last_seen",
+        "routes", "parameters", "plan", "plan_duration", "cancelled", "failed",
+    )
+
+    def __init__(self, fingerprint: str, statement: str) -> None:
+        self.fingerprint = fingerprint
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.routes: Counter[str] = Counter()
+        self.parameters: Any = None
+        self.plan: str | None = None
+        self.plan_duration: float | None = None
+        self.cancelled = 0
+        self.failed = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "statement": self.statement,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "last_seen": self.last_seen,
+            "routes": dict(self.routes.most_common(10)),
+            "last_parameters": self.parameters,
+            "plan": self.plan,
+            "plan_ms": None if self.plan_duration is None else round(self.plan_duration * 1000, 3),
+        }
+
+
+class SlowQueryLog:
+    """Медленные запросы процесса, сгруппированные по отпечатку."""
+
+    def __init__(self) -> None:
+        self.queries: dict[str, QueryStats] = {}
+        self.dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._explain_lock = asyncio.Lock()
+        self._explain_connection: asyncpg.Connection | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        metrics.gauge("slow_queries.fingerprints", lambda: float(len(self.queries)))
+
+    def record(
+        self,
+        statement: str,
+        parameters: Any,
+        duration: float,
+        executemany: bool,
+        outcome: str | None = None,
+    ) -> None:
+        """`outcome` - None для выполненного запроса, "cancelled" или "failed"."""
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        stats = self.queries.get(key)
+        if stats is None:
+            if len(self.queries) >= SLOW_QUERY_MAX_FINGERPRINTS:
+                # Вытесняется самый дешевый по суммарному времени.
+                cheapest = min(self.queries.values(), key=lambda item: item.total)
+                del self.queries[cheapest.fingerprint]
+            stats = self.queries[key] = QueryStats(key, normalized)
+        route = current_route.get()
+        stats.count += 1
+        stats.total += duration
+        stats.max = max(stats.max, duration)
+        stats.last_seen = time()
+        stats.routes[route] += 1
+        stats.parameters = redact(parameters)
+        if outcome == "cancelled":
+            stats.cancelled += 1
+        elif outcome == "failed":
+            stats.failed += 1
+        metrics.inc("slow_queries.count")
+        if outcome:
+            metrics.inc(f"slow_queries.{outcome}")
+        logger.warning(
+            "Медленный запрос %s %.1f мс %s%s: %s; параметры %s",
+            key, duration * 1000, route, f" ({outcome})" if outcome else "",
+            normalized, stats.parameters,
+        )
+        if (
+            not executemany
+            and normalized.lower().startswith(_EXPLAINABLE)
+            and random.random() < SLOW_QUERY_EXPLAIN_RATE
+            and not self._explain_lock.locked()
+        ):
+            self._schedule_explain(stats, statement, parameters, analyze=outcome is None)
+
+    def _schedule_explain(
+        self, stats: QueryStats, statement: str, parameters: Any, analyze: bool
+    ) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._explain(stats, statement, parameters, analyze))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(
+        self, stats: QueryStats, statement: str, parameters: Any, analyze: bool = True
+    ) -> None:
+        if self._explain_lock.locked():
+            return
+        async with self._explain_lock:
+            try:
+                connection = await self._connection()
+                started = perf_counter()
+                # EXPLAIN ANALYZE выполняет запрос, поэтому транзакция только читает и откатывается.
+                transaction = connection.transaction(readonly=True)
+                await transaction.start()
+                try:
+                    await connection.execute(
+                        f"SET LOCAL statement_timeout = {int(SLOW_QUERY_EXPLAIN_TIMEOUT * 1000)}"
+                    )
+                    options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+                    rows = await connection.fetch(
+                        f"EXPLAIN ({options}) {statement}",
+                        *(parameters or ()),
+                    )
+                finally:
+                    await transaction.rollback()
+            except asyncpg.PostgresError as error:
+                metrics.inc("slow_queries.explain_failed")
+                logger.warning("EXPLAIN запроса %s не снят: %s", stats.fingerprint, error)
+                return
+            except (OSError, asyncpg.InterfaceError, TimeoutError) as error:
+                metrics.inc("slow_queries.explain_failed")
+                logger.warning("EXPLAIN запроса %s: нет соединения: %r", stats.fingerprint, error)
+                await self._close()
+                return
+        stats.plan = "\n".join(row[0] for row in rows)
+        stats.plan_duration = perf_counter() - started
+        metrics.inc("slow_queries.explained")
+        logger.info("План запроса %s:\n%s", stats.fingerprint, stats.plan)
+
+    async def _connection(self) -> asyncpg.Connection:
+        if self._explain_connection is None or self._explain_connection.is_closed():
+            self._explain_connection = await asyncpg.connect(
+                self.dsn, timeout=SLOW_QUERY_EXPLAIN_TIMEOUT
+            )
+        return self._explain_connection
+
+    async def _close(self) -> None:
+        if self._explain_connection is not None:
+            self._explain_connection.terminate()
+            self._explain_connection = None
+
+    def snapshot(self, order: str = "total", limit: int = 50) -> list[dict[str, Any]]:
+        ranked = sorted(self.queries.values(), key=lambda item: getattr(item, order), reverse=True)
+        return [stats.to_dict() for stats in ranked[:limit]]
+
+    def clear(self) -> None:
+        self.queries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context.slow_query_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "slow_query_started", None)
+    if started is None:
+        return
+    duration = perf_counter() - started
+    if duration >= SLOW_QUERY_THRESHOLD:
+        slow_query_log.record(statement, parameters, duration, executemany)
+
+
+def _handle_error(exception_context: ExceptionContext) -> None:
+    """Запрос с ошибкой не доходит до after_cursor_execute, время берем здесь."""
+    context = exception_context.execution_context
+    started = getattr(context, "slow_query_started", None)
+    if started is None:
+        return
+    context.slow_query_started = None  # type: ignore
+    duration = perf_counter() - started
+    if duration < SLOW_QUERY_THRESHOLD:
+        return
+    error = exception_context.original_exception
+    cancelled = isinstance(error, asyncio.CancelledError) or (
+        getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    ) == _QUERY_CANCELED
+    slow_query_log.record(
+        exception_context.statement or "",
+        exception_context.parameters,
+        duration,
+        bool(getattr(context, "executemany", False)),
+        "cancelled" if cancelled else "failed",
+    )
+
+
+def install_slow_query_log(engine: AsyncEngine) -> None:
+    """Подключает журнал к движку. SLOW_QUERY_THRESHOLD <= 0 - журнал выключен."""
+    if SLOW_QUERY_THRESHOLD <= 0:
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
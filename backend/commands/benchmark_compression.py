@@ -0,0 +1,91 @@
+"""
+Замер сжатия ответов по эндпоинтам.
+
+Вызывает приложение в этом процессе (без сети) с Accept-Encoding identity / gzip / br
+и печатает для каждого эндпоинта размер тела, степень сжатия, среднее время ответа
+и время сжатия из метрик CompressionMiddleware. В колонке `ответ` - фактический
+Content-Encoding: ответы меньше порога и кодировки без кодека отдаются как есть.
+Нужна база с данными.
+
+Запуск из каталога backend:
+    python -m commands.benchmark_compression --repeat 50 /tags /ingredients "/recipes/?limit=100"
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from foodgram_fastapi.metrics import metrics
+from main import app
+
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+async def request(url: str, encoding: str) -> tuple[bytes, str]:
+    """Тело ответа и его Content-Encoding."""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "root_path": "/api",
+        "path": "/api" + path,
+        "raw_path": ("/api" + path).encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"localhost"), (b"accept-encoding", encoding.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    body = []
+    content_encoding = "identity"
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal content_encoding
+        if message["type"] == "http.response.start":
+            if message["status"] != 200:
+                raise RuntimeError(f"{url}: статус {message['status']}")
+            headers = dict(message.get("headers", []))
+            content_encoding = headers.get(b"content-encoding", b"identity").decode("latin-1")
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body), content_encoding
+
+
+async def benchmark_compression(urls: list[str], repeat: int) -> None:
+    print(f"{'эндпоинт':<32}{'кодировка':<10}{'ответ':<10}{'байт':>10}{'доля':>8}"
+          f"{'ответ, мс':>11}{'сжатие, мс':>12}")
+    for url in urls:
+        identity_size = 0
+        for encoding in ENCODINGS:
+            before = metrics.snapshot()["counters"]
+            started = perf_counter()
+            for _ in range(repeat):
+                body, content_encoding = await request(url, encoding)
+            elapsed = (perf_counter() - started) / repeat * 1000
+            compression = sum(
+                value - before.get(name, 0)
+                for name, value in metrics.snapshot()["counters"].items()
+                if name.startswith("compression.") and name.endswith(".seconds")
+            ) / repeat * 1000
+            identity_size = identity_size or len(body)
+            print(f"{url:<32}{encoding:<10}{content_encoding:<10}{len(body):>10}"
+                  f"{len(body) / identity_size:>8.2f}{elapsed:>11.2f}{compression:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("urls", nargs="*", default=["/tags", "/ingredients", "/recipes/"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(benchmark_compression(args.urls, args.repeat))
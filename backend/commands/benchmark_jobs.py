@@ -0,0 +1,50 @@
+"""
+Замер пропускной способности очереди задач.
+
+Ставит N пустых задач (noop) и выполняет их несколькими воркерами в этом процессе
+до опустошения очереди, печатает задач в секунду.
+
+Запуск из каталога backend:
+    python -m commands.benchmark_jobs --jobs 10000 --workers 4
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from alchemy.db import async_session_maker
+from jobs.registry import registry
+from jobs.worker import Worker
+from repositories.job_repositories import JobRepository
+
+
+async def benchmark_jobs(jobs: int, workers: int, batch_size: int = 5000) -> None:
+    started = perf_counter()
+    async with async_session_maker() as session:
+        job_repository = JobRepository(session)
+        for offset in range(0, jobs, batch_size):
+            await job_repository.enqueue_many(
+                "noop",
+                [{"n": n} for n in range(offset, min(jobs, offset + batch_size))],
+            )
+        await session.commit()
+    print(f"Поставлено {jobs} задач за {perf_counter() - started:.1f} с")
+
+    started = perf_counter()
+    await asyncio.gather(*(
+        Worker([registry["noop"]], name=f"benchmark-{number}").run(drain=True)
+        for number in range(workers)
+    ))
+    elapsed = perf_counter() - started
+    print(f"Выполнено за {elapsed:.1f} с, {jobs / elapsed:.0f} задач/с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(benchmark_jobs(args.jobs, args.workers))
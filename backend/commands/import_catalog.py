@@ -0,0 +1,144 @@
+"""
+Импорт справочника ингредиентов или тегов из CSV / JSON / NDJSON.
+
+Файл читается потоково, строки грузятся через COPY во временную таблицу
+и сливаются с основной по (name, measurement_unit) для ингредиентов
+и по name / slug для тегов. Память не зависит от размера файла.
+
+Запуск из каталога backend:
+    python -m commands.import_catalog ingredients data/ingredients.csv
+    python -m commands.import_catalog tags data/tags.json --batch-size 5000
+
+Форматы:
+    - .csv: `name,measurement_unit` (теги: `name,slug`), заголовок необязателен;
+    - .json: массив объектов с теми же ключами;
+    - .ndjson / .jsonl: объект на строку.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Iterator, TextIO
+
+from slugify import slugify
+
+from alchemy.db import async_session_maker
+from repositories.core_repositories import CatalogImportRepository
+
+
+COLUMNS = {
+    "ingredients": (("name", 128), ("measurement_unit", 64)),
+    "tags": (("name", 32), ("slug", 32)),
+}
+
+
+def iter_json_array(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Потоковый разбор JSON массива верхнего уровня, в памяти не больше пары чанков."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and (
+            buffer[position].isspace() or (started and buffer[position] == ",")
+        ):
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Ожидался JSON массив.")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # Элемент на границе чанка мог быть обрезан, принимаем его только с запасом.
+            if end is not None and (end < len(buffer) or eof):
+                yield item
+                position = end
+                continue
+        if eof:
+            raise ValueError("Некорректный JSON массив.")
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_records(path: Path, catalog: str) -> Iterator[tuple[str, ...]]:
+    keys = [key for key, _ in COLUMNS[catalog]]
+    with path.open(encoding="utf-8", newline="") as file:
+        if path.suffix == ".csv":
+            for row in csv.reader(file):
+                if row and [value.strip() for value in row[:len(keys)]] != keys:
+                    yield tuple(row[:len(keys)])
+        elif path.suffix == ".json":
+            for item in iter_json_array(file):
+                yield tuple(item.get(key, "") for key in keys)
+        elif path.suffix in (".ndjson", ".jsonl"):
+            for line in file:
+                if line.strip():
+                    item = json.loads(line)
+                    yield tuple(item.get(key, "") for key in keys)
+        else:
+            raise ValueError(f"Неизвестный формат файла: {path.suffix}")
+
+
+def clean_records(
+    records: Iterator[tuple[str, ...]],
+    catalog: str,
+    skipped: list[int],
+) -> Iterator[tuple[str, ...]]:
+    """Отбрасывает пустые и слишком длинные значения, для тегов без slug генерирует его."""
+    limits = [limit for _, limit in COLUMNS[catalog]]
+    for record in records:
+        values = [str(value or "").strip() for value in record]
+        values += [""] * (len(limits) - len(values))
+        if catalog == "tags":
+            values[1] = slugify(values[1] or values[0])[:limits[1]]
+        if all(values) and all(len(value) <= limit for value, limit in zip(values, limits)):
+            yield tuple(values)
+        else:
+            skipped[0] += 1
+
+
+async def import_catalog(catalog: str, path: Path, batch_size: int) -> None:
+    started = perf_counter()
+    skipped = [0]
+
+    def report(copied: int) -> None:
+        elapsed = perf_counter() - started
+        print(f"{copied} строк, {copied / elapsed:.0f} строк/с")
+
+    async with async_session_maker() as session:
+        copied, inserted = await CatalogImportRepository(session).import_rows(
+            catalog,
+            clean_records(iter_records(path, catalog), catalog, skipped),
+            batch_size=batch_size,
+            on_batch=report,
+        )
+    elapsed = perf_counter() - started
+    print(
+        f"Готово за {elapsed:.1f} с: прочитано {copied}, добавлено {inserted}, "
+        f"пропущено {skipped[0]}, {copied / elapsed:.0f} строк/с"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("catalog", choices=sorted(COLUMNS))
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(import_catalog(args.catalog, args.path, args.batch_size))
@@ -0,0 +1,71 @@
+"""
+Выгрузка и загрузка рецептов в NDJSON (рецепт на строку).
+
+Выгрузка идет серверным курсором, загрузка - пачками в отдельных транзакциях,
+память не зависит от количества рецептов. Автор рецепта ищется по email,
+теги по slug, недостающие ингредиенты создаются. Рецепты неизвестных авторов
+и невалидные строки пропускаются.
+
+Запуск из каталога backend:
+    python -m commands.recipes_ndjson export -o data/recipes.ndjson
+    python -m commands.recipes_ndjson export --with-images > recipes.ndjson
+    python -m commands.recipes_ndjson import data/recipes.ndjson --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import AsyncIterator
+
+from alchemy.db import async_session_maker
+from repositories.exchange_repositories import RecipeExchangeRepository
+
+
+async def read_lines(path: Path) -> AsyncIterator[str]:
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            yield line
+
+
+async def export_recipes(output: Path | None, with_images: bool) -> None:
+    file = output.open("wb") if output else sys.stdout.buffer
+    try:
+        async with async_session_maker() as session:
+            repository = RecipeExchangeRepository(session)
+            async for chunk in repository.export_ndjson(with_images):
+                file.write(chunk)
+    finally:
+        if output:
+            file.close()
+
+
+async def import_recipes(path: Path, batch_size: int) -> None:
+    started = perf_counter()
+    async with async_session_maker() as session:
+        imported, skipped = await RecipeExchangeRepository(session).import_ndjson(
+            read_lines(path),
+            batch_size=batch_size,
+        )
+    elapsed = perf_counter() - started
+    print(f"Готово за {elapsed:.1f} с: загружено {imported}, пропущено {skipped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("-o", "--output", type=Path)
+    export_parser.add_argument("--with-images", action="store_true")
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path", type=Path)
+    import_parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if args.action == "export":
+        asyncio.run(export_recipes(args.output, args.with_images))
+    else:
+        asyncio.run(import_recipes(args.path, args.batch_size))
@@ -0,0 +1,28 @@
+"""
+Пересчет денормализованных счетчиков рецептов и пользователей.
+
+Запуск из каталога backend:
+    python -m commands.repair_counters --batch-size 5000
+"""
+
+import argparse
+import asyncio
+
+from alchemy.db import async_session_maker
+from repositories.counter_repositories import CounterRepository
+
+
+async def repair_counters(batch_size: int) -> None:
+    async with async_session_maker() as session:
+        counter_repository = CounterRepository(session)
+        async for last_id, fixed in counter_repository.repair_recipes(batch_size):
+            print(f"recipes: до id={last_id}, исправлено {fixed}")
+        async for last_id, fixed in counter_repository.repair_users(batch_size):
+            print(f"users: до id={last_id}, исправлено {fixed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(repair_counters(args.batch_size))
@@ -0,0 +1,30 @@
+from collections import Counter
+from typing import Callable
+
+
+class Metrics:
+    """
+    Счетчики процесса (на воркер uvicorn).
+
+    Счетчики только растут, датчики (gauges) - функции, которые считываются при снимке.
+    Имена через точку: `<подсистема>.<класс>.<событие>`.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Counter[str] = Counter()
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        self._counters[name] += value
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        self._gauges[name] = read
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        return {
+            "counters": dict(sorted(self._counters.items())),
+            "gauges": {name: read() for name, read in sorted(self._gauges.items())},
+        }
+
+
+metrics = Metrics()
@@ -12,7 +12,120 @@ POSTGRES_USER = os.getenv("POSTGRES_USER", "FastAPI")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "FastAPI")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:5432/{POSTGRES_DB}"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+
+# Загрузка изображений multipart/form-data (файлы отдает nginx из MEDIA_ROOT по MEDIA_URL):
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/media")
+MEDIA_URL = os.getenv("MEDIA_URL", "/media/")
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 5 * 1024 * 1024))
+UPLOAD_FIELD_MAX_SIZE = int(os.getenv("UPLOAD_FIELD_MAX_SIZE", 64 * 1024))
+
+# Межворкерная инвалидация кэшей через LISTEN/NOTIFY, секунды:
+CHANGES_CHANNEL = os.getenv("CHANGES_CHANNEL", "entity_changes")
+CHANGES_KEEPALIVE = float(os.getenv("CHANGES_KEEPALIVE", 5))
+CHANGES_RECONNECT_DELAY = float(os.getenv("CHANGES_RECONNECT_DELAY", 1))
+# Запас на транзакции, начатые до обрыва и закоммиченные после (не меньше самой долгой записи):
+CHANGES_RESYNC_MARGIN = float(os.getenv("CHANGES_RESYNC_MARGIN", 60))
+# Больше пропущенных изменений - кэши сбрасываются целиком:
+CHANGES_RESYNC_LIMIT = int(os.getenv("CHANGES_RESYNC_LIMIT", 10000))
+
+# SSE о новых рецептах подписок (/recipes/events/), на воркер:
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 5000))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 32))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15))
+EVENTS_RETRY = float(os.getenv("EVENTS_RETRY", 5))
+
+# Admins (email через запятую):
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Проверка доставляемости email при регистрации (DNS, в пуле потоков):
+EMAIL_CHECK_DELIVERABILITY = os.getenv("EMAIL_CHECK_DELIVERABILITY", "").lower() in ("1", "true", "yes")
+EMAIL_DNS_TIMEOUT = float(os.getenv("EMAIL_DNS_TIMEOUT", 3))
+EMAIL_DOMAIN_CACHE_MAXSIZE = int(os.getenv("EMAIL_DOMAIN_CACHE_MAXSIZE", 10000))
+EMAIL_DOMAIN_CACHE_TTL = int(os.getenv("EMAIL_DOMAIN_CACHE_TTL", 3600))
 
 # CORS:
 ALLOW_ORIGINS = ["*"]  # TODO Fix me later
 ALLOWED_HOSTS = ["*"]  # TODO Fix me later
+
+# Caches:
+TAG_CACHE_MAXSIZE = int(os.getenv("TAG_CACHE_MAXSIZE", 4096))
+TAG_CACHE_TTL = int(os.getenv("TAG_CACHE_TTL", 300))
+RECIPE_CARD_CACHE_MAXSIZE = int(os.getenv("RECIPE_CARD_CACHE_MAXSIZE", 10000))
+AUTHOR_CARD_CACHE_MAXSIZE = int(os.getenv("AUTHOR_CARD_CACHE_MAXSIZE", 10000))
+# Карточки хранят изображение как есть (base64 строка - до мегабайт), поэтому объем
+# кэшей ограничен еще и в байтах.
+RECIPE_CARD_CACHE_MAXBYTES = int(os.getenv("RECIPE_CARD_CACHE_MAXBYTES", 64 * 1024 * 1024))
+AUTHOR_CARD_CACHE_MAXBYTES = int(os.getenv("AUTHOR_CARD_CACHE_MAXBYTES", 32 * 1024 * 1024))
+USER_RELATIONS_CACHE_MAXSIZE = int(os.getenv("USER_RELATIONS_CACHE_MAXSIZE", 10000))
+USER_RELATIONS_CACHE_TTL = int(os.getenv("USER_RELATIONS_CACHE_TTL", 60))
+# Пользователи с большим числом связей не кэшируются: 8 байт на id.
+USER_RELATIONS_MAX_ITEMS = int(os.getenv("USER_RELATIONS_MAX_ITEMS", 20000))
+
+# Admission control (на воркер, сумма лимитов не больше пула соединений):
+ADMISSION_AUTH_LIMIT = int(os.getenv("ADMISSION_AUTH_LIMIT", 4))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", 8))
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", 16))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+# Сжатие ответов: минимальный размер, пул потоков / быстрый уровень для больших тел, байты:
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_THREADPOOL_SIZE = int(os.getenv("COMPRESSION_THREADPOOL_SIZE", 64 * 1024))
+COMPRESSION_LARGE_SIZE = int(os.getenv("COMPRESSION_LARGE_SIZE", 1024 * 1024))
+# Уровни (обычный, большое тело, кэшируемый ответ - сжимается один раз):
+GZIP_LEVELS = tuple(int(level) for level in os.getenv("GZIP_LEVELS", "6,4,9").split(","))
+BROTLI_LEVELS = tuple(int(level) for level in os.getenv("BROTLI_LEVELS", "5,3,9").split(","))
+COMPRESSION_CACHE_MAXSIZE = int(os.getenv("COMPRESSION_CACHE_MAXSIZE", 256))
+# max-age публичных каталогов (теги, ингредиенты), секунды:
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 60))
+
+# Профилирование запросов по требованию (X-Profile: 1, только ADMIN_EMAILS):
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/foodgram-profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.001))
+PROFILE_MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", 100000))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", 50))
+# Сколько секунд помнить владельца токена из запроса с флагом профилирования.
+PROFILE_TOKEN_CACHE_TTL = int(os.getenv("PROFILE_TOKEN_CACHE_TTL", 60))
+
+# Журнал медленных запросов (секунды, 0 - выключен), доля запросов с EXPLAIN ANALYZE:
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", 0.2))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", 0.1))
+SLOW_QUERY_EXPLAIN_TIMEOUT = float(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT", 10))
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", 500))
+
+# Бюджеты времени маршрутов, секунды (дедлайн обработчика / statement_timeout):
+DEFAULT_DEADLINE = float(os.getenv("DEFAULT_DEADLINE", 10))
+DEFAULT_STATEMENT_TIMEOUT = float(os.getenv("DEFAULT_STATEMENT_TIMEOUT", 5))
+TOGGLE_DEADLINE = float(os.getenv("TOGGLE_DEADLINE", 2))
+TOGGLE_STATEMENT_TIMEOUT = float(os.getenv("TOGGLE_STATEMENT_TIMEOUT", 0.5))
+AUTH_DEADLINE = float(os.getenv("AUTH_DEADLINE", 5))
+AUTH_STATEMENT_TIMEOUT = float(os.getenv("AUTH_STATEMENT_TIMEOUT", 1))
+EXPORT_DEADLINE = float(os.getenv("EXPORT_DEADLINE", 600))
+EXPORT_STATEMENT_TIMEOUT = float(os.getenv("EXPORT_STATEMENT_TIMEOUT", 120))
+UPLOAD_DEADLINE = float(os.getenv("UPLOAD_DEADLINE", 60))
+UPLOAD_STATEMENT_TIMEOUT = float(os.getenv("UPLOAD_STATEMENT_TIMEOUT", 5))
+
+# Попытки входа по email: LOGIN_RATE_LIMIT в секунду, запас LOGIN_RATE_BURST:
+LOGIN_RATE_LIMIT = float(os.getenv("LOGIN_RATE_LIMIT", 0.2))
+LOGIN_RATE_BURST = int(os.getenv("LOGIN_RATE_BURST", 5))
+LOGIN_RATE_MAX_KEYS = int(os.getenv("LOGIN_RATE_MAX_KEYS", 100000))
+
+# Фоновые задачи (секунды):
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+# Задача running дольше своего timeout + JOB_LEASE_MARGIN возвращается в очередь:
+JOB_LEASE_MARGIN = float(os.getenv("JOB_LEASE_MARGIN", 60))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", 5))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", 3600))
+
+# Лента подписок:
+# До FEED_FANOUT_INLINE_MAX подписчиков лента пишется в транзакции создания рецепта,
+# больше - фоновой задачей, от FEED_CELEBRITY_FOLLOWERS не пишется, а читается.
+FEED_FANOUT_INLINE_MAX = int(os.getenv("FEED_FANOUT_INLINE_MAX", 1000))
+FEED_CELEBRITY_FOLLOWERS = int(os.getenv("FEED_CELEBRITY_FOLLOWERS", 100000))
+FEED_FANOUT_BATCH_SIZE = int(os.getenv("FEED_FANOUT_BATCH_SIZE", 5000))
+# Сколько последних рецептов автора попадает в ленту при подписке:
+FEED_FOLLOW_BACKFILL = int(os.getenv("FEED_FOLLOW_BACKFILL", 20))
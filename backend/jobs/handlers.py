@@ -0,0 +1,36 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from foodgram_fastapi.settings import FEED_FANOUT_BATCH_SIZE
+from jobs.registry import job
+from repositories.feed_repositories import FeedRepository
+from repositories.counter_repositories import CounterRepository
+
+
+@job("noop", concurrency=50, timeout=5)
+async def noop(db: AsyncSession, payload: dict[str, Any]) -> None:
+    """Пустая задача для замеров пропускной способности очереди."""
+
+
+@job("repair_counters", concurrency=1, timeout=3600, max_attempts=3)
+async def repair_counters(db: AsyncSession, payload: dict[str, Any]) -> None:
+    counter_repository = CounterRepository(db)
+    batch_size = int(payload.get("batch_size", 5000))
+    async for _ in counter_repository.repair_recipes(batch_size):
+        pass
+    async for _ in counter_repository.repair_users(batch_size):
+        pass
+
+
+@job("feed_fan_out", concurrency=4, timeout=600)
+async def feed_fan_out(db: AsyncSession, payload: dict[str, Any]) -> None:
+    """Рецепт в ленты подписчиков автора с большим числом подписчиков."""
+    feed_repository = FeedRepository(db)
+    batches = feed_repository.fan_out_batches(
+        payload["recipe_id"],
+        payload["author_id"],
+        FEED_FANOUT_BATCH_SIZE,
+    )
+    async for _ in batches:
+        pass
@@ -0,0 +1,26 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from jobs import handlers  # noqa: F401 регистрация обработчиков
+from jobs.registry import registry
+from repositories.job_repositories import JobRepository
+
+
+async def enqueue(
+    db: AsyncSession,
+    name: str,
+    payload: dict[str, Any] | None = None,
+    delay: float = 0,
+) -> int:
+    """
+    Ставит задачу в очередь в транзакции `db` (без коммита).
+    Воркеры увидят задачу после коммита вызывающего кода.
+    """
+    job_type = registry[name]
+    return await JobRepository(db).enqueue(
+        name,
+        payload,
+        delay=delay,
+        max_attempts=job_type.max_attempts,
+    )
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+Handler = Callable[[AsyncSession, dict[str, Any]], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    handler: Handler
+    # Одновременно выполняемых задач этого типа на воркер:
+    concurrency: int
+    # Секунды на одну попытку:
+    timeout: float
+    max_attempts: int
+
+
+registry: dict[str, JobType] = {}
+
+
+def job(
+    name: str,
+    concurrency: int = 1,
+    timeout: float = 60,
+    max_attempts: int = 5,
+) -> Callable[[Handler], Handler]:
+    """
+    Регистрирует обработчик задачи `name`.
+
+    Обработчик получает свою сессию и payload задачи. Удаление задачи коммитится
+    вместе с его работой, поэтому коммитить в конце обработчику не нужно.
+    """
+
+    def decorator(handler: Handler) -> Handler:
+        if name in registry:
+            raise ValueError(f"Задача {name} уже зарегистрирована")
+        registry[name] = JobType(name, handler, concurrency, timeout, max_attempts)
+        return handler
+
+    return decorator
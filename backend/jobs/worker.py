@@ -0,0 +1,170 @@
+"""
+Воркер фоновых задач.
+
+Забирает задачи из таблицы jobs через `FOR UPDATE SKIP LOCKED`, поэтому воркеров
+можно запускать сколько угодно. Упавшие задачи повторяются с экспоненциальной
+задержкой, задачи пропавших воркеров возвращаются в очередь по истечении аренды.
+
+Запуск из каталога backend:
+    python -m jobs.worker
+    python -m jobs.worker --types repair_counters
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import signal
+import socket
+from collections import Counter
+
+from alchemy.db import async_session_maker
+from alchemy.slow_queries import current_route
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    JOB_POLL_INTERVAL,
+    JOB_LEASE_MARGIN,
+    JOB_BACKOFF_BASE,
+    JOB_BACKOFF_MAX,
+)
+from jobs import handlers  # noqa: F401 регистрация обработчиков
+from jobs.registry import JobType, registry
+from models.job import Job
+from repositories.job_repositories import JobRepository
+
+
+logger = logging.getLogger("jobs.worker")
+
+
+class Worker:
+    """
+    Цикл воркера: пока у типа задач есть свободные слоты (`concurrency`),
+    забирает готовые задачи и выполняет их конкурентно; если забирать нечего,
+    ждет завершения задачи или `poll_interval` секунд.
+    """
+
+    def __init__(
+        self,
+        types: list[JobType],
+        name: str | None = None,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ) -> None:
+        self.types = types
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.running: Counter[str] = Counter()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+
+    async def run(self, drain: bool = False) -> None:
+        """Работает до `stop()`; с `drain=True` - пока в очереди есть готовые задачи."""
+        loop = asyncio.get_running_loop()
+        next_reclaim = 0.0
+        while not self._stopping.is_set():
+            if loop.time() >= next_reclaim:
+                await self._reclaim_stale()
+                next_reclaim = loop.time() + JOB_LEASE_MARGIN
+            claimed = await self._claim()
+            if claimed:
+                continue
+            if drain and not self._tasks:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _claim(self) -> int:
+        claimed = 0
+        for job_type in self.types:
+            free = job_type.concurrency - self.running[job_type.name]
+            if free <= 0:
+                continue
+            async with async_session_maker() as session:
+                jobs = await JobRepository(session).claim(job_type.name, free, self.name)
+            for job in jobs:
+                self.running[job_type.name] += 1
+                task = asyncio.create_task(self._execute(job_type, job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            claimed += len(jobs)
+        return claimed
+
+    async def _execute(self, job_type: JobType, job: Job) -> None:
+        current_route.set(f"job {job_type.name}")
+        try:
+            async with async_session_maker() as session:
+                session.info["statement_timeout"] = job_type.timeout
+                job_repository = JobRepository(session)
+                try:
+                    async with asyncio.timeout(job_type.timeout):
+                        await job_type.handler(session, job.payload)
+                    await job_repository.complete(job.id)
+                    await session.commit()
+                except Exception as error:
+                    await session.rollback()
+                    backoff = self._backoff(job.attempts)
+                    await job_repository.fail(job, repr(error)[:1000], backoff)
+                    metrics.inc(f"jobs.{job_type.name}.failed")
+                    logger.warning(
+                        "Задача %s #%s, попытка %s/%s: %r, повтор через %.0f с",
+                        job_type.name, job.id, job.attempts, job.max_attempts, error, backoff,
+                    )
+                else:
+                    metrics.inc(f"jobs.{job_type.name}.completed")
+        except Exception:
+            # Задача останется running и вернется в очередь по аренде.
+            logger.exception("Не удалось записать результат задачи %s #%s", job_type.name, job.id)
+        finally:
+            self.running[job_type.name] -= 1
+            self._wakeup.set()
+
+    async def _reclaim_stale(self) -> None:
+        async with async_session_maker() as session:
+            job_repository = JobRepository(session)
+            for job_type in self.types:
+                reclaimed = await job_repository.reclaim_stale(
+                    job_type.name,
+                    lease=job_type.timeout + JOB_LEASE_MARGIN,
+                )
+                if reclaimed:
+                    logger.warning("Возвращено в очередь %s задач %s", reclaimed, job_type.name)
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        """Экспоненциальная задержка со случайным разбросом, чтобы повторы не шли пачкой."""
+        delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1)
+
+
+async def main(type_names: list[str] | None) -> None:
+    types = [registry[name] for name in type_names] if type_names else list(registry.values())
+    worker = Worker(types)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    logger.info("Воркер %s: %s", worker.name, ", ".join(job_type.name for job_type in types))
+    await worker.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--types", type=lambda value: value.split(","), default=None)
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.run(main(args.types))
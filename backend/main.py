@@ -1,8 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from fastapi_pagination import add_pagination
 
+from foodgram_fastapi.settings import (
+    ADMISSION_AUTH_LIMIT,
+    ADMISSION_WRITE_LIMIT,
+    ADMISSION_READ_LIMIT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RETRY_AFTER,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_THREADPOOL_SIZE,
+    COMPRESSION_LARGE_SIZE,
+    GZIP_LEVELS,
+    BROTLI_LEVELS,
+    COMPRESSION_CACHE_MAXSIZE,
+)
+from middlewares.admission import AdmissionMiddleware
+from middlewares.compression import CompressionMiddleware
+from middlewares.profiling import ProfilingMiddleware
+from repositories.services.changes import change_listener
+from routers.services.events import recipe_events
+
 from routers import (
+    admin,
     auth,
     core,
     user,
@@ -10,14 +33,51 @@ from routers import (
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    change_listener.start()
+    recipe_events.start()
+    yield
+    await recipe_events.stop()
+    await change_listener.stop()
+
+
 app = FastAPI(
-    root_path="/api"
+    root_path="/api",
+    lifespan=lifespan,
 )
 
 add_pagination(app)
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    threadpool_size=COMPRESSION_THREADPOOL_SIZE,
+    large_size=COMPRESSION_LARGE_SIZE,
+    gzip_levels=GZIP_LEVELS,
+    brotli_levels=BROTLI_LEVELS,
+    cache_maxsize=COMPRESSION_CACHE_MAXSIZE,
+)
+# Снаружи сжатия: время сжатия ответа попадает в профиль.
+app.add_middleware(ProfilingMiddleware)
+# Добавлен последним - внешний, перегрузка отсекается до сжатия:
+app.add_middleware(
+    AdmissionMiddleware,
+    limits={
+        "auth": ADMISSION_AUTH_LIMIT,
+        "write": ADMISSION_WRITE_LIMIT,
+        "read": ADMISSION_READ_LIMIT,
+    },
+    queue_size=ADMISSION_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    retry_after=ADMISSION_RETRY_AFTER,
+    # Поток SSE живет часами, слот допуска занимал бы его все это время.
+    exempt_paths=("/admin/metrics/", "/recipes/events/", "/docs", "/redoc", "/openapi.json"),
+)
+
 
 app.include_router(auth.router)
 app.include_router(user.router)
 app.include_router(core.router)
 app.include_router(recipe.router)
+app.include_router(admin.router)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, Awaitable, Callable, MutableMapping
+
+from foodgram_fastapi.metrics import metrics
+
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class Gate:
+    """
+    Ограничение конкурентности для класса маршрутов.
+
+    Не больше `limit` запросов выполняются одновременно, до `queue_size` ждут
+    освобождения места не дольше `timeout` секунд, остальные отклоняются сразу.
+    Освободившееся место передается первому в очереди (FIFO).
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        metrics.gauge(f"admission.{name}.active", lambda: self.active)
+        metrics.gauge(f"admission.{name}.queued", lambda: len(self._waiters))
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            metrics.inc(f"admission.{self.name}.admitted")
+            return True
+        if len(self._waiters) >= self.queue_size:
+            metrics.inc(f"admission.{self.name}.rejected_queue_full")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.inc(f"admission.{self.name}.queued")
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            # Место могло быть передано в момент срабатывания таймаута.
+            if not (waiter.done() and not waiter.cancelled()):
+                metrics.inc(f"admission.{self.name}.rejected_timeout")
+                return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        metrics.inc(f"admission.{self.name}.admitted")
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    """
+    Контроль допуска запросов перед роутерами.
+
+    Запросы делятся на классы auth (`/auth/...`), read (GET/HEAD/OPTIONS) и write (остальные),
+    у каждого свой `Gate`. Пока пул соединений занят, лишние запросы ждут в ограниченной
+    очереди, а не у пула; при переполнении очереди или истечении ожидания сразу
+    отдается 503 с `Retry-After`, и сервис продолжает обслуживать запросы в пределах емкости.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: dict[str, int],
+        queue_size: int,
+        queue_timeout: float,
+        retry_after: int = 1,
+        exempt_paths: tuple[str, ...] = (),
+    ) -> None:
+        self.app = app
+        self.gates = {
+            name: Gate(name, limit, queue_size, queue_timeout)
+            for name, limit in limits.items()
+        }
+        self.retry_after = retry_after
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = self._route_path(scope)
+        if path.startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.gates[self._route_class(scope["method"], path)]
+        if not await gate.acquire():
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    @staticmethod
+    def _route_path(scope: Scope) -> str:
+        path: str = scope["path"]
+        root_path: str = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
+
+    @staticmethod
+    def _route_class(method: str, path: str) -> str:
+        if path.startswith("/auth/"):
+            return "auth"
+        if method in READ_METHODS:
+            return "read"
+        return "write"
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps(
+            {"detail": "Сервис перегружен, повторите запрос позже"},
+            ensure_ascii=False,
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
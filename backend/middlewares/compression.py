@@ -0,0 +1,258 @@
+import gzip
+import hashlib
+import zlib
+from time import perf_counter
+from typing import Any, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from foodgram_fastapi.metrics import metrics
+from middlewares.admission import ASGIApp, Message, Receive, Scope, Send
+from repositories.services.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli в зависимостях проекта, без него остается только gzip
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+# Поток событий должен уходить сразу, буферизация компрессором его ломает.
+NOT_COMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+class Codec:
+    """Кодек с уровнями для обычных, больших и кэшируемых ответов."""
+
+    def __init__(
+        self,
+        name: str,
+        compress: Callable[[bytes, int], bytes],
+        stream: Callable[[int], Any],
+        level: int,
+        large_level: int,
+        cache_level: int,
+    ) -> None:
+        self.name = name
+        self.compress = compress
+        self.stream = stream
+        self.level = level
+        self.large_level = large_level
+        self.cache_level = cache_level
+
+
+def _gzip_stream(level: int):
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _brotli_compress(body: bytes, quality: int) -> bytes:
+    return brotli.compress(body, quality=quality)
+
+
+def _brotli_stream(quality: int):
+    return brotli.Compressor(quality=quality)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip / brotli по Accept-Encoding.
+
+    - ответы меньше `minimum_size` и несжимаемые типы отдаются как есть;
+    - тела от `threadpool_size` сжимаются в пуле потоков, от `large_size` - более быстрым уровнем;
+    - ответы с `Cache-Control: public` кэшируются сжатыми по хэшу тела (content-addressed),
+      повторная отдача того же каталога тегов/ингредиентов не сжимается заново;
+    - потоковые ответы (несколько чанков) сжимаются на лету, event-stream не трогается;
+    - по маршрутам считаются байты до/после и время сжатия (`/admin/metrics/`).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        threadpool_size: int,
+        large_size: int,
+        gzip_levels: tuple[int, int, int],
+        brotli_levels: tuple[int, int, int],
+        cache_maxsize: int,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.threadpool_size = threadpool_size
+        self.large_size = large_size
+        self.codecs = {"gzip": Codec("gzip", gzip.compress, _gzip_stream, *gzip_levels)}
+        if brotli is not None:
+            self.codecs["br"] = Codec("br", _brotli_compress, _brotli_stream, *brotli_levels)
+        self.cache = LRUCache(cache_maxsize)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = self._negotiate(scope)
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, codec, scope, send)
+        await self.app(scope, receive, responder.send)
+
+    def _negotiate(self, scope: Scope) -> Codec | None:
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1").lower()
+                break
+        accepted = {}
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip()] = quality
+        candidates = [
+            (accepted.get(name, accepted.get("*", 0.0)), name == "br", codec)
+            for name, codec in self.codecs.items()
+        ]
+        quality, _, codec = max(candidates, key=lambda candidate: candidate[:2])
+        return codec if quality > 0 else None
+
+    async def compress(self, codec: Codec, body: bytes, cacheable: bool, metric: str) -> bytes:
+        if cacheable:
+            key = (codec.name, hashlib.sha256(body).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.inc(f"{metric}.cache_hits")
+                return cached
+            level = codec.cache_level
+        elif len(body) >= self.large_size:
+            level = codec.large_level
+        else:
+            level = codec.level
+
+        started = perf_counter()
+        if len(body) >= self.threadpool_size:
+            compressed = await run_in_threadpool(codec.compress, body, level)
+        else:
+            compressed = codec.compress(body, level)
+        metrics.inc(f"{metric}.seconds", perf_counter() - started)
+        if cacheable:
+            self.cache.set(key, compressed)
+        return compressed
+
+
+class _CompressionResponder:
+    """Перехватывает сообщения ответа одного запроса."""
+
+    def __init__(self, middleware: CompressionMiddleware, codec: Codec, scope: Scope, send: Send):
+        self.middleware = middleware
+        self.codec = codec
+        self.scope = scope
+        self._send = send
+        self.start: Message | None = None
+        self.stream: Any = None
+        self.passthrough = False
+
+    def _metric(self) -> str:
+        route = self.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        return f"compression.{self.scope['method']} {path}"
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._compressible(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        metric = self._metric()
+        if self.stream is None and not more_body:
+            await self._send_whole(body, metric)
+            return
+        if self.stream is None:
+            self.stream = self.codec.stream(self.codec.level)
+            await self._send(self._start_message(content_length=None))
+        metrics.inc(f"{metric}.bytes_in", len(body))
+        started = perf_counter()
+        chunk = self.stream.compress(body) if body else b""
+        if more_body:
+            # Чанк уходит клиенту сразу, а не копится в компрессоре.
+            chunk += self.stream.flush(zlib.Z_SYNC_FLUSH) if self.codec.name == "gzip" else (
+                self.stream.flush()
+            )
+        else:
+            chunk += self.stream.flush() if self.codec.name == "gzip" else self.stream.finish()
+        metrics.inc(f"{metric}.seconds", perf_counter() - started)
+        metrics.inc(f"{metric}.bytes_out", len(chunk))
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_whole(self, body: bytes, metric: str) -> None:
+        if len(body) < self.middleware.minimum_size:
+            headers = self._with_vary(list(self.start.get("headers", [])))  # type: ignore
+            await self._send({**self.start, "headers": headers})  # type: ignore
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        cacheable = b"public" in self._header(b"cache-control")
+        compressed = await self.middleware.compress(self.codec, body, cacheable, metric)
+        metrics.inc(f"{metric}.bytes_in", len(body))
+        metrics.inc(f"{metric}.bytes_out", len(compressed))
+        await self._send(self._start_message(content_length=len(compressed)))
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    def _compressible(self, message: Message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        headers = dict(message.get("headers", []))
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        if content_type.startswith(NOT_COMPRESSIBLE_TYPES):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _header(self, name: bytes) -> bytes:
+        for key, value in self.start.get("headers", []):  # type: ignore
+            if key == name:
+                return value.lower()
+        return b""
+
+    def _with_vary(self, headers: list[tuple[bytes, bytes]]) -> list[tuple[bytes, bytes]]:
+        """Ответ сжимаемого типа зависит от Accept-Encoding, даже если ушел несжатым."""
+        vary = self._header(b"vary")
+        if vary == b"*" or b"accept-encoding" in vary:
+            return headers
+        headers = [(key, value) for key, value in headers if key != b"vary"]
+        headers.append((b"vary", vary + b", accept-encoding" if vary else b"accept-encoding"))
+        return headers
+
+    def _start_message(self, content_length: int | None) -> Message:
+        headers = self._with_vary([
+            (key, value)
+            for key, value in self.start.get("headers", [])  # type: ignore
+            if key != b"content-length"
+        ])
+        headers.append((b"content-encoding", self.codec.name.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        # Слабый ETag остается валидным для сжатого представления, сильный - нет.
+        headers = [
+            (key, value) if key != b"etag" or value.startswith(b"W/") else (key, b"W/" + value)
+            for key, value in headers
+        ]
+        return {**self.start, "headers": headers}  # type: ignore
@@ -0,0 +1,344 @@
+"""
+Профилирование отдельного запроса по требованию.
+
+Запрос с заголовком `X-Profile: 1` или параметром `?profile=1` от администратора
+(ADMIN_EMAILS) выполняется под сэмплирующим профайлером: отдельный поток раз в
+PROFILE_INTERVAL снимает стек задачи запроса. Пока задача выполняется в event loop,
+берется стек потока (`[cpu]`), пока ждет - цепочка корутин до awaitable (`[await]`).
+К стекам прикладывается время каждого SQL запроса (события курсора движка).
+
+Профиль пишется JSON файлом в PROFILE_DIR (общий для воркеров), его id приходит
+в заголовке ответа `X-Profile-Id`; читается через `/admin/profiles/<id>/`,
+в т.ч. в формате collapsed stacks для flamegraph.pl / speedscope.
+
+Без флага в запросе стоимость - поиск заголовка и параметра: обработчики событий
+движка подключаются только на время профилирования. Токен с флагом проверяется по
+форме и кэшируется (PROFILE_TOKEN_CACHE_TTL), так что флаг со случайными токенами
+не добавляет запросов к БД. Если профилирование не разрешено, в ответе приходит
+`X-Profile: denied`.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter, time
+from types import FrameType
+from typing import Any
+from urllib.parse import parse_qsl
+from uuid import uuid4
+
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import event, select
+from starlette.concurrency import run_in_threadpool
+
+from alchemy.db import async_session_maker, engine
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    ADMIN_EMAILS,
+    PROFILE_DIR,
+    PROFILE_INTERVAL,
+    PROFILE_MAX_SAMPLES,
+    PROFILE_STORE_SIZE,
+    PROFILE_TOKEN_CACHE_TTL,
+)
+from middlewares.admission import ASGIApp, Message, Receive, Scope, Send
+from models.user import User, UserBaseToken
+from repositories.services.cache import LRUCache
+
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_PARAM = "profile"
+ENABLED_VALUES = ("1", "true", "yes")
+# secrets.token_hex(32) и 40 символов старых токенов.
+TOKEN_PATTERN = re.compile(r"[0-9a-f]{40,64}")
+
+_current_profile: ContextVar["Profile | None"] = ContextVar("current_profile", default=None)
+
+# токен -> email владельца ("" - токена нет).
+_token_emails = LRUCache(maxsize=1024, ttl=PROFILE_TOKEN_CACHE_TTL)
+
+
+def _frame_name(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _thread_stack(frame: FrameType | None, root: FrameType | None) -> list[str]:
+    """Стек потока от кадра корутины задачи (`root`) до текущего, без кадров event loop."""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_stack(coroutine: Any) -> list[str]:
+    """Цепочка ожидающих корутин задачи, лист - тип awaitable, которого ждет последняя."""
+    stack = []
+    while coroutine is not None:
+        frame = getattr(coroutine, "cr_frame", None) or getattr(coroutine, "ag_frame", None)
+        if frame is None:
+            frame = getattr(coroutine, "gi_frame", None)
+        if frame is None:
+            stack.append(f"<{type(coroutine).__name__}>")
+            break
+        stack.append(_frame_name(frame))
+        coroutine = (
+            getattr(coroutine, "cr_await", None)
+            or getattr(coroutine, "ag_await", None)
+            or getattr(coroutine, "gi_yieldfrom", None)
+        )
+    return stack
+
+
+class Profile:
+    """Сэмплы стеков и время SQL запросов одного запроса."""
+
+    def __init__(self, scope: Scope, task: asyncio.Task, loop_thread_id: int) -> None:
+        self.id = uuid4().hex
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope.get("query_string", b"").decode("latin-1")
+        self.task = task
+        self.loop_thread_id = loop_thread_id
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self.statements: dict[str, list[float]] = {}
+        self.status: int | None = None
+        self.started_at = time()
+        self.started = perf_counter()
+        self.duration = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.duration = perf_counter() - self.started
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        loop = self.task.get_loop()
+        root = self.task.get_coro().cr_frame  # type: ignore
+        while not self._stopped.wait(PROFILE_INTERVAL):
+            if self.samples.total() >= PROFILE_MAX_SAMPLES:
+                return
+            if asyncio.current_task(loop) is self.task:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = ["[cpu]", *_thread_stack(frame, root)]
+            else:
+                stack = ["[await]", *_await_stack(self.task.get_coro())]
+            self.samples[tuple(stack)] += 1
+
+    def add_statement(self, statement: str, duration: float) -> None:
+        timings = self.statements.setdefault(statement, [0, 0.0, 0.0])
+        timings[0] += 1
+        timings[1] += duration
+        timings[2] = max(timings[2], duration)
+
+    def to_dict(self) -> dict[str, Any]:
+        statements = sorted(self.statements.items(), key=lambda item: -item[1][1])
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query_string": self.query_string,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "samples": self.samples.total(),
+            "db": {
+                "statements": sum(timings[0] for _, timings in statements),
+                "total_ms": round(sum(timings[1] for _, timings in statements) * 1000, 3),
+            },
+            "statements": [
+                {
+                    "statement": statement,
+                    "count": count,
+                    "total_ms": round(total * 1000, 3),
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for statement, (count, total, longest) in statements
+            ],
+            "stacks": [
+                {"stack": ";".join(stack), "samples": samples}
+                for stack, samples in self.samples.most_common()
+            ],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Начало храним в контексте выполнения: при ошибке запроса after не вызывается.
+    if _current_profile.get() is not None and context is not None:
+        context.profile_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current_profile.get()
+    started = getattr(context, "profile_started", None)
+    if profile is not None and started is not None:
+        profile.add_statement(statement, perf_counter() - started)
+
+
+class _EngineHooks:
+    """Обработчики событий движка, подключенные, пока идет хотя бы одно профилирование."""
+
+    def __init__(self) -> None:
+        self.active = 0
+
+    def acquire(self) -> None:
+        if not self.active:
+            event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        if not self.active:
+            event.remove(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_engine_hooks = _EngineHooks()
+
+
+def profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def _stored() -> list[os.DirEntry]:
+    """Файлы профилей, от старых к новым."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """Сводки сохраненных профилей, новые первыми (читает файлы - вызывать в пуле потоков)."""
+    summaries = []
+    for entry in reversed(_stored()):
+        profile = load_profile(entry.name.removesuffix(".json"))
+        if profile is not None:
+            summaries.append({
+                key: value for key, value in profile.items() if key not in ("statements", "stacks")
+            })
+    return summaries
+
+
+def load_profile(profile_id: str) -> dict[str, Any] | None:
+    try:
+        with open(profile_path(profile_id), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def collapsed_stacks(profile: dict[str, Any]) -> str:
+    """Формат `кадр;кадр;кадр число` для flamegraph.pl и speedscope."""
+    return "".join(f"{item['stack']} {item['samples']}\n" for item in profile["stacks"])
+
+
+def _save(data: dict[str, Any]) -> None:
+    """Запись профиля и удаление самых старых сверх PROFILE_STORE_SIZE."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    temporary = profile_path(f".{data['id']}")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temporary, profile_path(data["id"]))
+    for entry in _stored()[:-PROFILE_STORE_SIZE]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Включает профилирование запроса по `X-Profile` / `?profile=`, только администраторам."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not await self._is_admin(scope):
+            metrics.inc("profiling.denied")
+
+            async def send_denied(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = [*message.get("headers", []), (b"x-profile", b"denied")]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_denied)
+            return
+
+        profile = Profile(scope, asyncio.current_task(), threading.get_ident())  # type: ignore
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_profile.set(profile)
+        _engine_hooks.acquire()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            _engine_hooks.release()
+            _current_profile.reset(token)
+            metrics.inc("profiling.profiles")
+            await run_in_threadpool(_save, profile.to_dict())
+
+    @staticmethod
+    def _requested(scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1").lower() in ENABLED_VALUES
+        query_string: bytes = scope.get("query_string", b"")
+        if PROFILE_PARAM.encode() not in query_string:
+            return False
+        return any(
+            name == PROFILE_PARAM and value.lower() in ENABLED_VALUES
+            for name, value in parse_qsl(query_string.decode("latin-1"))
+        )
+
+    @staticmethod
+    async def _is_admin(scope: Scope) -> bool:
+        if not ADMIN_EMAILS:
+            return False
+        authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        _, token = get_authorization_scheme_param(authorization)
+        if not TOKEN_PATTERN.fullmatch(token):
+            return False
+        email = _token_emails.get(token)
+        if email is None:
+            email = await _token_email(token) or ""
+            _token_emails.set(token, email)
+        return email in ADMIN_EMAILS
+
+
+async def _token_email(token: str) -> str | None:
+    async with async_session_maker() as session:
+        return await session.scalar(
+            select(User.email)
+            .join(User.token)
+            .where(UserBaseToken.token == token)
+        )
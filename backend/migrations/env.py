@@ -10,7 +10,9 @@ from alembic import context
 from models import (  # type: ignore
     user,
     core,
-    recipe
+    recipe,
+    job,
+    change,
 )
 
 from foodgram_fastapi.settings import DATABASE_URL
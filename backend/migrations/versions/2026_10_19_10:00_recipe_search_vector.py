@@ -0,0 +1,44 @@
+"""recipe_search_vector
+
+Revision ID: 21b0aedfd857
+Revises: 737f21ac4fce
+Create Date: 2026-10-19 10:00:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '21b0aedfd857'
+down_revision: Union[str, None] = '737f21ac4fce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(text, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index(
+        'ix_recipes_search_vector',
+        'recipes',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipes_search_vector', table_name='recipes', postgresql_using='gin')
+    op.drop_column('recipes', 'search_vector')
@@ -0,0 +1,30 @@
+"""recipe_tag_tag_id_index
+
+Revision ID: 4fc37db2a463
+Revises: 21b0aedfd857
+Create Date: 2026-10-19 11:20:47.902116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4fc37db2a463'
+down_revision: Union[str, None] = '21b0aedfd857'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_recipe_tag_tag_id_recipe_id',
+        'recipe_tag',
+        ['tag_id', 'recipe_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipe_tag_tag_id_recipe_id', table_name='recipe_tag')
@@ -0,0 +1,51 @@
+"""denormalized_counters
+
+Revision ID: 405b8561e683
+Revises: 4fc37db2a463
+Create Date: 2026-10-19 12:05:31.274918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '405b8561e683'
+down_revision: Union[str, None] = '4fc37db2a463'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column('favorites_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('recipes', sa.Column('in_carts_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('recipes_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_recipes_author_id', 'recipes', ['author_id'], unique=False)
+    op.create_index('ix_user_favorites_recipe_id', 'user_favorites', ['recipe_id'], unique=False)
+    op.create_index('ix_user_shopping_list_recipe_id', 'user_shopping_list', ['recipe_id'], unique=False)
+    op.create_index('ix_user_subscriptions_following_id', 'user_subscriptions', ['following_id'], unique=False)
+    # Первичное заполнение, дальше счетчики поддерживают репозитории.
+    op.execute(
+        "UPDATE recipes SET "
+        "favorites_count = (SELECT count(*) FROM user_favorites WHERE recipe_id = recipes.id), "
+        "in_carts_count = (SELECT count(*) FROM user_shopping_list WHERE recipe_id = recipes.id)"
+    )
+    op.execute(
+        "UPDATE users SET "
+        "recipes_count = (SELECT count(*) FROM recipes WHERE author_id = users.id), "
+        "followers_count = (SELECT count(*) FROM user_subscriptions WHERE following_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_subscriptions_following_id', table_name='user_subscriptions')
+    op.drop_index('ix_user_shopping_list_recipe_id', table_name='user_shopping_list')
+    op.drop_index('ix_user_favorites_recipe_id', table_name='user_favorites')
+    op.drop_index('ix_recipes_author_id', table_name='recipes')
+    op.drop_column('users', 'followers_count')
+    op.drop_column('users', 'recipes_count')
+    op.drop_column('recipes', 'in_carts_count')
+    op.drop_column('recipes', 'favorites_count')
@@ -0,0 +1,38 @@
+"""recipe_user_updated_at
+
+Revision ID: 1c62cce52fff
+Revises: 405b8561e683
+Create Date: 2026-10-19 13:10:08.563471
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c62cce52fff'
+down_revision: Union[str, None] = '405b8561e683'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column(
+        'updated_at',
+        sa.DateTime(timezone=True),
+        server_default=sa.text('now()'),
+        nullable=False,
+    ))
+    op.add_column('users', sa.Column(
+        'updated_at',
+        sa.DateTime(timezone=True),
+        server_default=sa.text('now()'),
+        nullable=False,
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'updated_at')
+    op.drop_column('recipes', 'updated_at')
@@ -0,0 +1,30 @@
+"""unique_ingredient_name_unit
+
+Revision ID: 747ec13b28a2
+Revises: 1c62cce52fff
+Create Date: 2026-10-19 14:30:55.120384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '747ec13b28a2'
+down_revision: Union[str, None] = '1c62cce52fff'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дубликаты (name, measurement_unit), если есть, нужно свести до миграции.
+    op.create_unique_constraint(
+        'unique_ingredient_name_unit',
+        'ingredients',
+        ['name', 'measurement_unit'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('unique_ingredient_name_unit', 'ingredients', type_='unique')
@@ -0,0 +1,42 @@
+"""user_feed
+
+Revision ID: 3a8f61c0d9e2
+Revises: 9d2e4b7c1f36
+Create Date: 2026-10-19 16:25:41.903177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8f61c0d9e2'
+down_revision: Union[str, None] = '9d2e4b7c1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_feed',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('recipe_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'recipe_id'),
+    )
+    op.create_index('ix_user_feed_recipe_id', 'user_feed', ['recipe_id'], unique=False)
+    op.execute(
+        "INSERT INTO user_feed (user_id, recipe_id, author_id) "
+        "SELECT user_subscriptions.user_id, recipes.id, recipes.author_id "
+        "FROM user_subscriptions JOIN recipes ON recipes.author_id = user_subscriptions.following_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_feed_recipe_id', table_name='user_feed')
+    op.drop_table('user_feed')
@@ -0,0 +1,66 @@
+"""recipe_created_at
+
+Revision ID: 6b0d5e2a9f14
+Revises: 3a8f61c0d9e2
+Create Date: 2026-10-19 17:10:26.514208
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b0d5e2a9f14'
+down_revision: Union[str, None] = '3a8f61c0d9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Порядки выдачи списка рецептов, все вместе с фильтром по автору.
+RECIPE_ORDER_INDEXES = (
+    ('ix_recipes_created_at_id', ['created_at', 'id']),
+    ('ix_recipes_cooking_time_id', ['cooking_time', 'id']),
+    ('ix_recipes_name_id', ['name', 'id']),
+    ('ix_recipes_author_id_created_at_id', ['author_id', 'created_at', 'id']),
+    ('ix_recipes_author_id_cooking_time_id', ['author_id', 'cooking_time', 'id']),
+    ('ix_recipes_author_id_name_id', ['author_id', 'name', 'id']),
+)
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+    # Времени создания старых рецептов нет, ближайшее известное - updated_at
+    # (не позже реального). Поздние id не должны оказаться старше ранних:
+    # берем минимум updated_at по этому и всем следующим id.
+    op.execute(
+        "UPDATE recipes SET created_at = ordered.created_at "
+        "FROM ("
+        "SELECT id, min(updated_at) OVER (ORDER BY id DESC) AS created_at FROM recipes"
+        ") AS ordered "
+        "WHERE recipes.id = ordered.id"
+    )
+    op.alter_column(
+        'recipes',
+        'created_at',
+        nullable=False,
+        server_default=sa.text('now()'),
+    )
+    # Индексы строятся без блокировки записи (CONCURRENTLY), а такое построение
+    # не может идти в транзакции миграции.
+    with op.get_context().autocommit_block():
+        for name, columns in RECIPE_ORDER_INDEXES:
+            op.create_index(
+                name, 'recipes', columns, unique=False, postgresql_concurrently=True
+            )
+        op.drop_index('ix_recipes_author_id', table_name='recipes', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_recipes_author_id', 'recipes', ['author_id'], postgresql_concurrently=True
+        )
+        for name, _ in reversed(RECIPE_ORDER_INDEXES):
+            op.drop_index(name, table_name='recipes', postgresql_concurrently=True)
+    op.drop_column('recipes', 'created_at')
@@ -0,0 +1,42 @@
+"""entity_versions
+
+Revision ID: e4a7c2d91b58
+Revises: 6b0d5e2a9f14
+Create Date: 2026-10-19 17:55:12.330871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2d91b58'
+down_revision: Union[str, None] = '6b0d5e2a9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('entity_version_seq')))
+    op.create_table(
+        'entity_versions',
+        sa.Column('entity', sa.String(length=32), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'version',
+            sa.BigInteger(),
+            server_default=sa.text("nextval('entity_version_seq')"),
+            nullable=False,
+        ),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('entity', 'entity_id'),
+    )
+    op.create_index('ix_entity_versions_changed_at', 'entity_versions', ['changed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_entity_versions_changed_at', table_name='entity_versions')
+    op.drop_table('entity_versions')
+    op.execute(sa.schema.DropSequence(sa.Sequence('entity_version_seq')))
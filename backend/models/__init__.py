@@ -7,12 +7,15 @@ from .core import (
     Tag,
     Ingredient,
 )
+from .job import Job
+from .change import EntityVersion
 from .user import (
     User,
     UserBaseToken,
     UserSubscription,
     UserFavorites,
     UserShoppingList,
+    UserFeed,
 )
 
 __all__ = [
@@ -26,4 +29,7 @@ __all__ = [
     "UserSubscription",
     "UserFavorites",
     "UserShoppingList",
+    "UserFeed",
+    "Job",
+    "EntityVersion",
 ]
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    String,
+    DateTime,
+    Index,
+    Sequence,
+    func,
+)
+from sqlalchemy.orm import (
+    Mapped,
+    mapped_column,
+)
+
+from alchemy.db import Base
+
+
+entity_version_seq = Sequence("entity_version_seq")
+
+
+class EntityVersion(Base):
+    """
+    Последняя версия изменившейся сущности (см. repositories.services.changes).
+
+    Строка на сущность, перезаписывается при каждом изменении. По ней воркер
+    после переподключения LISTEN находит пропущенные уведомления.
+    """
+
+    __tablename__ = "entity_versions"
+    __table_args__ = (
+        Index("ix_entity_versions_changed_at", "changed_at"),
+    )
+    # Table fields:
+    entity: Mapped[str] = mapped_column(String(32), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, server_default=entity_version_seq.next_value())
+    changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,6 +1,7 @@
 from sqlalchemy import (
     Integer,
     String,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import (
     Mapped,
@@ -34,6 +35,9 @@ class Tag(Base):
 
 class Ingredient(Base):
     __tablename__ = "ingredients"
+    __table_args__ = (
+        UniqueConstraint("name", "measurement_unit", name="unique_ingredient_name_unit"),
+    )
     # Fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(128), index=True)
@@ -1,10 +1,17 @@
+from datetime import datetime
+
 from sqlalchemy import (
     Integer,
     String,
+    DateTime,
     ForeignKey,
     UniqueConstraint,
-    TEXT
+    Index,
+    Computed,
+    TEXT,
+    func,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
@@ -19,8 +26,23 @@ from models.services.validators import (
 )
 
 
+# Конфигурация полнотекстового поиска: русский стеммер, латиница обрабатывается english_stem.
+SEARCH_CONFIG = "russian"
+
+
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (
+        Index("ix_recipes_search_vector", "search_vector", postgresql_using="gin"),
+        # Порядки выдачи списка с id для однозначности, в т.ч. с фильтром по автору:
+        Index("ix_recipes_created_at_id", "created_at", "id"),
+        Index("ix_recipes_cooking_time_id", "cooking_time", "id"),
+        Index("ix_recipes_name_id", "name", "id"),
+        Index("ix_recipes_author_id_created_at_id", "author_id", "created_at", "id"),
+        Index("ix_recipes_author_id_cooking_time_id", "author_id", "cooking_time", "id"),
+        Index("ix_recipes_author_id_name_id", "author_id", "name", "id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     # Fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -29,6 +51,27 @@ class Recipe(Base):
     image: Mapped[str | None] = mapped_column(TEXT, nullable=True)
     text: Mapped[str] = mapped_column(String(1000))
     cooking_time: Mapped[int] = mapped_column(Integer)
+    # Денормализованные счетчики, поддерживаются репозиториями в той же транзакции:
+    favorites_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    in_carts_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(text, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
     # Relationships:
     author = relationship(
         "models.user.User",
@@ -66,7 +109,10 @@ class Recipe(Base):
 
 class RecipeTag(Base):
     __tablename__ = "recipe_tag"
-    __table_args__ = (UniqueConstraint("recipe_id", "tag_id", name="unique_recipe_tag"),)
+    __table_args__ = (
+        UniqueConstraint("recipe_id", "tag_id", name="unique_recipe_tag"),
+        Index("ix_recipe_tag_tag_id_recipe_id", "tag_id", "recipe_id"),
+    )
     # Fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     recipe_id: Mapped[int] = mapped_column(Integer, ForeignKey("recipes.id"))
@@ -12,8 +12,13 @@ USERNAME_REGEX = r'^[\w.@+-]+\Z'
 
 
 def validate_user_email(email: str):
+    """
+    Только синтаксис и нормализация, без обращений к DNS: вызывается в ORM
+    и в схеме на каждой записи. Доставляемость проверяет роутер регистрации
+    (`routers.services.deliverability`).
+    """
     try:
-        emailinfo = validate_email(email)
+        emailinfo = validate_email(email, check_deliverability=False)
         return emailinfo.normalized
     except EmailNotValidError:
         raise UserValidationException("Некорректный email")
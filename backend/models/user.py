@@ -1,10 +1,15 @@
+from datetime import datetime
+
 from sqlalchemy import (
     Integer,
     String,
+    DateTime,
     ForeignKey,
     UniqueConstraint,
     CheckConstraint,
+    Index,
     TEXT,
+    func,
 )
 from sqlalchemy.orm import (
     Mapped,
@@ -22,6 +27,7 @@ from .services.validators import (
 
 class User(Base):
     __tablename__ = "users"
+    __mapper_args__ = {"eager_defaults": True}
     # Table fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     email: Mapped[str] = mapped_column(String(254), unique=True)
@@ -30,6 +36,14 @@ class User(Base):
     first_name: Mapped[str] = mapped_column(String(150))
     last_name: Mapped[str] = mapped_column(String(150))
     avatar: Mapped[str | None] = mapped_column(TEXT, nullable=True)
+    # Денормализованные счетчики, поддерживаются репозиториями в той же транзакции:
+    recipes_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    followers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
     # Relationships:
     recipe = relationship(
         "models.recipe.Recipe",
@@ -95,6 +109,7 @@ class UserSubscription(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "following_id", name="unique_follow"),
         CheckConstraint("user_id != following_id"),
+        Index("ix_user_subscriptions_following_id", "following_id"),
     )
     # Table fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -117,6 +132,7 @@ class UserFavorites(Base):
     __tablename__ = "user_favorites"
     __table_args__ = (
         UniqueConstraint("user_id", "recipe_id", name="unique_user_favorites"),
+        Index("ix_user_favorites_recipe_id", "recipe_id"),
     )
     # Fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -139,6 +155,7 @@ class UserShoppingList(Base):
     __tablename__ = "user_shopping_list"
     __table_args__ = (
         UniqueConstraint("user_id", "recipe_id", name="unique_user_shopping_list"),
+        Index("ix_user_shopping_list_recipe_id", "recipe_id"),
     )
     # Fields:
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -155,3 +172,28 @@ class UserShoppingList(Base):
         foreign_keys=[recipe_id],
         back_populates="shopping_list_users",
     )
+
+
+class UserFeed(Base):
+    """
+    Лента подписок: рецепты авторов, на которых подписан пользователь.
+    Заполняется при создании рецепта (fan-out при записи), кроме авторов
+    с очень большим числом подписчиков - их рецепты подмешиваются при чтении.
+    """
+
+    __tablename__ = "user_feed"
+    __table_args__ = (
+        Index("ix_user_feed_recipe_id", "recipe_id"),
+    )
+    # Fields:
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    recipe_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("recipes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    author_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
@@ -1,9 +1,12 @@
-from typing import Sequence
+from itertools import islice
+from typing import Callable, Iterable, Sequence
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.core import Ingredient, Tag
+from repositories.services.cache import tag_slug_cache
+from repositories.services.changes import publish_changes
 from schemas.core import (
     TagCreateSchema,
     IngredientCreateSchema,
@@ -22,14 +25,25 @@ class TagRepository:
             slug=tag_data.slug,
         )
         self.db.add(tag)
-        await self.db.commit()
-        await self.db.refresh(tag)
+        await self.db.flush()
+        await publish_changes(self.db, ("tag", [tag.id]))
         return tag
 
     async def get_all_tags(self) -> Sequence[Tag]:
         tags = await self.db.scalars(select(Tag))
         return tags.all()
 
+    async def get_tag_ids_by_slugs(self, slugs: list[str]) -> list[int]:
+        """id тегов по slug, несуществующие slug отбрасываются. В БД идем только за промахами."""
+        tag_ids: dict[str, int | None] = {slug: tag_slug_cache.get(slug) for slug in slugs}
+        missing = [slug for slug, tag_id in tag_ids.items() if tag_id is None]
+        if missing:
+            found = await self.db.execute(select(Tag.slug, Tag.id).where(Tag.slug.in_(missing)))
+            for slug, tag_id in found.all():
+                tag_slug_cache.set(slug, tag_id)
+                tag_ids[slug] = tag_id
+        return [tag_id for tag_id in tag_ids.values() if tag_id is not None]
+
 
 class IngredientRepository:
     """Репозиторий работы с ингредиентами."""
@@ -43,8 +57,8 @@ class IngredientRepository:
             measurement_unit=ingredient_data.measurement_unit,
         )
         self.db.add(ingredient)
-        await self.db.commit()
-        await self.db.refresh(ingredient)
+        await self.db.flush()
+        await publish_changes(self.db, ("ingredient", [ingredient.id]))
         return ingredient
 
     async def get_all_ibgredients(
@@ -59,3 +73,65 @@ class IngredientRepository:
         else:
             ingredients = await self.db.scalars(select(Ingredient))
         return ingredients.all()
+
+
+class CatalogImportRepository:
+    """
+    Массовая загрузка справочников (ингредиенты, теги).
+
+    Строки пачками уходят через COPY (asyncpg `copy_records_to_table`) во временную
+    таблицу, затем одним INSERT ... ON CONFLICT DO NOTHING сливаются с основной.
+    Все в одной транзакции, в памяти не больше одной пачки.
+    """
+
+    STAGING = {
+        "ingredients": (
+            "CREATE TEMP TABLE ingredients_staging "
+            "(name varchar(128), measurement_unit varchar(64)) ON COMMIT DROP",
+            ("name", "measurement_unit"),
+            "INSERT INTO ingredients (name, measurement_unit) "
+            "SELECT DISTINCT name, measurement_unit FROM ingredients_staging "
+            "ON CONFLICT ON CONSTRAINT unique_ingredient_name_unit DO NOTHING",
+        ),
+        "tags": (
+            "CREATE TEMP TABLE tags_staging "
+            "(name varchar(32), slug varchar(32)) ON COMMIT DROP",
+            ("name", "slug"),
+            "INSERT INTO tags (name, slug) "
+            "SELECT DISTINCT ON (slug) name, slug FROM tags_staging "
+            "ON CONFLICT DO NOTHING",
+        ),
+    }
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def import_rows(
+        self,
+        catalog: str,
+        rows: Iterable[tuple[str, str]],
+        batch_size: int = 10000,
+        on_batch: Callable[[int], None] | None = None,
+    ) -> tuple[int, int]:
+        """Загрузка строк справочника `catalog`. Возвращает (прочитано строк, добавлено строк)."""
+        create_staging, columns, merge = self.STAGING[catalog]
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        await driver_connection.execute(create_staging)  # type: ignore
+
+        copied = 0
+        rows_iterator = iter(rows)
+        while batch := list(islice(rows_iterator, batch_size)):
+            await driver_connection.copy_records_to_table(  # type: ignore
+                f"{catalog}_staging",
+                records=batch,
+                columns=columns,
+            )
+            copied += len(batch)
+            if on_batch:
+                on_batch(copied)
+
+        status = await driver_connection.execute(merge)  # type: ignore
+        await self.db.commit()
+        return copied, int(status.rsplit(" ", 1)[-1])
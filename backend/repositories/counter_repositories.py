@@ -0,0 +1,118 @@
+from typing import AsyncIterator
+
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.recipe import Recipe
+from models.user import (
+    User,
+    UserFavorites,
+    UserShoppingList,
+    UserSubscription,
+)
+
+
+async def change_counter(
+    db: AsyncSession,
+    instance: Recipe | User,
+    counter: str,
+    delta: int,
+) -> None:
+    """
+    Счетчик загруженного объекта += delta одним UPDATE ... RETURNING.
+
+    Без synchronize_session: иначе onupdate у updated_at экспайрит атрибуты объекта,
+    и следующее чтение (ETag, кэш карточек, схема ответа) уходит в ленивую загрузку,
+    которая под asyncpg падает с MissingGreenlet. Новые значения записываются в объект сами.
+    """
+    model = type(instance)
+    column = getattr(model, counter)
+    result = await db.execute(
+        update(model)
+        .where(model.id == instance.id)
+        .values({counter: column + delta})
+        .returning(column, model.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is not None:
+        set_committed_value(instance, counter, row[0])
+        set_committed_value(instance, "updated_at", row[1])
+
+
+class CounterRepository:
+    """
+    Пересчет денормализованных счетчиков.
+
+    Счетчики поддерживаются репозиториями при записи, пересчет нужен только для
+    исправления рассинхронизации. Работает пачками по диапазонам id, каждая
+    пачка - отдельная транзакция, обновляются только разошедшиеся строки.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def repair_recipes(self, batch_size: int) -> AsyncIterator[tuple[int, int]]:
+        """Пересчет счетчиков рецептов. Отдает (последний id пачки, исправлено строк)."""
+        favorites_count = (
+            select(func.count())
+            .where(UserFavorites.recipe_id == Recipe.id)
+            .scalar_subquery()
+        )
+        in_carts_count = (
+            select(func.count())
+            .where(UserShoppingList.recipe_id == Recipe.id)
+            .scalar_subquery()
+        )
+        async for first_id, last_id in self._id_ranges(Recipe, batch_size):
+            result = await self.db.execute(
+                update(Recipe)
+                .where(
+                    Recipe.id.between(first_id, last_id),
+                    or_(
+                        Recipe.favorites_count != favorites_count,
+                        Recipe.in_carts_count != in_carts_count,
+                    ),
+                )
+                .values(favorites_count=favorites_count, in_carts_count=in_carts_count)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+            yield last_id, result.rowcount  # type: ignore
+
+    async def repair_users(self, batch_size: int) -> AsyncIterator[tuple[int, int]]:
+        """Пересчет счетчиков пользователей. Отдает (последний id пачки, исправлено строк)."""
+        recipes_count = (
+            select(func.count())
+            .where(Recipe.author_id == User.id)
+            .scalar_subquery()
+        )
+        followers_count = (
+            select(func.count())
+            .where(UserSubscription.following_id == User.id)
+            .scalar_subquery()
+        )
+        async for first_id, last_id in self._id_ranges(User, batch_size):
+            result = await self.db.execute(
+                update(User)
+                .where(
+                    User.id.between(first_id, last_id),
+                    or_(
+                        User.recipes_count != recipes_count,
+                        User.followers_count != followers_count,
+                    ),
+                )
+                .values(recipes_count=recipes_count, followers_count=followers_count)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+            yield last_id, result.rowcount  # type: ignore
+
+    async def _id_ranges(self, model, batch_size: int) -> AsyncIterator[tuple[int, int]]:
+        max_id = await self.db.scalar(select(func.max(model.id)))
+        first_id = 1
+        while max_id is not None and first_id <= max_id:
+            last_id = first_id + batch_size - 1
+            yield first_id, last_id
+            first_id = last_id + 1
@@ -0,0 +1,202 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import select, update, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload, defer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.core import Ingredient, Tag
+from models.user import User
+from models.recipe import (
+    Recipe,
+    RecipeTag,
+    RecipeIngredient,
+)
+from schemas.recipe import RecipeExchangeSchema
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Строки из потока байт (тело запроса, файл), в памяти не больше одного чанка."""
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8")
+    if tail:
+        yield tail.decode("utf-8")
+
+
+class RecipeExchangeRepository:
+    """
+    Выгрузка и загрузка рецептов в NDJSON.
+
+    Выгрузка идет серверным курсором (`stream_scalars` + yield_per), загрузка - пачками,
+    память не зависит от количества рецептов.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def export_ndjson(
+        self,
+        with_images: bool = False,
+        chunk_size: int = 500,
+    ) -> AsyncIterator[bytes]:
+        query = (
+            select(Recipe)
+            .order_by(Recipe.id)
+            .options(
+                selectinload(Recipe.author).load_only(User.email),
+                selectinload(Recipe.tags).joinedload(RecipeTag.tag),
+                selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
+            )
+            .execution_options(yield_per=chunk_size)
+        )
+        if not with_images:
+            query = query.options(defer(Recipe.image))
+        recipes = await self.db.stream_scalars(query)
+        async for partition in recipes.partitions():
+            yield "".join(
+                self._to_record(recipe).model_dump_json(exclude_none=True) + "\n"
+                for recipe in partition
+            ).encode()
+
+    async def import_ndjson(
+        self,
+        lines: AsyncIterator[str],
+        batch_size: int = 500,
+    ) -> tuple[int, int]:
+        """Загрузка рецептов. Возвращает (загружено, пропущено)."""
+        imported = skipped = 0
+        batch: list[RecipeExchangeSchema] = []
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                batch.append(RecipeExchangeSchema.model_validate_json(line))
+            except ValidationError:
+                skipped += 1
+                continue
+            if len(batch) >= batch_size:
+                batch_imported = await self._import_batch(batch)
+                imported += batch_imported
+                skipped += len(batch) - batch_imported
+                batch = []
+        if batch:
+            batch_imported = await self._import_batch(batch)
+            imported += batch_imported
+            skipped += len(batch) - batch_imported
+        return imported, skipped
+
+    async def _import_batch(self, records: list[RecipeExchangeSchema]) -> int:
+        """Пачка рецептов в одной транзакции, рецепты неизвестных авторов пропускаются."""
+        authors = await self.db.execute(
+            select(User.email, User.id)
+            .where(User.email.in_({record.author for record in records}))
+        )
+        author_ids = dict(authors.tuples().all())
+        records = [record for record in records if record.author in author_ids]
+        if not records:
+            return 0
+
+        tags = await self.db.execute(
+            select(Tag.slug, Tag.id)
+            .where(Tag.slug.in_({slug for record in records for slug in record.tags}))
+        )
+        tag_ids = dict(tags.tuples().all())
+
+        ingredient_keys = {
+            (ingredient.name, ingredient.measurement_unit)
+            for record in records
+            for ingredient in record.ingredients
+        }
+        ingredient_ids: dict[tuple[str, str], int] = {}
+        if ingredient_keys:
+            await self.db.execute(
+                insert(Ingredient)
+                .values([
+                    {"name": name, "measurement_unit": measurement_unit}
+                    for name, measurement_unit in ingredient_keys
+                ])
+                .on_conflict_do_nothing(constraint="unique_ingredient_name_unit")
+            )
+            ingredients = await self.db.execute(
+                select(Ingredient.name, Ingredient.measurement_unit, Ingredient.id)
+                .where(
+                    tuple_(Ingredient.name, Ingredient.measurement_unit).in_(ingredient_keys)
+                )
+            )
+            ingredient_ids = {
+                (name, measurement_unit): ingredient_id
+                for name, measurement_unit, ingredient_id in ingredients.tuples().all()
+            }
+
+        # executemany требует одинаковых ключей, время без created_at подставляем сами:
+        now = datetime.now(timezone.utc)
+        recipe_ids = await self.db.scalars(
+            insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True),
+            [
+                {
+                    "author_id": author_ids[record.author],
+                    "name": record.name,
+                    "text": record.text,
+                    "cooking_time": record.cooking_time,
+                    "image": record.image,
+                    "created_at": record.created_at or now,
+                }
+                for record in records
+            ],
+        )
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe_id, record in zip(recipe_ids.all(), records):
+            for tag_id in {tag_ids[slug] for slug in record.tags if slug in tag_ids}:
+                recipe_tags.append({"recipe_id": recipe_id, "tag_id": tag_id})
+            amounts: dict[int, int] = {}
+            for ingredient in record.ingredients:
+                ingredient_id = ingredient_ids[(ingredient.name, ingredient.measurement_unit)]
+                amounts.setdefault(ingredient_id, ingredient.amount)
+            recipe_ingredients.extend(
+                {"recipe_id": recipe_id, "ingredient_id": ingredient_id, "amount": amount}
+                for ingredient_id, amount in amounts.items()
+            )
+        if recipe_tags:
+            await self.db.execute(insert(RecipeTag), recipe_tags)
+        if recipe_ingredients:
+            await self.db.execute(insert(RecipeIngredient), recipe_ingredients)
+
+        await self.db.execute(
+            update(User)
+            .where(User.id.in_(set(author_ids.values())))
+            .values(
+                recipes_count=select(func.count())
+                .where(Recipe.author_id == User.id)
+                .scalar_subquery()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return len(records)
+
+    @staticmethod
+    def _to_record(recipe: Recipe) -> RecipeExchangeSchema:
+        return RecipeExchangeSchema(
+            name=recipe.name,
+            text=recipe.text,
+            cooking_time=recipe.cooking_time,
+            author=recipe.author.email,
+            tags=[recipe_tag.tag.slug for recipe_tag in recipe.tags],
+            ingredients=[
+                {
+                    "name": recipe_ingredient.ingredient.name,
+                    "measurement_unit": recipe_ingredient.ingredient.measurement_unit,
+                    "amount": recipe_ingredient.amount,
+                }
+                for recipe_ingredient in recipe.ingredients
+            ],
+            image=recipe.__dict__.get("image"),
+            created_at=recipe.created_at,
+        )
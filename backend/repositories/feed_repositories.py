@@ -0,0 +1,150 @@
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import select, delete, literal, union, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from foodgram_fastapi.settings import (
+    FEED_CELEBRITY_FOLLOWERS,
+    FEED_FOLLOW_BACKFILL,
+)
+from models.recipe import Recipe
+from models.user import (
+    User,
+    UserFeed,
+    UserSubscription,
+)
+
+
+class FeedRepository:
+    """
+    Лента подписок.
+
+    При создании рецепта строки ленты вставляются одним INSERT ... SELECT по подписчикам
+    автора (fan-out при записи). У авторов с числом подписчиков от FEED_CELEBRITY_FOLLOWERS
+    строки не пишутся, их рецепты подмешиваются при чтении (fan-out при чтении).
+    Методы записи не коммитят.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    @staticmethod
+    def is_celebrity(author: User) -> bool:
+        return author.followers_count >= FEED_CELEBRITY_FOLLOWERS
+
+    async def fan_out(self, recipe_id: int, author_id: int, *conditions) -> None:
+        """Рецепт в ленты подписчиков автора (одним INSERT ... SELECT)."""
+        await self.db.execute(
+            insert(UserFeed)
+            .from_select(
+                ["user_id", "recipe_id", "author_id"],
+                select(UserSubscription.user_id, literal(recipe_id), literal(author_id))
+                .where(
+                    UserSubscription.following_id == author_id,
+                    # Рецепт мог быть удален до фонового fan-out.
+                    select(Recipe.id).where(Recipe.id == recipe_id).exists(),
+                    *conditions,
+                ),
+            )
+            .on_conflict_do_nothing()
+        )
+
+    async def fan_out_batches(
+        self,
+        recipe_id: int,
+        author_id: int,
+        batch_size: int,
+    ) -> AsyncIterator[int]:
+        """
+        Фоновый fan-out пачками подписчиков по user_id, каждая пачка - своя транзакция.
+        Повтор после сбоя безопасен: уже вставленные строки пропускаются.
+        """
+        last_user_id = 0
+        while True:
+            user_ids = await self.db.scalars(
+                select(UserSubscription.user_id)
+                .where(
+                    UserSubscription.following_id == author_id,
+                    UserSubscription.user_id > last_user_id,
+                )
+                .order_by(UserSubscription.user_id)
+                .limit(batch_size)
+            )
+            batch = user_ids.all()
+            if not batch:
+                return
+            await self.fan_out(
+                recipe_id,
+                author_id,
+                UserSubscription.user_id.between(batch[0], batch[-1]),
+            )
+            await self.db.commit()
+            last_user_id = batch[-1]
+            yield last_user_id
+
+    async def backfill(self, user_id: int, author_ids: Sequence[int]) -> None:
+        """Последние рецепты авторов (кроме знаменитостей) в ленту нового подписчика."""
+        if not author_ids:
+            return
+        authors = (
+            select(User.id)
+            .where(User.id.in_(author_ids), User.followers_count < FEED_CELEBRITY_FOLLOWERS)
+            .subquery("authors")
+        )
+        recent = (
+            select(Recipe.id, Recipe.author_id)
+            .where(Recipe.author_id == authors.c.id)
+            .order_by(Recipe.id.desc())
+            .limit(FEED_FOLLOW_BACKFILL)
+            .lateral("recent")
+        )
+        await self.db.execute(
+            insert(UserFeed)
+            .from_select(
+                ["user_id", "recipe_id", "author_id"],
+                select(literal(user_id), recent.c.id, recent.c.author_id)
+                .select_from(authors.join(recent, true())),
+            )
+            .on_conflict_do_nothing()
+        )
+
+    async def remove_authors(self, user_id: int, author_ids: Sequence[int]) -> None:
+        if author_ids:
+            await self.db.execute(
+                delete(UserFeed)
+                .where(UserFeed.user_id == user_id, UserFeed.author_id.in_(author_ids))
+            )
+
+    async def get_recipe_ids(self, user_id: int, before: int | None, limit: int) -> list[int]:
+        """
+        Страница ленты (keyset по id рецепта, от новых к старым): строки ленты
+        плюс рецепты авторов-знаменитостей, на которых подписан пользователь.
+        """
+        fanned_out = (
+            select(UserFeed.recipe_id.label("recipe_id"))
+            .where(UserFeed.user_id == user_id)
+            .order_by(UserFeed.recipe_id.desc())
+            .limit(limit)
+        )
+        celebrities = (
+            select(Recipe.id.label("recipe_id"))
+            .join(UserSubscription, UserSubscription.following_id == Recipe.author_id)
+            .join(User, User.id == Recipe.author_id)
+            .where(
+                UserSubscription.user_id == user_id,
+                User.followers_count >= FEED_CELEBRITY_FOLLOWERS,
+            )
+            .order_by(Recipe.id.desc())
+            .limit(limit)
+        )
+        if before is not None:
+            fanned_out = fanned_out.where(UserFeed.recipe_id < before)
+            celebrities = celebrities.where(Recipe.id < before)
+        page = union(fanned_out, celebrities).subquery()
+        recipe_ids = await self.db.scalars(
+            select(page.c.recipe_id)
+            .order_by(page.c.recipe_id.desc())
+            .limit(limit)
+        )
+        return list(recipe_ids.all())
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.job import Job, JobStatus
+
+
+class JobRepository:
+    """
+    Очередь фоновых задач в Postgres.
+
+    `enqueue` не коммитит: задача появляется для воркеров вместе с коммитом
+    транзакции запроса и не появляется, если она откатилась.
+    Воркеры забирают задачи через `FOR UPDATE SKIP LOCKED` и не мешают друг другу.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: dict[str, Any] | None = None,
+        delay: float = 0,
+        max_attempts: int = 5,
+    ) -> int:
+        job_id = await self.db.scalar(
+            insert(Job)
+            .values(
+                type=job_type,
+                payload=payload or {},
+                max_attempts=max_attempts,
+                run_at=func.now() + timedelta(seconds=delay),
+            )
+            .returning(Job.id)
+        )
+        return job_id  # type: ignore
+
+    async def enqueue_many(self, job_type: str, payloads: Sequence[dict[str, Any]]) -> None:
+        if payloads:
+            await self.db.execute(
+                insert(Job),
+                [{"type": job_type, "payload": payload} for payload in payloads],
+            )
+
+    async def claim(self, job_type: str, limit: int, worker: str) -> Sequence[Job]:
+        """Забирает до `limit` готовых к запуску задач типа и коммитит."""
+        claimable = (
+            select(Job.id)
+            .where(
+                Job.status == JobStatus.QUEUED,
+                Job.type == job_type,
+                Job.run_at <= func.now(),
+            )
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = await self.db.scalars(
+            update(Job)
+            .where(Job.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=Job.attempts + 1,
+                locked_at=func.now(),
+                locked_by=worker,
+            )
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = jobs.all()
+        await self.db.commit()
+        return claimed
+
+    async def complete(self, job_id: int) -> None:
+        """Удаляет выполненную задачу. Коммит - вместе с работой обработчика."""
+        await self.db.execute(delete(Job).where(Job.id == job_id))
+
+    async def fail(self, job: Job, error: str, backoff: float) -> None:
+        """Возвращает задачу в очередь через `backoff` секунд или помечает упавшей окончательно."""
+        values: dict[str, Any] = {"locked_at": None, "locked_by": None, "last_error": error}
+        if job.attempts >= job.max_attempts:
+            values["status"] = JobStatus.FAILED
+        else:
+            values["status"] = JobStatus.QUEUED
+            values["run_at"] = func.now() + timedelta(seconds=backoff)
+        await self.db.execute(
+            update(Job)
+            .where(Job.id == job.id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+    async def reclaim_stale(self, job_type: str, lease: float) -> int:
+        """
+        Возвращает в очередь задачи типа, чей воркер пропал (running дольше `lease` секунд).
+        Задачи, исчерпавшие попытки, помечаются упавшими.
+        """
+        result = await self.db.execute(
+            update(Job)
+            .where(
+                Job.status == JobStatus.RUNNING,
+                Job.type == job_type,
+                Job.locked_at < func.now() - timedelta(seconds=lease),
+            )
+            .values(
+                status=case(
+                    (Job.attempts >= Job.max_attempts, JobStatus.FAILED),
+                    else_=JobStatus.QUEUED,
+                ),
+                locked_at=None,
+                locked_by=None,
+                last_error="lease expired",
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return result.rowcount  # type: ignore
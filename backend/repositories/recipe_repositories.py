@@ -1,39 +1,118 @@
-from typing import Any
+from datetime import datetime
+from typing import Any, NamedTuple, Sequence
 
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, delete, update, func, exists, false
+from sqlalchemy.orm import selectinload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from foodgram_fastapi.settings import FEED_FANOUT_INLINE_MAX
+from jobs.queue import enqueue
 from models.core import Ingredient, Tag
+from repositories.core_repositories import TagRepository
+from repositories.counter_repositories import change_counter
+from repositories.feed_repositories import FeedRepository
+from repositories.services.cache import (
+    UserRelations,
+    recipe_card_cache,
+    author_card_cache,
+)
+from repositories.services.changes import publish_changes, publish_event
+from repositories.services.loader import get_loader
+from repositories.services.relations import get_user_relations
 from models.user import (
     User,
-    UserSubscription,
     UserFavorites,
     UserShoppingList,
 )
 from models.recipe import (
+    SEARCH_CONFIG,
     Recipe,
     RecipeTag,
     RecipeIngredient,
 )
+from routers.services.uploads import RECIPES_DIR, media_prefix, replace_media
 from schemas.recipe import RecipeCreateSchema, RecipeFilters
 
 
+RECIPE_COLUMNS = {
+    "id": Recipe.id,
+    "name": Recipe.name,
+    "image": Recipe.image,
+    "text": Recipe.text,
+    "cooking_time": Recipe.cooking_time,
+    "favorites_count": Recipe.favorites_count,
+    "in_carts_count": Recipe.in_carts_count,
+}
+AUTHOR_COLUMNS = {
+    "id": User.id,
+    "email": User.email,
+    "username": User.username,
+    "first_name": User.first_name,
+    "last_name": User.last_name,
+    "avatar": User.avatar,
+    "recipes_count": User.recipes_count,
+    "followers_count": User.followers_count,
+}
+# Допустимые поля `fields=` списка рецептов (см. routers.services.fields.parse_fields):
+RECIPE_FIELDS: dict[str, frozenset[str] | None] = {
+    **{name: None for name in RECIPE_COLUMNS},
+    "tags": None,
+    "ingredients": None,
+    "is_favorited": None,
+    "is_in_shopping_cart": None,
+    "author": frozenset(AUTHOR_COLUMNS) | {"is_subscribed"},
+}
+
+# `ordering=` списка: id добивает порядок до однозначного, чтобы LIMIT/OFFSET страницы
+# не пересекались. Каждому порядку соответствует индекс, и такой же с author_id впереди,
+# страница читается обходом индекса без сортировки всей выборки.
+RECIPE_ORDERINGS = {
+    "-created_at": (Recipe.created_at.desc(), Recipe.id.desc()),
+    "created_at": (Recipe.created_at, Recipe.id),
+    "cooking_time": (Recipe.cooking_time, Recipe.id),
+    "-cooking_time": (Recipe.cooking_time.desc(), Recipe.id.desc()),
+    "name": (Recipe.name, Recipe.id),
+    "-name": (Recipe.name.desc(), Recipe.id.desc()),
+}
+
+
+class RecipeVersion(NamedTuple):
+    updated_at: datetime
+    author_updated_at: datetime
+    is_favorited: bool
+    is_in_shopping_cart: bool
+    is_subscribed: bool
+
+
 class RecipeRepository:
     """Репозиторий работы с рецептами."""
 
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_related_query_list(self, filters: RecipeFilters, tags, request_user: User):
-        query = (
-            select(Recipe)
-            .options(
-                selectinload(Recipe.author),
-                selectinload(Recipe.tags).joinedload(RecipeTag.tag),
-                selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
+    async def get_related_query_list(
+        self,
+        filters: RecipeFilters,
+        tags,
+        request_user: User,
+        fields: dict[str, frozenset[str]] | None = None,
+    ):
+        """
+        Запрос страницы рецептов. Грузятся только id и версии рецепта и автора,
+        остальное отдает `to_schema_list` из кэша карточек.
+        С `fields` грузятся только запрошенные колонки и связи (`to_sparse_schema_list`).
+        """
+        if fields:
+            query = select(Recipe).options(*self._sparse_options(fields))
+        else:
+            query = (
+                select(Recipe)
+                .options(
+                    load_only(Recipe.id, Recipe.author_id, Recipe.updated_at),
+                    selectinload(Recipe.author).load_only(User.id, User.updated_at),
+                )
             )
-        )
         if filters.is_favorited is not None:
             query = (
                 query.join(UserFavorites)
@@ -47,36 +126,117 @@ class RecipeRepository:
         if filters.author is not None:
             query = query.filter(Recipe.author_id == filters.author)
         if tags is not None:
-            query = query.join(RecipeTag).join(Tag).filter(Tag.slug.in_(tags))
-        return query
+            query = await self._filter_by_tags(query, tags, filters.tags_match_all)
+        if filters.search:
+            ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, filters.search)
+            query = query.filter(Recipe.search_vector.op("@@")(ts_query))
+            if filters.ordering is None:
+                return query.order_by(
+                    func.ts_rank(Recipe.search_vector, ts_query).desc(),
+                    Recipe.id,
+                )
+        return query.order_by(*RECIPE_ORDERINGS[filters.ordering or "-created_at"])
+
+    async def get_feed(
+        self,
+        request_user: User,
+        before: int | None,
+        limit: int,
+    ) -> list[dict[str, Any]]:
+        """Страница ленты подписок: рецепты с id < `before`, от новых к старым."""
+        recipe_ids = await FeedRepository(self.db).get_recipe_ids(request_user.id, before, limit)
+        if not recipe_ids:
+            return []
+        recipes = await self.db.scalars(
+            select(Recipe)
+            .where(Recipe.id.in_(recipe_ids))
+            .order_by(Recipe.id.desc())
+            .options(
+                load_only(Recipe.id, Recipe.author_id, Recipe.updated_at),
+                selectinload(Recipe.author).load_only(User.id, User.updated_at),
+            )
+        )
+        return await self.to_schema_list(recipes.all(), request_user)
+
+    async def _filter_by_tags(self, query, tags: list[str], match_all: bool):
+        """
+        Фильтр по slug тегов без join на tags.
+
+        Любой из тегов - semi-join (EXISTS), рецепт не дублируется в выдаче.
+        Все теги сразу - GROUP BY recipe_id HAVING count = n.
+        """
+        slugs = set(tags)
+        tag_ids = await TagRepository(self.db).get_tag_ids_by_slugs(list(slugs))
+        if not tag_ids or (match_all and len(tag_ids) < len(slugs)):
+            return query.filter(false())
+        if match_all:
+            return query.filter(
+                Recipe.id.in_(
+                    select(RecipeTag.recipe_id)
+                    .where(RecipeTag.tag_id.in_(tag_ids))
+                    .group_by(RecipeTag.recipe_id)
+                    .having(func.count() == len(tag_ids))
+                )
+            )
+        return query.filter(
+            exists()
+            .where(RecipeTag.recipe_id == Recipe.id, RecipeTag.tag_id.in_(tag_ids))
+        )
 
     async def get_related_instance_by_id(self, recipe_id: int) -> Recipe | None:
         recipe = await self.db.scalar(
             select(Recipe)
             .where(Recipe.id == recipe_id)
-            .options(
-                selectinload(Recipe.author),
-                selectinload(Recipe.tags).joinedload(RecipeTag.tag),
-                selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
-            )
+            .options(*self._related_options())
         )
         return recipe
 
+    async def get_version(self, recipe_id: int, request_user: User) -> RecipeVersion | None:
+        """
+        Версия рецепта для условного GET одним легким запросом:
+        updated_at рецепта и автора + флаги текущего пользователя.
+        """
+        version = await self.db.execute(
+            select(Recipe.updated_at, User.updated_at, Recipe.author_id)
+            .join(User, User.id == Recipe.author_id)
+            .where(Recipe.id == recipe_id)
+        )
+        row = version.first()
+        if row is None:
+            return None
+        updated_at, author_updated_at, author_id = row
+        relations = await get_user_relations(self.db, request_user.id)
+        return RecipeVersion(
+            updated_at=updated_at,
+            author_updated_at=author_updated_at,
+            is_favorited=recipe_id in relations.favorites,
+            is_in_shopping_cart=recipe_id in relations.shopping_cart,
+            is_subscribed=author_id in relations.subscriptions,
+        )
+
     async def delete_recipe(self, recipe: Recipe, request_user: User) -> bool:
         if recipe.author_id == request_user.id:
+            recipe_card_cache.pop(recipe.id)
+            get_loader(self.db, Recipe).forget(recipe.id)
             await self.db.delete(recipe)
-            await self.db.commit()
+            replace_media(self.db, media_prefix(RECIPES_DIR, recipe.author_id), recipe.image)
+            await change_counter(self.db, request_user, "recipes_count", -1)
+            await publish_changes(self.db, ("recipe", [recipe.id]), ("user", [request_user.id]))
             return True
         return False
 
     async def create_recipe(self, recipe_data: RecipeCreateSchema, request_user: User) -> Recipe:
-        tags = await self.db.scalars(select(Tag).where(Tag.id.in_(recipe_data.tags)))
-        ingredients = await self.db.scalars(
-            select(Ingredient)
-            .where(Ingredient.id.in_([ingredient.id for ingredient in recipe_data.ingredients]))
+        """
+        Рецепт со связями без коммита и без перечитывания: id и серверные значения
+        приходят из INSERT ... RETURNING, связи собираются из уже загруженных объектов.
+        Связи автора читаются до записи, ответ (`to_schema_from_related_instance`)
+        берет их из кэша.
+        """
+        await get_user_relations(self.db, request_user.id)
+        tags_instances = await get_loader(self.db, Tag).load_many(recipe_data.tags)
+        ingredients_instances = await get_loader(self.db, Ingredient).load_many(
+            ingredient.id for ingredient in recipe_data.ingredients
         )
-        tags_instances = tags.all()
-        ingredients_instances = ingredients.all()
 
         recipe = Recipe(
             author_id=request_user.id,
@@ -86,123 +246,286 @@ class RecipeRepository:
             cooking_time=recipe_data.cooking_time,
         )
         self.db.add(recipe)
-        await self.db.commit()
-        await self.db.refresh(recipe)
+        await self.db.flush()
+        set_committed_value(recipe, "author", request_user)
+        self._add_relation_objects(recipe, recipe_data, tags_instances, ingredients_instances)
+        await change_counter(self.db, request_user, "recipes_count", 1)
+        await self._fan_out(recipe, request_user)
+        await self.db.flush()
+        await publish_changes(self.db, ("user", [request_user.id]))
+        await publish_event(self.db, "recipe_created", {
+            "id": recipe.id,
+            "name": recipe.name,
+            "cooking_time": recipe.cooking_time,
+            "created_at": recipe.created_at.isoformat(),
+            "author": {"id": request_user.id, "username": request_user.username},
+        })
+        return recipe
 
-        recipe_tags = [RecipeTag(recipe_id=recipe.id, tag_id=tag.id) for tag in tags_instances]
-        self.db.add_all(recipe_tags)
-        await self.db.commit()
+    async def _fan_out(self, recipe: Recipe, author: User) -> None:
+        """
+        Лента подписчиков в той же транзакции, что и рецепт: у небольших авторов сразу,
+        у крупных фоновой задачей, у знаменитостей - никак (лента читает их рецепты сама).
+        """
+        feed_repository = FeedRepository(self.db)
+        if not author.followers_count or feed_repository.is_celebrity(author):
+            return
+        await self.db.flush()
+        if author.followers_count <= FEED_FANOUT_INLINE_MAX:
+            await feed_repository.fan_out(recipe.id, author.id)
+        else:
+            await enqueue(self.db, "feed_fan_out", {"recipe_id": recipe.id, "author_id": author.id})
 
-        added_ingredients = [
-            RecipeIngredient(
-                recipe_id=recipe.id,
-                ingredient_id=ingredient.id,
-                amount=next(
-                    request_ingredient.amount for request_ingredient in recipe_data.ingredients
-                    if request_ingredient.id == ingredient.id
+    async def to_schema_from_related_instance(
+        self,
+        recipe: Recipe,
+        request_user: User,
+    ) -> dict[str, Any]:
+        """Схема одного полностью загруженного рецепта, карточка в кэше обновляется."""
+        card = self._to_card(recipe)
+        author_card = self._to_author_card(recipe.author)
+        recipe_card_cache.set(recipe.id, (recipe.updated_at, card))
+        author_card_cache.set(recipe.author_id, (recipe.author.updated_at, author_card))
+        relations = await get_user_relations(self.db, request_user.id)
+        return self._overlay(card, author_card, relations)
+
+    async def to_schema_list(
+        self,
+        recipes: Sequence[Recipe],
+        request_user: User,
+    ) -> list[dict[str, Any]]:
+        """
+        Схемы страницы рецептов из `get_related_query_list`.
+
+        Общие для всех зрителей карточки (рецепт с тегами и ингредиентами, автор) берутся
+        из кэша по (id, updated_at), из БД догружаются только промахи. Флаги зрителя
+        накладываются поверх из закэшированных связей пользователя.
+        """
+        cards: dict[int, dict[str, Any]] = {}
+        missing_recipes = []
+        for recipe in recipes:
+            cached = recipe_card_cache.get(recipe.id)
+            if cached and cached[0] == recipe.updated_at:
+                cards[recipe.id] = cached[1]
+            else:
+                missing_recipes.append(recipe.id)
+
+        author_cards: dict[int, dict[str, Any]] = {}
+        if missing_recipes:
+            loaded = await self.db.scalars(
+                select(Recipe)
+                .where(Recipe.id.in_(missing_recipes))
+                .options(*self._related_options())
+                .execution_options(populate_existing=True)
+            )
+            for recipe in loaded.all():
+                cards[recipe.id] = self._to_card(recipe)
+                author_cards[recipe.author_id] = self._to_author_card(recipe.author)
+                recipe_card_cache.set(recipe.id, (recipe.updated_at, cards[recipe.id]))
+                author_card_cache.set(
+                    recipe.author_id,
+                    (recipe.author.updated_at, author_cards[recipe.author_id]),
                 )
+
+        missing_authors = set()
+        for recipe in recipes:
+            if recipe.author_id in author_cards:
+                continue
+            cached = author_card_cache.get(recipe.author_id)
+            if cached and cached[0] == recipe.author.updated_at:
+                author_cards[recipe.author_id] = cached[1]
+            else:
+                missing_authors.add(recipe.author_id)
+        if missing_authors:
+            authors = await self.db.scalars(
+                select(User)
+                .where(User.id.in_(missing_authors))
+                .execution_options(populate_existing=True)
             )
-            for ingredient in ingredients_instances
+            for author in authors.all():
+                author_cards[author.id] = self._to_author_card(author)
+                author_card_cache.set(author.id, (author.updated_at, author_cards[author.id]))
+
+        relations = await get_user_relations(self.db, request_user.id)
+        return [
+            self._overlay(cards[recipe.id], author_cards[recipe.author_id], relations)
+            for recipe in recipes
+            if recipe.id in cards
         ]
-        self.db.add_all(added_ingredients)
-        await self.db.commit()
-        await self.db.refresh(recipe)
-        return await self.get_related_instance_by_id(recipe.id)  # type: ignore
 
-    async def to_schema_from_related_instance(
+    async def to_sparse_schema_list(
         self,
-        recipe: Recipe,
+        recipes: Sequence[Recipe],
+        fields: dict[str, frozenset[str]],
         request_user: User,
-    ) -> dict[str, Any]:
-        data = {**recipe.__dict__}
-        following = await self.db.scalar(
-            select(UserSubscription)
-            .where(
-                UserSubscription.user_id == request_user.id,
-                UserSubscription.following_id == recipe.author.id,
+    ) -> list[dict[str, Any]]:
+        """Схемы страницы рецептов только с запрошенными полями, мимо кэша карточек."""
+        author_fields = fields.get("author", frozenset())
+        viewer_flags = {"is_favorited", "is_in_shopping_cart"} & fields.keys()
+        relations = None
+        if viewer_flags or "is_subscribed" in author_fields:
+            relations = await get_user_relations(self.db, request_user.id)
+        items = []
+        for recipe in recipes:
+            item = {name: getattr(recipe, name) for name in fields if name in RECIPE_COLUMNS}
+            if "tags" in fields:
+                item["tags"] = self._tags_data(recipe)
+            if "ingredients" in fields:
+                item["ingredients"] = self._ingredients_data(recipe)
+            if "author" in fields:
+                item["author"] = {
+                    name: getattr(recipe.author, name)
+                    for name in author_fields
+                    if name in AUTHOR_COLUMNS
+                }
+                if "is_subscribed" in author_fields:
+                    item["author"]["is_subscribed"] = (
+                        recipe.author_id in relations.subscriptions  # type: ignore
+                    )
+            if "is_favorited" in fields:
+                item["is_favorited"] = recipe.id in relations.favorites  # type: ignore
+            if "is_in_shopping_cart" in fields:
+                item["is_in_shopping_cart"] = recipe.id in relations.shopping_cart  # type: ignore
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _sparse_options(fields: dict[str, frozenset[str]]) -> list:
+        """Проекция и eager-загрузка только под запрошенные поля, прочие связи не грузятся."""
+        options: list = [
+            load_only(
+                Recipe.id,
+                Recipe.author_id,
+                *(column for name, column in RECIPE_COLUMNS.items() if name in fields),
+            ),
+        ]
+        if "author" in fields:
+            options.append(
+                selectinload(Recipe.author).load_only(
+                    User.id,
+                    *(
+                        column for name, column in AUTHOR_COLUMNS.items()
+                        if name in fields["author"]
+                    ),
+                )
             )
-        )
-        data.update({"author": {**recipe.author.__dict__, "is_subscribed": bool(following)}})
+        if "tags" in fields:
+            options.append(selectinload(Recipe.tags).joinedload(RecipeTag.tag))
+        if "ingredients" in fields:
+            options.append(
+                selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient)
+            )
+        return options
 
-        ingredients = await self.db.scalars(
-            select(Ingredient)
-            .where(Ingredient.id.in_([ing.ingredient_id for ing in recipe.ingredients]))
+    @staticmethod
+    def _related_options():
+        return (
+            selectinload(Recipe.author),
+            selectinload(Recipe.tags).joinedload(RecipeTag.tag),
+            selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
         )
-        response_ingredients = [
+
+    @staticmethod
+    def _to_card(recipe: Recipe) -> dict[str, Any]:
+        """Не зависящая от зрителя часть схемы рецепта."""
+        return {
+            "id": recipe.id,
+            "author_id": recipe.author_id,
+            "name": recipe.name,
+            "image": recipe.image,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+            "favorites_count": recipe.favorites_count,
+            "in_carts_count": recipe.in_carts_count,
+            "tags": RecipeRepository._tags_data(recipe),
+            "ingredients": RecipeRepository._ingredients_data(recipe),
+        }
+
+    @staticmethod
+    def _tags_data(recipe: Recipe) -> list[dict[str, Any]]:
+        return [
+            {"id": tag.id, "name": tag.name, "slug": tag.slug}
+            for tag in recipe.tag_list
+        ]
+
+    @staticmethod
+    def _ingredients_data(recipe: Recipe) -> list[dict[str, Any]]:
+        return [
             {
-                "id": ingredient.id,
-                "name": ingredient.name,
-                "measurement_unit": ingredient.measurement_unit,
-                "amount": next(
-                    ing.amount for ing in recipe.ingredients
-                    if ing.ingredient_id == ingredient.id
-                ),
+                "id": recipe_ingredient.ingredient.id,
+                "name": recipe_ingredient.ingredient.name,
+                "measurement_unit": recipe_ingredient.ingredient.measurement_unit,
+                "amount": recipe_ingredient.amount,
             }
-            for ingredient in ingredients.all()
+            for recipe_ingredient in recipe.ingredients
         ]
-        data.update({"ingredients": response_ingredients})
-        data.update({"tags": recipe.tag_list})
-
-        is_favorited = await self.db.scalar(
-            select(UserFavorites)
-            .where(
-                UserFavorites.user_id == request_user.id,
-                UserFavorites.recipe_id == recipe.id,
-            )
-        )
-        data.update({"is_favorited": bool(is_favorited)})
 
-        is_in_shopping_cart = await self.db.scalar(
-            select(UserShoppingList)
-            .where(
-                UserShoppingList.user_id == request_user.id,
-                UserShoppingList.recipe_id == recipe.id,
-            )
-        )
-        data.update({"is_in_shopping_cart": bool(is_in_shopping_cart)})
-        return data
+    @staticmethod
+    def _to_author_card(author: User) -> dict[str, Any]:
+        return {
+            "id": author.id,
+            "email": author.email,
+            "username": author.username,
+            "first_name": author.first_name,
+            "last_name": author.last_name,
+            "avatar": author.avatar,
+            "recipes_count": author.recipes_count,
+            "followers_count": author.followers_count,
+        }
+
+    @staticmethod
+    def _overlay(
+        card: dict[str, Any],
+        author_card: dict[str, Any],
+        relations: UserRelations,
+    ) -> dict[str, Any]:
+        return {
+            **card,
+            "author": {
+                **author_card,
+                "is_subscribed": author_card["id"] in relations.subscriptions,
+            },
+            "is_favorited": card["id"] in relations.favorites,
+            "is_in_shopping_cart": card["id"] in relations.shopping_cart,
+        }
 
     async def update_recipe_with_related_fields(
         self,
         recipe: Recipe,
         recipe_data: RecipeCreateSchema,
     ) -> Recipe:
-        tags = await self.db.scalars(select(Tag).where(Tag.id.in_(recipe_data.tags)))
-        ingredients = await self.db.scalars(
-            select(Ingredient)
-            .where(Ingredient.id.in_([ingredient.id for ingredient in recipe_data.ingredients]))
+        """`recipe` загружен со связями (`get_related_instance_by_id`), коммит - за вызывающим."""
+        tags_instances = await get_loader(self.db, Tag).load_many(recipe_data.tags)
+        ingredients_instances = await get_loader(self.db, Ingredient).load_many(
+            ingredient.id for ingredient in recipe_data.ingredients
         )
-        tags_instances = tags.all()
-        ingredients_instances = ingredients.all()
 
+        recipe_card_cache.pop(recipe.id)
+        replace_media(
+            self.db, media_prefix(RECIPES_DIR, recipe.author_id), recipe.image, recipe_data.image
+        )
         await self._delete_relation_objects(recipe)
-        await self.db.refresh(recipe)
-
-        recipe.name = recipe_data.name
-        recipe.image = recipe_data.image
-        recipe.text = recipe_data.text
-        recipe.cooking_time = recipe_data.cooking_time
-        self.db.add(recipe)
-        await self.db.commit()
-
-        new_recipe_tags = [RecipeTag(recipe_id=recipe.id, tag_id=tag.id) for tag in tags_instances]
-        self.db.add_all(new_recipe_tags)
-        await self.db.commit()
+        self._add_relation_objects(recipe, recipe_data, tags_instances, ingredients_instances)
 
-        new_recipe_ingredients = [
-            RecipeIngredient(
-                recipe_id=recipe.id,
-                ingredient_id=ingredient.id,
-                amount=next(
-                    request_ingredient.amount for request_ingredient in recipe_data.ingredients
-                    if request_ingredient.id == ingredient.id
-                )
-            )
-            for ingredient in ingredients_instances
-        ]
-        self.db.add_all(new_recipe_ingredients)
-        await self.db.commit()
-        await self.db.refresh(recipe)
+        values = {
+            "name": recipe_data.name,
+            "image": recipe_data.image,
+            "text": recipe_data.text,
+            "cooking_time": recipe_data.cooking_time,
+        }
+        # Теги и ингредиенты живут в других таблицах, версию рецепта двигаем явно.
+        # Новый updated_at берем из RETURNING, объект в сессии обновляем сами.
+        updated_at = await self.db.scalar(
+            update(Recipe)
+            .where(Recipe.id == recipe.id)
+            .values(**values, updated_at=func.now())
+            .returning(Recipe.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        for key, value in {**values, "updated_at": updated_at}.items():
+            set_committed_value(recipe, key, value)
+        await self.db.flush()
+        await publish_changes(self.db, ("recipe", [recipe.id]))
         return recipe
 
     async def _delete_relation_objects(self, recipe: Recipe) -> None:
@@ -211,4 +534,36 @@ class RecipeRepository:
             delete(RecipeIngredient)
             .where(RecipeIngredient.recipe_id == recipe.id)
         )
-        await self.db.commit()
+
+    def _add_relation_objects(
+        self,
+        recipe: Recipe,
+        recipe_data: RecipeCreateSchema,
+        tags: Sequence[Tag],
+        ingredients: Sequence[Ingredient],
+    ) -> None:
+        """
+        Новые строки связей в сессию. Коллекции рецепта выставляются без истории изменений
+        (`set_committed_value`): схема строится из них без перечитывания, а flush не пытается
+        удалить прежние строки, уже удаленные `_delete_relation_objects`.
+        """
+        amounts: dict[int, int] = {}
+        for request_ingredient in recipe_data.ingredients:
+            amounts.setdefault(request_ingredient.id, request_ingredient.amount)
+        recipe_tags = []
+        for tag in tags:
+            recipe_tag = RecipeTag(recipe_id=recipe.id, tag_id=tag.id)
+            set_committed_value(recipe_tag, "tag", tag)
+            recipe_tags.append(recipe_tag)
+        recipe_ingredients = []
+        for ingredient in ingredients:
+            recipe_ingredient = RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id,
+                amount=amounts[ingredient.id],
+            )
+            set_committed_value(recipe_ingredient, "ingredient", ingredient)
+            recipe_ingredients.append(recipe_ingredient)
+        set_committed_value(recipe, "tags", recipe_tags)
+        set_committed_value(recipe, "ingredients", recipe_ingredients)
+        self.db.add_all([*recipe_tags, *recipe_ingredients])
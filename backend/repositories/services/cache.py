@@ -0,0 +1,175 @@
+"""
+Внутрипроцессные кэши репозиториев.
+
+Кэши живут в памяти одного воркера uvicorn и используются только из event loop,
+поэтому блокировки не нужны. Устаревание ограничивается TTL, изменения из других
+воркеров приходят через ленту изменений (`repositories.services.changes`).
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterable, Iterator
+
+from foodgram_fastapi.settings import (
+    TAG_CACHE_MAXSIZE,
+    TAG_CACHE_TTL,
+    RECIPE_CARD_CACHE_MAXSIZE,
+    RECIPE_CARD_CACHE_MAXBYTES,
+    AUTHOR_CARD_CACHE_MAXSIZE,
+    AUTHOR_CARD_CACHE_MAXBYTES,
+    USER_RELATIONS_CACHE_MAXSIZE,
+    USER_RELATIONS_CACHE_TTL,
+)
+from repositories.services.changes import on_change, on_reset
+
+
+class LRUCache:
+    """
+    LRU кэш фиксированного размера с необязательным TTL записей.
+
+    С `maxbytes` размер ограничен еще и суммой `sizeof(value)` записей: для значений,
+    размер которых сильно разнится (карточки с base64 изображениями). Значение больше
+    `maxbytes` не кэшируется.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        maxbytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value, _ = item
+        if expires_at < monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value) if self.maxbytes is not None and self.sizeof else 0
+        self.pop(key)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        expires_at = monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._data[key] = (expires_at, value, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.maxbytes is not None and self.bytes > self.maxbytes
+        ):
+            self.bytes -= self._data.popitem(last=False)[1][2]
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self.bytes -= item[2]
+        return item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class IntSet:
+    """Множество id на отсортированном массиве int64: 8 байт на элемент против ~60 у set."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items: Iterable[int] = ()) -> None:
+        self._items = array("q", sorted(set(items)))
+
+    def __contains__(self, value: object) -> bool:
+        index = bisect_left(self._items, value)  # type: ignore
+        return index < len(self._items) and self._items[index] == value
+
+    def add(self, value: int) -> None:
+        index = bisect_left(self._items, value)
+        if index == len(self._items) or self._items[index] != value:
+            self._items.insert(index, value)
+
+    def discard(self, value: int) -> None:
+        index = bisect_left(self._items, value)
+        if index < len(self._items) and self._items[index] == value:
+            del self._items[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class UserRelations:
+    """Избранное, корзина и подписки одного пользователя."""
+
+    __slots__ = ("favorites", "shopping_cart", "subscriptions")
+
+    def __init__(
+        self,
+        favorites: Iterable[int] = (),
+        shopping_cart: Iterable[int] = (),
+        subscriptions: Iterable[int] = (),
+    ) -> None:
+        self.favorites = IntSet(favorites)
+        self.shopping_cart = IntSet(shopping_cart)
+        self.subscriptions = IntSet(subscriptions)
+
+    @property
+    def size(self) -> int:
+        return len(self.favorites) + len(self.shopping_cart) + len(self.subscriptions)
+
+
+# slug тега -> id тега.
+tag_slug_cache = LRUCache(maxsize=TAG_CACHE_MAXSIZE, ttl=TAG_CACHE_TTL)
+
+# Накладные расходы карточки (словари, списки тегов и ингредиентов) сверх строк.
+CARD_OVERHEAD = 2048
+
+
+def card_size(entry: tuple[Any, dict[str, Any]]) -> int:
+    """Примерный размер карточки: base64 изображение или аватар может весить мегабайты."""
+    _, card = entry
+    return CARD_OVERHEAD + sum(len(value) for value in card.values() if isinstance(value, str))
+
+
+# id рецепта -> (updated_at, карточка рецепта без флагов зрителя).
+recipe_card_cache = LRUCache(
+    maxsize=RECIPE_CARD_CACHE_MAXSIZE, maxbytes=RECIPE_CARD_CACHE_MAXBYTES, sizeof=card_size
+)
+
+# id автора -> (updated_at, карточка автора без is_subscribed).
+author_card_cache = LRUCache(
+    maxsize=AUTHOR_CARD_CACHE_MAXSIZE, maxbytes=AUTHOR_CARD_CACHE_MAXBYTES, sizeof=card_size
+)
+
+# id пользователя -> UserRelations.
+user_relations_cache = LRUCache(maxsize=USER_RELATIONS_CACHE_MAXSIZE, ttl=USER_RELATIONS_CACHE_TTL)
+
+
+on_change("recipe", recipe_card_cache.pop)
+on_change("user", author_card_cache.pop)
+on_change("user", user_relations_cache.pop)
+# Ключ кэша - slug, а не id: сбрасываем целиком, теги меняются редко.
+on_change("tag", lambda tag_id: tag_slug_cache.clear())
+for cache in (tag_slug_cache, recipe_card_cache, author_card_cache, user_relations_cache):
+    on_reset(cache.clear)
@@ -0,0 +1,231 @@
+"""
+Лента изменений сущностей для инвалидации кэшей во всех воркерах.
+
+Репозитории публикуют `(сущность, id, версия)` в той же транзакции, что и само изменение:
+строка в `entity_versions` + `pg_notify`. Postgres доставляет уведомление только после
+коммита, откаченная транзакция не публикует ничего.
+
+Каждый воркер держит одно отдельное соединение asyncpg с LISTEN (`ChangeListener`,
+запускается в lifespan приложения) и вызывает зарегистрированные через `on_change`
+инвалидаторы. Свои изменения воркер по умолчанию пропускает - свои кэши репозитории
+обновляют сами.
+После обрыва соединения пропущенное находится по `entity_versions.changed_at`,
+а если пропущено слишком много - кэши сбрасываются целиком (`on_reset`).
+
+По тому же каналу ходят события (`publish_event` / `on_event`) - они доставляются всем
+воркерам, включая источник, но не сохраняются: пропущенные при обрыве теряются.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from collections import defaultdict
+from typing import Callable, Iterable
+
+import asyncpg
+from sqlalchemy import Integer, String, TEXT, cast, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    DATABASE_URL,
+    CHANGES_CHANNEL,
+    CHANGES_KEEPALIVE,
+    CHANGES_RECONNECT_DELAY,
+    CHANGES_RESYNC_MARGIN,
+    CHANGES_RESYNC_LIMIT,
+)
+from models.change import EntityVersion, entity_version_seq
+
+
+logger = logging.getLogger("changes")
+
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+_invalidators: dict[str, list[tuple[Callable[[int], object], bool]]] = defaultdict(list)
+_resets: list[Callable[[], object]] = []
+_handlers: dict[str, list[Callable[[dict], object]]] = defaultdict(list)
+
+
+def on_change(entity: str, invalidate: Callable[[int], object], own: bool = False) -> None:
+    """
+    `invalidate(id)` при изменении сущности `entity` в другом воркере,
+    с `own=True` - и в этом (после коммита).
+    """
+    _invalidators[entity].append((invalidate, own))
+
+
+def on_reset(reset: Callable[[], object]) -> None:
+    """`reset()`, когда пропущенные изменения не восстановить по одному."""
+    _resets.append(reset)
+
+
+def on_event(event: str, handler: Callable[[dict], object]) -> None:
+    """`handler(data)` на событие `event` из любого воркера."""
+    _handlers[event].append(handler)
+
+
+async def publish_changes(db: AsyncSession, *changes: tuple[str, Iterable[int]]) -> None:
+    """
+    Публикация изменений `(сущность, ids)` в текущей транзакции, без коммита.
+    Строки версий блокируются до конца транзакции, поэтому id сортируются.
+    """
+    pairs = sorted({(entity, entity_id) for entity, ids in changes for entity_id in ids})
+    if not pairs:
+        return
+    entities, entity_ids = zip(*pairs)
+    change = func.unnest(
+        cast(list(entities), ARRAY(String)),
+        cast(list(entity_ids), ARRAY(Integer)),
+    ).table_valued("entity", "entity_id").render_derived(name="change")
+    upsert = insert(EntityVersion).from_select(
+        ["entity", "entity_id", "version", "changed_at"],
+        select(change.c.entity, change.c.entity_id, entity_version_seq.next_value(), func.now()),
+    )
+    changed = (
+        upsert.on_conflict_do_update(
+            index_elements=[EntityVersion.entity, EntityVersion.entity_id],
+            set_={"version": upsert.excluded.version, "changed_at": upsert.excluded.changed_at},
+        )
+        .returning(EntityVersion.entity, EntityVersion.entity_id, EntityVersion.version)
+        .cte("changed")
+    )
+    payload = func.json_build_array(
+        ORIGIN, changed.c.entity, changed.c.entity_id, changed.c.version
+    )
+    await db.execute(
+        select(func.count(func.pg_notify(CHANGES_CHANNEL, cast(payload, TEXT))))
+        .select_from(changed)
+    )
+
+
+async def publish_event(db: AsyncSession, event: str, data: dict) -> None:
+    """Событие уходит после коммита текущей транзакции. Payload NOTIFY - до 8000 байт."""
+    payload = json.dumps({"origin": ORIGIN, "event": event, "data": data}, ensure_ascii=False)
+    await db.execute(select(func.pg_notify(CHANGES_CHANNEL, payload)))
+
+
+def _dispatch(entity: str, entity_id: int, own: bool = False) -> None:
+    for invalidate, with_own in _invalidators.get(entity, ()):
+        if own and not with_own:
+            continue
+        try:
+            invalidate(entity_id)
+        except Exception:
+            logger.exception("Инвалидатор %s упал на id %s", entity, entity_id)
+
+
+def _dispatch_event(event: str, data: dict) -> None:
+    for handler in _handlers.get(event, ()):
+        try:
+            handler(data)
+        except Exception:
+            logger.exception("Обработчик события %s упал", event)
+
+
+def _reset() -> None:
+    metrics.inc("changes.resets")
+    for reset in _resets:
+        try:
+            reset()
+        except Exception:
+            logger.exception("Сброс кэша упал")
+
+
+class ChangeListener:
+    """Отдельное соединение с LISTEN, переподключение и досинхронизация после обрыва."""
+
+    def __init__(self) -> None:
+        self.dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._task: asyncio.Task[None] | None = None
+        # Время БД, когда соединение последний раз было живо (None - еще не подключались).
+        self._alive_at = None
+        self.connected = False
+        metrics.gauge("changes.connected", lambda: float(self.connected))
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="changes")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn, timeout=CHANGES_KEEPALIVE)
+            except (OSError, asyncpg.PostgresError, TimeoutError) as error:
+                logger.warning("LISTEN: нет соединения: %s", error)
+                await asyncio.sleep(CHANGES_RECONNECT_DELAY)
+                continue
+            try:
+                await self._listen(connection)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, TimeoutError) as error:
+                logger.warning("LISTEN: соединение потеряно: %s", error)
+            finally:
+                self.connected = False
+                connection.terminate()
+            metrics.inc("changes.reconnects")
+            await asyncio.sleep(CHANGES_RECONNECT_DELAY)
+
+    async def _listen(self, connection: asyncpg.Connection) -> None:
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        # Сначала LISTEN, потом досинхронизация: изменения между ними придут дважды, а не ни разу.
+        await connection.add_listener(CHANGES_CHANNEL, self._on_notification)
+        await self._resync(connection)
+        self.connected = True
+        while not closed.is_set():
+            try:
+                await asyncio.wait_for(closed.wait(), CHANGES_KEEPALIVE)
+            except TimeoutError:
+                self._alive_at = await connection.fetchval(
+                    "SELECT now()", timeout=CHANGES_KEEPALIVE
+                )
+
+    async def _resync(self, connection: asyncpg.Connection) -> None:
+        alive_at, self._alive_at = self._alive_at, await connection.fetchval("SELECT now()")
+        if alive_at is None:
+            # Первое подключение: кэши процесса еще пустые.
+            return
+        changed = await connection.fetch(
+            "SELECT entity, entity_id FROM entity_versions "
+            "WHERE changed_at > $1 - make_interval(secs => $2) LIMIT $3",
+            alive_at,
+            CHANGES_RESYNC_MARGIN,
+            CHANGES_RESYNC_LIMIT + 1,
+        )
+        if len(changed) > CHANGES_RESYNC_LIMIT:
+            _reset()
+            return
+        metrics.inc("changes.resynced", len(changed))
+        for entity, entity_id in changed:
+            _dispatch(entity, entity_id)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            if isinstance(message, dict):
+                event, data = message["event"], message["data"]
+            else:
+                origin, entity, entity_id, _ = message
+        except (ValueError, KeyError, TypeError):
+            logger.warning("LISTEN: непонятное уведомление %r", payload)
+            return
+        if isinstance(message, dict):
+            metrics.inc("changes.events")
+            _dispatch_event(event, data)
+            return
+        metrics.inc("changes.received")
+        _dispatch(entity, entity_id, own=origin == ORIGIN)
+
+
+change_listener = ChangeListener()
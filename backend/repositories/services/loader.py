@@ -0,0 +1,94 @@
+"""
+Батчевая загрузка сущностей по id в рамках сессии запроса (DataLoader).
+
+Вызовы `load(id)`, сделанные за один проход event loop (например, из `asyncio.gather`
+или из вложенной сериализации), собираются и выполняются одним запросом
+`WHERE id = ANY(:ids)` на тип сущности. Загруженное запоминается до конца сессии,
+повторные `load` того же id в БД не ходят.
+
+Загрузчики хранятся в `session.info`, поэтому живут столько же, сколько сессия запроса.
+Пока загрузчик ждет ответа, сессию нельзя использовать параллельно другими запросами -
+как и любую AsyncSession.
+"""
+
+import asyncio
+from typing import Any, Generic, Iterable, TypeVar
+
+from sqlalchemy import Integer, select, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+T = TypeVar("T")
+
+
+class EntityLoader(Generic[T]):
+
+    def __init__(self, db: AsyncSession, model: type[T]) -> None:
+        self.db = db
+        self.model = model
+        self._memo: dict[int, T | None] = {}
+        self._pending: dict[int, asyncio.Future[T | None]] = {}
+        self._fetching: set[asyncio.Task[None]] = set()
+
+    async def load(self, entity_id: int) -> T | None:
+        if entity_id in self._memo:
+            return self._memo[entity_id]
+        future = self._pending.get(entity_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = self._pending[entity_id] = loop.create_future()
+        return await future
+
+    async def load_many(self, entity_ids: Iterable[int]) -> list[T]:
+        """
+        Найденные сущности в порядке первого появления id в `entity_ids`, без повторов;
+        отсутствующие пропускаются.
+        """
+        entities = await asyncio.gather(
+            *(self.load(entity_id) for entity_id in dict.fromkeys(entity_ids))
+        )
+        return [entity for entity in entities if entity is not None]
+
+    def prime(self, entity: Any) -> None:
+        self._memo[entity.id] = entity
+
+    def forget(self, entity_id: int) -> None:
+        self._memo.pop(entity_id, None)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._fetch(batch))
+        self._fetching.add(task)
+        task.add_done_callback(self._fetching.discard)
+
+    async def _fetch(self, batch: dict[int, asyncio.Future[T | None]]) -> None:
+        try:
+            entities = await self.db.scalars(
+                select(self.model)
+                .where(
+                    self.model.id == any_(  # type: ignore
+                        bindparam("entity_ids", list(batch), type_=ARRAY(Integer))
+                    )
+                )
+            )
+            found = {entity.id: entity for entity in entities.all()}  # type: ignore
+        except Exception as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for entity_id, future in batch.items():
+            entity = found.get(entity_id)
+            self._memo[entity_id] = entity
+            if not future.done():
+                future.set_result(entity)
+
+
+def get_loader(db: AsyncSession, model: type[T]) -> EntityLoader[T]:
+    loaders: dict[type, EntityLoader] = db.info.setdefault("loaders", {})
+    if model not in loaders:
+        loaders[model] = EntityLoader(db, model)
+    return loaders[model]
@@ -0,0 +1,66 @@
+"""
+Связи пользователя (избранное, корзина, подписки) для вычисления флагов `is_*` в памяти.
+
+Загружаются одним запросом и кэшируются в `user_relations_cache`, репозитории
+обновляют закэшированные множества на месте после коммита.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from foodgram_fastapi.settings import USER_RELATIONS_MAX_ITEMS
+from models.user import (
+    UserFavorites,
+    UserShoppingList,
+    UserSubscription,
+)
+from repositories.services.cache import UserRelations, user_relations_cache
+
+
+async def get_user_relations(db: AsyncSession, user_id: int) -> UserRelations:
+    """
+    Связи пользователя из кэша или из БД.
+    Если связей больше USER_RELATIONS_MAX_ITEMS, результат не кэшируется.
+    """
+    relations = user_relations_cache.get(user_id)
+    if relations is not None:
+        return relations
+    loaded = await db.execute(
+        select(
+            select(func.array_agg(UserFavorites.recipe_id))
+            .where(UserFavorites.user_id == user_id)
+            .scalar_subquery(),
+            select(func.array_agg(UserShoppingList.recipe_id))
+            .where(UserShoppingList.user_id == user_id)
+            .scalar_subquery(),
+            select(func.array_agg(UserSubscription.following_id))
+            .where(UserSubscription.user_id == user_id)
+            .scalar_subquery(),
+        )
+    )
+    relations = UserRelations(*(ids or () for ids in loaded.one()))
+    if relations.size <= USER_RELATIONS_MAX_ITEMS:
+        user_relations_cache.set(user_id, relations)
+    return relations
+
+
+def update_cached_relations(
+    user_id: int,
+    relation: str,
+    added: tuple[int, ...] | list[int] = (),
+    removed: tuple[int, ...] | list[int] = (),
+) -> None:
+    """
+    Обновление закэшированного множества `relation` (favorites | shopping_cart | subscriptions).
+    Вызывать только после коммита (`alchemy.db_depends.on_commit`).
+    """
+    relations = user_relations_cache.get(user_id)
+    if relations is None:
+        return
+    ids = getattr(relations, relation)
+    for value in added:
+        ids.add(value)
+    for value in removed:
+        ids.discard(value)
+    if relations.size > USER_RELATIONS_MAX_ITEMS:
+        user_relations_cache.pop(user_id)
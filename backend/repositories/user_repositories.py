@@ -1,8 +1,23 @@
-from sqlalchemy import select, func, case
+from datetime import datetime
+from functools import partial
+from typing import NamedTuple
+
+from sqlalchemy import (
+    Integer,
+    select,
+    update,
+    delete,
+    func,
+    literal,
+    any_,
+    bindparam,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine.row import Row
 
+from alchemy.db_depends import on_commit
 from models.user import (
     User,
     UserFavorites,
@@ -10,7 +25,13 @@ from models.user import (
     UserSubscription,
 )
 from models.recipe import Recipe
+from repositories.counter_repositories import change_counter
+from repositories.feed_repositories import FeedRepository
+from repositories.services.changes import publish_changes
+from repositories.services.loader import get_loader
+from repositories.services.relations import get_user_relations, update_cached_relations
 from routers.services.security import crypt_password, verify_password
+from routers.services.uploads import AVATARS_DIR, media_prefix, replace_media
 from schemas.user import (
     UserCreationSchema,
     UserAvatarSchema,
@@ -18,6 +39,133 @@ from schemas.user import (
 )
 
 
+# Поля RecipeSimpleRetriveSchema.
+_RECIPE_SIMPLE_COLUMNS = (Recipe.id, Recipe.name, Recipe.image, Recipe.cooking_time)
+
+
+def _add_relations_statement(
+    relation_model,
+    target_model,
+    target_field: str,
+    counter: str,
+    user_id: int,
+    target_ids: list[int],
+    columns: tuple,
+    *conditions,
+):
+    """
+    Связи пользователя одним запросом:
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING + инкремент счетчика в CTE.
+    Отдает `columns` существующих целей и флаг `added` - создана ли связь.
+    """
+    ids = any_(bindparam("target_ids", target_ids, type_=ARRAY(Integer)))
+    inserted = (
+        insert(relation_model)
+        .from_select(
+            ["user_id", target_field],
+            select(literal(user_id), target_model.id)
+            .where(target_model.id == ids, *conditions),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", target_field])
+        .returning(getattr(relation_model, target_field))
+        .cte("inserted")
+    )
+    inserted_ids = select(inserted.c[target_field])
+    counted = (
+        update(target_model)
+        .where(target_model.id.in_(inserted_ids))
+        .values({counter: getattr(target_model, counter) + 1})
+        .returning(target_model.id)
+        .cte("counted")
+    )
+    return (
+        select(*columns, target_model.id.in_(inserted_ids).label("added"))
+        .where(target_model.id == ids)
+        .add_cte(counted)
+    )
+
+
+async def _bulk_add_relations(
+    db: AsyncSession,
+    relation_model,
+    target_model,
+    target_field: str,
+    counter: str,
+    user_id: int,
+    target_ids: list[int],
+    *conditions,
+) -> dict[int, bool]:
+    """{id цели: создана ли связь}, несуществующих целей в ответе нет."""
+    result = await db.execute(
+        _add_relations_statement(
+            relation_model, target_model, target_field, counter,
+            user_id, target_ids, (target_model.id,), *conditions,
+        )
+    )
+    return dict(result.tuples().all())
+
+
+async def _bulk_delete_relations(
+    db: AsyncSession,
+    relation_model,
+    target_model,
+    target_field: str,
+    counter: str,
+    user_id: int,
+    target_ids: list[int],
+) -> set[int]:
+    """Удаление пачки связей: DELETE ... RETURNING + декремент счетчика в CTE."""
+    target_column = getattr(relation_model, target_field)
+    ids = any_(bindparam("target_ids", target_ids, type_=ARRAY(Integer)))
+    deleted = (
+        delete(relation_model)
+        .where(relation_model.user_id == user_id, target_column == ids)
+        .returning(target_column)
+        .cte("deleted")
+    )
+    counted = (
+        update(target_model)
+        .where(target_model.id.in_(select(deleted.c[target_field])))
+        .values({counter: getattr(target_model, counter) - 1})
+        .returning(target_model.id)
+        .cte("counted")
+    )
+    result = await db.scalars(select(deleted.c[target_field]).add_cte(counted))
+    return set(result.all())
+
+
+async def _publish_recipes(db: AsyncSession, request_user: User, recipe_ids) -> None:
+    """Изменились связи пользователя и счетчики рецептов."""
+    if recipe_ids:
+        await publish_changes(db, ("user", [request_user.id]), ("recipe", recipe_ids))
+
+
+def _bulk_add_statuses(target_ids: list[int], added: dict[int, bool]) -> list[dict]:
+    return [
+        {
+            "id": target_id,
+            "status": (
+                "not_found" if target_id not in added
+                else "added" if added[target_id]
+                else "exists"
+            ),
+        }
+        for target_id in target_ids
+    ]
+
+
+def _bulk_delete_statuses(target_ids: list[int], removed: set[int]) -> list[dict]:
+    return [
+        {"id": target_id, "status": "removed" if target_id in removed else "not_found"}
+        for target_id in target_ids
+    ]
+
+
+class UserVersion(NamedTuple):
+    updated_at: datetime
+    is_subscribed: bool
+
+
 class UserRepository:
     """Репозиторий работы с пользователями."""
 
@@ -33,44 +181,48 @@ class UserRepository:
             last_name=user_data.last_name,
         )
         self.db.add(user)
-        await self.db.commit()
-        await self.db.refresh(user)
+        # id и серверные значения приходят из INSERT ... RETURNING (eager_defaults).
+        await self.db.flush()
         return user
 
     async def get_user_by_id(
         self,
         user_id: int,
         request_user: User,
-    ) -> Row[tuple[User, bool]] | None:
-        query = (
-            select(
-                User,
-                case((UserSubscription.user_id.isnot(None), True), else_=False)
-                .label("is_subscribed")
-            )
-            .outerjoin(
-                UserSubscription,
-                (User.id == UserSubscription.following_id)
-                & (UserSubscription.user_id == request_user.id)
-            )
-            .options(selectinload(User.subscriptions))
-            .where(User.id == user_id)
-            .distinct()
+    ) -> tuple[User, bool] | None:
+        user = await get_loader(self.db, User).load(user_id)
+        if user is None:
+            return None
+        relations = await get_user_relations(self.db, request_user.id)
+        return user, user.id in relations.subscriptions
+
+    async def get_version(self, user_id: int, request_user: User) -> UserVersion | None:
+        """Версия пользователя для условного GET: updated_at + подписан ли текущий пользователь."""
+        updated_at = await self.db.scalar(select(User.updated_at).where(User.id == user_id))
+        if updated_at is None:
+            return None
+        relations = await get_user_relations(self.db, request_user.id)
+        return UserVersion(
+            updated_at=updated_at,
+            is_subscribed=user_id in relations.subscriptions,
         )
-        user_q = await self.db.execute(query)
-        return user_q.first()
 
     async def add_avatar(self, user: User, avatar_data: UserAvatarSchema) -> UserAvatarSchema:
+        replace_media(
+            self.db, media_prefix(AVATARS_DIR, user.id), user.avatar, avatar_data.avatar
+        )
         user.avatar = avatar_data.avatar
         self.db.add(user)
-        await self.db.commit()
-        await self.db.refresh(user)
+        await self.db.flush()
+        await publish_changes(self.db, ("user", [user.id]))
         return avatar_data
 
     async def delete_avatar(self, user: User) -> None:
+        replace_media(self.db, media_prefix(AVATARS_DIR, user.id), user.avatar)
         user.avatar = None
         self.db.add(user)
-        await self.db.commit()
+        await self.db.flush()
+        await publish_changes(self.db, ("user", [user.id]))
 
     async def change_user_password(
         self,
@@ -80,7 +232,8 @@ class UserRepository:
         if verify_password(password_data.current_password, user.password):
             user.password = crypt_password(password_data.new_password)
             self.db.add(user)
-            await self.db.commit()
+            await self.db.flush()
+            await publish_changes(self.db, ("user", [user.id]))
             return True
         return False
 
@@ -90,28 +243,18 @@ class UserRepository:
         return await self.db.scalar(select(func.count()).select_from(User))
 
     async def get_all_instanses_limit_offset(self, request_user: User, limit: int, offset: int):
-        query = (
-            select(
-                User,
-                case((UserSubscription.user_id.isnot(None), True), else_=False)
-                .label("is_subscribed")
-            )
-            .outerjoin(
-                UserSubscription,
-                (User.id == UserSubscription.following_id)
-                & (UserSubscription.user_id == request_user.id)
-            )
-            .options(selectinload(User.subscriptions))
-            .distinct()
+        all_users = await self.db.scalars(
+            select(User)
+            .order_by(User.id)
             .limit(limit)
             .offset(offset)
         )
-        all_users = await self.db.execute(query)
-        return all_users.all()
+        relations = await get_user_relations(self.db, request_user.id)
+        return [(user, user.id in relations.subscriptions) for user in all_users.all()]
 
     async def to_shema(
         self,
-        query_result: Row[tuple[User, bool]] | list[Row[tuple[User, bool]]],
+        query_result: tuple[User, bool] | list[tuple[User, bool]],
         many: bool = False,
     ):
         if many:
@@ -141,28 +284,58 @@ class UserShoppingListRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def add_recipe_to_shopping_list(self, request_user: User, recipe: Recipe) -> Recipe:
-        shopping_list = UserShoppingList(
-            user_id=request_user.id,
-            recipe_id=recipe.id,
+    async def add_recipe_to_shopping_list(self, request_user: User, recipe_id: int) -> Row | None:
+        """
+        Добавление в корзину одним запросом. None - рецепта нет,
+        `added` == False - рецепт уже в корзине.
+        """
+        result = await self.db.execute(
+            _add_relations_statement(
+                UserShoppingList, Recipe, "recipe_id", "in_carts_count",
+                request_user.id, [recipe_id], _RECIPE_SIMPLE_COLUMNS,
+            )
         )
-        self.db.add(shopping_list)
-        await self.db.commit()
+        recipe = result.first()
+        if recipe and recipe.added:
+            await publish_changes(self.db, ("user", [request_user.id]), ("recipe", [recipe_id]))
+            on_commit(self.db, partial(
+                update_cached_relations, request_user.id, "shopping_cart", added=[recipe_id],
+            ))
         return recipe
 
-    async def delete_recipe_from_shopping_list(self, request_user: User, recipe: Recipe) -> bool:
-        shopping_list = await self.db.scalar(
-            select(UserShoppingList)
-            .where(
-                UserShoppingList.user_id == request_user.id,
-                UserShoppingList.recipe_id == recipe.id,
-            )
+    async def delete_recipe_from_shopping_list(self, request_user: User, recipe_id: int) -> bool:
+        removed = await _bulk_delete_relations(
+            self.db, UserShoppingList, Recipe, "recipe_id", "in_carts_count",
+            request_user.id, [recipe_id],
         )
-        if shopping_list:
-            await self.db.delete(shopping_list)
-            await self.db.commit()
-            return True
-        return False
+        await _publish_recipes(self.db, request_user, removed)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "shopping_cart", removed=list(removed),
+        ))
+        return bool(removed)
+
+    async def add_recipes_bulk(self, request_user: User, recipe_ids: list[int]) -> list[dict]:
+        added = await _bulk_add_relations(
+            self.db, UserShoppingList, Recipe, "recipe_id", "in_carts_count",
+            request_user.id, recipe_ids,
+        )
+        added_ids = [recipe_id for recipe_id, is_added in added.items() if is_added]
+        await _publish_recipes(self.db, request_user, added_ids)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "shopping_cart", added=added_ids,
+        ))
+        return _bulk_add_statuses(recipe_ids, added)
+
+    async def delete_recipes_bulk(self, request_user: User, recipe_ids: list[int]) -> list[dict]:
+        removed = await _bulk_delete_relations(
+            self.db, UserShoppingList, Recipe, "recipe_id", "in_carts_count",
+            request_user.id, recipe_ids,
+        )
+        await _publish_recipes(self.db, request_user, removed)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "shopping_cart", removed=list(removed),
+        ))
+        return _bulk_delete_statuses(recipe_ids, removed)
 
 
 class UserFavoritesRepository:
@@ -171,28 +344,58 @@ class UserFavoritesRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def add_recipe_to_shopping_list(self, request_user: User, recipe: Recipe) -> Recipe:
-        favorite_list = UserFavorites(
-            user_id=request_user.id,
-            recipe_id=recipe.id,
+    async def add_recipe_to_shopping_list(self, request_user: User, recipe_id: int) -> Row | None:
+        """
+        Добавление в избранное одним запросом. None - рецепта нет,
+        `added` == False - рецепт уже в избранном.
+        """
+        result = await self.db.execute(
+            _add_relations_statement(
+                UserFavorites, Recipe, "recipe_id", "favorites_count",
+                request_user.id, [recipe_id], _RECIPE_SIMPLE_COLUMNS,
+            )
         )
-        self.db.add(favorite_list)
-        await self.db.commit()
+        recipe = result.first()
+        if recipe and recipe.added:
+            await publish_changes(self.db, ("user", [request_user.id]), ("recipe", [recipe_id]))
+            on_commit(self.db, partial(
+                update_cached_relations, request_user.id, "favorites", added=[recipe_id],
+            ))
         return recipe
 
-    async def delete_recipe_from_shopping_list(self, request_user: User, recipe: Recipe) -> bool:
-        favorite_list = await self.db.scalar(
-            select(UserFavorites)
-            .where(
-                UserFavorites.user_id == request_user.id,
-                UserFavorites.recipe_id == recipe.id
-            )
+    async def delete_recipe_from_shopping_list(self, request_user: User, recipe_id: int) -> bool:
+        removed = await _bulk_delete_relations(
+            self.db, UserFavorites, Recipe, "recipe_id", "favorites_count",
+            request_user.id, [recipe_id],
         )
-        if favorite_list:
-            await self.db.delete(favorite_list)
-            await self.db.commit()
-            return True
-        return False
+        await _publish_recipes(self.db, request_user, removed)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "favorites", removed=list(removed),
+        ))
+        return bool(removed)
+
+    async def add_recipes_bulk(self, request_user: User, recipe_ids: list[int]) -> list[dict]:
+        added = await _bulk_add_relations(
+            self.db, UserFavorites, Recipe, "recipe_id", "favorites_count",
+            request_user.id, recipe_ids,
+        )
+        added_ids = [recipe_id for recipe_id, is_added in added.items() if is_added]
+        await _publish_recipes(self.db, request_user, added_ids)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "favorites", added=added_ids,
+        ))
+        return _bulk_add_statuses(recipe_ids, added)
+
+    async def delete_recipes_bulk(self, request_user: User, recipe_ids: list[int]) -> list[dict]:
+        removed = await _bulk_delete_relations(
+            self.db, UserFavorites, Recipe, "recipe_id", "favorites_count",
+            request_user.id, recipe_ids,
+        )
+        await _publish_recipes(self.db, request_user, removed)
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "favorites", removed=list(removed),
+        ))
+        return _bulk_delete_statuses(recipe_ids, removed)
 
 
 class UserSubscriptionRepository:
@@ -207,7 +410,12 @@ class UserSubscriptionRepository:
             following_id=target_user.id,
         )
         self.db.add(subscription)
-        await self.db.commit()
+        await change_counter(self.db, target_user, "followers_count", 1)
+        await FeedRepository(self.db).backfill(request_user.id, [target_user.id])
+        await publish_changes(self.db, ("user", [request_user.id, target_user.id]))
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "subscriptions", added=[target_user.id],
+        ))
 
     async def unfollow(self, request_user: User, target_user: User) -> bool:
         following = await self.db.scalar(
@@ -219,6 +427,42 @@ class UserSubscriptionRepository:
         )
         if following:
             await self.db.delete(following)
-            await self.db.commit()
+            await change_counter(self.db, target_user, "followers_count", -1)
+            await FeedRepository(self.db).remove_authors(request_user.id, [target_user.id])
+            await publish_changes(self.db, ("user", [request_user.id, target_user.id]))
+            on_commit(self.db, partial(
+                update_cached_relations, request_user.id, "subscriptions", removed=[target_user.id],
+            ))
             return True
         return False
+
+    async def follow_users_bulk(self, request_user: User, user_ids: list[int]) -> list[dict]:
+        added = await _bulk_add_relations(
+            self.db, UserSubscription, User, "following_id", "followers_count",
+            request_user.id, user_ids, User.id != request_user.id,
+        )
+        added_ids = [user_id for user_id, is_added in added.items() if is_added]
+        await FeedRepository(self.db).backfill(request_user.id, added_ids)
+        if added_ids:
+            await publish_changes(self.db, ("user", [request_user.id, *added_ids]))
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "subscriptions", added=added_ids,
+        ))
+        statuses = _bulk_add_statuses(user_ids, added)
+        for item in statuses:
+            if item["id"] == request_user.id:
+                item["status"] = "forbidden"
+        return statuses
+
+    async def unfollow_bulk(self, request_user: User, user_ids: list[int]) -> list[dict]:
+        removed = await _bulk_delete_relations(
+            self.db, UserSubscription, User, "following_id", "followers_count",
+            request_user.id, user_ids,
+        )
+        await FeedRepository(self.db).remove_authors(request_user.id, list(removed))
+        if removed:
+            await publish_changes(self.db, ("user", [request_user.id, *removed]))
+        on_commit(self.db, partial(
+            update_cached_relations, request_user.id, "subscriptions", removed=list(removed),
+        ))
+        return _bulk_delete_statuses(user_ids, removed)
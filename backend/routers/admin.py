@@ -0,0 +1,133 @@
+from typing import Annotated, AsyncIterator, Literal
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from alchemy.db import async_session_maker
+from alchemy.db_depends import get_db
+from alchemy.slow_queries import slow_query_log
+from foodgram_fastapi.metrics import metrics
+from jobs.queue import enqueue
+from middlewares.profiling import collapsed_stacks, list_profiles, load_profile
+from models.user import User
+from schemas.job import JobEnqueuedSchema
+from schemas.recipe import RecipeImportResultSchema
+from repositories.exchange_repositories import (
+    RecipeExchangeRepository,
+    iter_lines,
+)
+from routers.services.security import admin_user
+from routers.services.budget import (
+    BudgetRoute,
+    EXPORT_BUDGET,
+)
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    route_class=BudgetRoute,
+    dependencies=[Depends(EXPORT_BUDGET)],
+)
+
+
+async def _export_recipes(with_images: bool) -> AsyncIterator[bytes]:
+    # Сессия зависимости закрывается до отправки тела, поэтому у выгрузки своя.
+    async with async_session_maker() as session:
+        session.info["statement_timeout"] = EXPORT_BUDGET.statement_timeout
+        async for chunk in RecipeExchangeRepository(session).export_ndjson(with_images):
+            yield chunk
+
+
+@router.get("/recipes/export/")
+async def export_recipes(
+    _: Annotated[User, Depends(admin_user)],
+    with_images: Annotated[bool, Query()] = False,
+):
+    return StreamingResponse(
+        _export_recipes(with_images),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="recipes.ndjson"'},
+    )
+
+
+@router.post("/recipes/import/", response_model=RecipeImportResultSchema)
+async def import_recipes(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _: Annotated[User, Depends(admin_user)],
+    batch_size: Annotated[int, Query(ge=1, le=5000)] = 500,
+):
+    imported, skipped = await RecipeExchangeRepository(db).import_ndjson(
+        iter_lines(request.stream()),
+        batch_size=batch_size,
+    )
+    return {"imported": imported, "skipped": skipped}
+
+
+@router.post(
+    "/counters/repair/",
+    response_model=JobEnqueuedSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def repair_counters(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _: Annotated[User, Depends(admin_user)],
+    batch_size: Annotated[int, Query(ge=1, le=50000)] = 5000,
+):
+    """Пересчет счетчиков в фоне (задача repair_counters)."""
+    job_id = await enqueue(db, "repair_counters", {"batch_size": batch_size})
+    return {"job_id": job_id}
+
+
+@router.get("/metrics/")
+async def get_metrics(_: Annotated[User, Depends(admin_user)]):
+    """Счетчики текущего воркера."""
+    return metrics.snapshot()
+
+
+@router.get("/slow-queries/")
+async def get_slow_queries(
+    _: Annotated[User, Depends(admin_user)],
+    order: Annotated[Literal["total", "max", "count"], Query()] = "total",
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+):
+    """Медленные запросы текущего воркера по отпечатку, худшие первыми."""
+    return slow_query_log.snapshot(order, limit)
+
+
+@router.delete("/slow-queries/", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries(_: Annotated[User, Depends(admin_user)]):
+    """Сброс накопленной статистики текущего воркера."""
+    slow_query_log.clear()
+
+
+@router.get("/profiles/")
+async def get_profiles(_: Annotated[User, Depends(admin_user)]):
+    """Сохраненные профили запросов (`X-Profile: 1`), новые первыми."""
+    return await run_in_threadpool(list_profiles)
+
+
+@router.get("/profiles/{profile_id}/")
+async def get_profile(
+    profile_id: Annotated[str, Path(pattern=r"^[0-9a-f]{32}$")],
+    _: Annotated[User, Depends(admin_user)],
+    format: Annotated[Literal["json", "collapsed"], Query()] = "json",
+):
+    """Профиль по `X-Profile-Id`: JSON со временем SQL или collapsed stacks для flame graph."""
+    profile = await run_in_threadpool(load_profile, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Профиль не найден")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(profile))
+    return profile
@@ -22,9 +22,19 @@ from routers.services.security import (
     current_user,
     verify_password,
 )
+from routers.services.rate_limit import login_limiter
+from routers.services.budget import (
+    BudgetRoute,
+    AUTH_BUDGET,
+)
 
 
-router = APIRouter(prefix="/auth/token", tags=["Auth"])
+router = APIRouter(
+    prefix="/auth/token",
+    tags=["Auth"],
+    route_class=BudgetRoute,
+    dependencies=[Depends(AUTH_BUDGET)],
+)
 
 
 @router.post(
@@ -37,6 +47,7 @@ async def get_token(
     user_data: AuthGetTokenSchema,
 ):
     """Получение токена по кредам пользователя."""
+    login_limiter.check(user_data.email.lower())
     user = await db.scalar(
         select(User)
         .where(User.email == user_data.email)
@@ -64,5 +75,4 @@ async def delete_user_token(
 ):
     """При наличии валидного токена -> удаляем токен."""
     await db.delete(current_user.token)
-    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -3,13 +3,17 @@ from typing import Annotated
 from fastapi import (
     APIRouter,
     Depends,
+    HTTPException,
     Query,
     Path,
+    Response,
     status,
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from alchemy.db_depends import get_db
+from foodgram_fastapi.settings import CATALOG_MAX_AGE
 from models.user import User
 from models.core import Tag, Ingredient
 from schemas.core import (
@@ -24,9 +28,17 @@ from repositories.core_repositories import (
 )
 from routers.services.utils import get_object_or_404
 from routers.services.security import current_user
+from routers.services.budget import (
+    BudgetRoute,
+    DEFAULT_BUDGET,
+)
 
 
-router = APIRouter(tags=["Core"])
+router = APIRouter(
+    tags=["Core"],
+    route_class=BudgetRoute,
+    dependencies=[Depends(DEFAULT_BUDGET)],
+)
 
 
 @router.post("/tags", response_model=TagRetrieveSchema, status_code=status.HTTP_201_CREATED)
@@ -46,7 +58,10 @@ async def create_tag(
 )
 async def get_all_tags(
     db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
 ):
+    # Публичный каталог: сжатое представление кэшируется CompressionMiddleware.
+    response.headers["Cache-Control"] = f"public, max-age={CATALOG_MAX_AGE}"
     tag_repository = TagRepository(db)
     return await tag_repository.get_all_tags()
 
@@ -56,7 +71,7 @@ async def get_tag(
     tag_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    return await get_object_or_404(db, Tag, Tag.id == tag_id)
+    return await get_object_or_404(db, Tag, tag_id)
 
 
 @router.post(
@@ -70,7 +85,13 @@ async def create_ingredient(
     _: Annotated[User, Depends(current_user)],
 ):
     ingredient_repository = IngredientRepository(db)
-    return await ingredient_repository.create_ingredient(ingredient_data)
+    try:
+        return await ingredient_repository.create_ingredient(ingredient_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Такой ингредиент уже есть",
+        )
 
 
 @router.get(
@@ -80,8 +101,13 @@ async def create_ingredient(
 )
 async def get_all_ingredients(
     db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
     request_query_params: Annotated[str | None, Query()] = None,
 ):
+    # Кэшируется только полный каталог: результаты поиска по произвольной
+    # строке вытеснили бы его из кэша CompressionMiddleware.
+    if not request_query_params:
+        response.headers["Cache-Control"] = f"public, max-age={CATALOG_MAX_AGE}"
     ingredient_repository = IngredientRepository(db)
     return await ingredient_repository.get_all_ibgredients(request_query_params)
 
@@ -95,4 +121,4 @@ async def get_ingredient(
     ingredient_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    return await get_object_or_404(db, Ingredient, Ingredient.id == ingredient_id)
+    return await get_object_or_404(db, Ingredient, ingredient_id)
@@ -10,10 +10,15 @@ from fastapi import (
     status,
     Path
 )
-from sqlalchemy.exc import IntegrityError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from alchemy.db import async_session_maker
 from alchemy.db_depends import get_db
+from foodgram_fastapi.settings import DEFAULT_STATEMENT_TIMEOUT
 from models.user import User
 from models.recipe import Recipe
 from schemas.recipe import (
@@ -21,23 +26,60 @@ from schemas.recipe import (
     RecipeCreateSchema,
     RecipeRetrieveSchema,
     RecipeSimpleRetriveSchema,
+    RecipeFeedPageSchema,
 )
+from schemas.user import BulkIdsSchema, BulkItemResultSchema
 from routers.services.pagination import (
     MyPage,
     MyParams,
     CustomPage,
 )
-from repositories.recipe_repositories import RecipeRepository
+from repositories.recipe_repositories import RecipeRepository, RECIPE_FIELDS
 from repositories.user_repositories import (
     UserFavoritesRepository,
     UserShoppingListRepository,
 )
+from repositories.services.relations import get_user_relations
 
 from routers.services.utils import get_object_or_404
-from routers.services.security import current_user
+from routers.services.fields import parse_fields
+from routers.services.security import AuthToken, TokenAuthScheme, current_user
+from routers.services.uploads import RECIPES_DIR, ImageBody
+from routers.services.events import recipe_events
+from routers.services.conditional import (
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_validators,
+)
+from routers.services.budget import (
+    BudgetRoute,
+    DEFAULT_BUDGET,
+    TOGGLE_BUDGET,
+    UPLOAD_BUDGET,
+)
 
 
-router = APIRouter(prefix="/recipes", tags=["Recipe"])
+router = APIRouter(
+    prefix="/recipes",
+    tags=["Recipe"],
+    route_class=BudgetRoute,
+    dependencies=[Depends(DEFAULT_BUDGET)],
+)
+
+
+async def current_recipe_image(db: AsyncSession, request: Request, user: User) -> str | None:
+    """Изображение изменяемого рецепта автора (при создании рецепта его нет)."""
+    recipe_id = request.path_params.get("recipe_id")
+    if recipe_id is None:
+        return None
+    return await db.scalar(
+        select(Recipe.image)
+        .where(Recipe.id == int(recipe_id), Recipe.author_id == user.id)
+    )
+
+
+recipe_body = ImageBody(RecipeCreateSchema, "image", RECIPES_DIR, current_recipe_image)
 
 
 @router.get("/", response_model=CustomPage[RecipeRetrieveSchema], status_code=status.HTTP_200_OK)
@@ -47,31 +89,161 @@ async def get_all_recipes(
     request: Request,
     request_user: Annotated[User, Depends(current_user)],
     filters: RecipeFilters = Depends(),
-    tags: Annotated[list[str] | None, Query()] = None
+    tags: Annotated[list[str] | None, Query()] = None,
+    fields: Annotated[
+        str | None,
+        Query(max_length=500, description="Только эти поля, напр. id,name,author.username"),
+    ] = None,
 ):
     recipe_repository = RecipeRepository(db)
-    recipe_query = await recipe_repository.get_related_query_list(filters, tags, request_user)
+    sparse_fields = parse_fields(fields, RECIPE_FIELDS) if fields else None
+    recipe_query = await recipe_repository.get_related_query_list(
+        filters,
+        tags,
+        request_user,
+        sparse_fields,
+    )
     paginated_data = await MyPage.create(
         recipe_query, db=db, params=pagnination_query_params, request=request
     )
+    if sparse_fields:
+        # Неполные схемы не проходят response_model, страница отдается как есть.
+        items = await recipe_repository.to_sparse_schema_list(
+            paginated_data.items,
+            sparse_fields,
+            request_user,
+        )
+        return JSONResponse(jsonable_encoder({
+            "count": paginated_data.total,
+            "next": paginated_data.next,
+            "previous": paginated_data.previous,
+            "results": items,
+        }))
 
-    items = []
-    for recipe in paginated_data.items:
-        data = await recipe_repository.to_schema_from_related_instance(recipe, request_user)
-        items.append(data)
-    paginated_data.items = items
+    paginated_data.items = await recipe_repository.to_schema_list(
+        paginated_data.items,
+        request_user,
+    )
     return CustomPage(**paginated_data.__dict__)
 
 
+@router.get("/feed/", response_model=RecipeFeedPageSchema, status_code=status.HTTP_200_OK)
+async def get_feed(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request: Request,
+    request_user: Annotated[User, Depends(current_user)],
+    before: Annotated[int | None, Query(ge=1)] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """Лента подписок, постранично по курсору `before` (id последнего рецепта страницы)."""
+    recipe_repository = RecipeRepository(db)
+    results = await recipe_repository.get_feed(request_user, before, limit)
+    next_url = None
+    if len(results) == limit:
+        next_url = str(request.url.include_query_params(before=results[-1]["id"], limit=limit))
+    return {"next": next_url, "results": results}
+
+
+@router.get("/events/", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def get_recipe_events(
+    token: Annotated[HTTPAuthorizationCredentials, Depends(TokenAuthScheme())],
+):
+    """
+    Поток text/event-stream: `event: recipe` (id - id рецепта) о новых рецептах подписок,
+    `event: resync` - события пропущены, ленту нужно перечитать из `/recipes/feed/`.
+
+    Без `get_db`: ее сессия закрылась бы только после конца потока, держа соединение
+    пула все время подключения. Сессия берется на проверку токена и чтение подписок.
+    """
+    if recipe_events.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много подключений, повторите позже",
+            headers={"Retry-After": "5"},
+        )
+    async with async_session_maker() as session:
+        session.info["statement_timeout"] = DEFAULT_STATEMENT_TIMEOUT
+        user_id = await AuthToken.get_user_id_from_token(session, token.credentials)
+        relations = await get_user_relations(session, user_id)
+    return StreamingResponse(
+        recipe_events.stream(user_id, relations.subscriptions),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx отдает события сразу, без буферизации ответа.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/shopping_cart/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def add_recipes_to_shopping_cart_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    shopping_list_repository = UserShoppingListRepository(db)
+    return await shopping_list_repository.add_recipes_bulk(request_user, bulk_data.ids)
+
+
+@router.delete(
+    "/shopping_cart/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def delete_recipes_from_shopping_cart_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    shopping_list_repository = UserShoppingListRepository(db)
+    return await shopping_list_repository.delete_recipes_bulk(request_user, bulk_data.ids)
+
+
+@router.post(
+    "/favorite/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def add_recipes_to_favorite_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    favorite_list_repository = UserFavoritesRepository(db)
+    return await favorite_list_repository.add_recipes_bulk(request_user, bulk_data.ids)
+
+
+@router.delete(
+    "/favorite/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def delete_recipes_from_favorites_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    favorite_list_repository = UserFavoritesRepository(db)
+    return await favorite_list_repository.delete_recipes_bulk(request_user, bulk_data.ids)
+
+
 @router.post(
     "/",
     response_model=RecipeRetrieveSchema,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(UPLOAD_BUDGET)],
+    openapi_extra=recipe_body.openapi(),
 )
 async def create_recipe(
-    recipe_data: RecipeCreateSchema,
-    db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
+    recipe_data: Annotated[RecipeCreateSchema, Depends(recipe_body)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
     recipe_repository = RecipeRepository(db)
     recipe = await recipe_repository.create_recipe(recipe_data, request_user)
@@ -89,8 +261,17 @@ async def get_recipe(
     recipe_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
+    request: Request,
+    response: Response,
 ):
     recipe_repository = RecipeRepository(db)
+    version = await recipe_repository.get_version(recipe_id, request_user)
+    if version:
+        etag = make_etag("recipe", recipe_id, *version)
+        last_modified = max(version.updated_at, version.author_updated_at)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        set_validators(response, etag, last_modified)
     recipe = await recipe_repository.get_related_instance_by_id(recipe_id)
     if recipe:
         response_data = (
@@ -103,11 +284,17 @@ async def get_recipe(
     )
 
 
-@router.patch("/{recipe_id}/", response_model=RecipeRetrieveSchema, status_code=status.HTTP_200_OK)
+@router.patch(
+    "/{recipe_id}/",
+    response_model=RecipeRetrieveSchema,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(UPLOAD_BUDGET)],
+    openapi_extra=recipe_body.openapi(),
+)
 async def update_recipe(
     recipe_id: Annotated[int, Path()],
-    recipe_request_data: RecipeCreateSchema,
     request_user: Annotated[User, Depends(current_user)],
+    recipe_request_data: Annotated[RecipeCreateSchema, Depends(recipe_body)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     recipe_repository = RecipeRepository(db)
@@ -139,7 +326,7 @@ async def delete_recipe(
     request_user: Annotated[User, Depends(current_user)],
 ):
     recipe_repository = RecipeRepository(db)
-    recipe = await get_object_or_404(db, Recipe, Recipe.id == recipe_id)
+    recipe = await get_object_or_404(db, Recipe, recipe_id)
     if await recipe_repository.delete_recipe(recipe, request_user):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     raise HTTPException(
@@ -152,33 +339,40 @@ async def delete_recipe(
     "/{recipe_id}/shopping_cart/",
     response_model=RecipeSimpleRetriveSchema,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(TOGGLE_BUDGET)],
 )
 async def add_recipe_to_shopping_cart(
     recipe_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
 ):
-    recipe = await get_object_or_404(db, Recipe, Recipe.id == recipe_id)
     shopping_list_repository = UserShoppingListRepository(db)
-    try:
-        await shopping_list_repository.add_recipe_to_shopping_list(request_user, recipe)
-        return recipe
-    except IntegrityError:
+    recipe = await shopping_list_repository.add_recipe_to_shopping_list(request_user, recipe_id)
+    if recipe is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Страницы не существует.",
+        )
+    if not recipe.added:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Уже в корзине",
         )
+    return recipe._asdict()
 
 
-@router.delete("/{recipe_id}/shopping_cart/", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{recipe_id}/shopping_cart/",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
 async def delete_recipe_from_shopping_cart(
     recipe_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
 ):
-    recipe = await get_object_or_404(db, Recipe, Recipe.id == recipe_id)
     shopping_list_repository = UserShoppingListRepository(db)
-    if await shopping_list_repository.delete_recipe_from_shopping_list(request_user, recipe):
+    if await shopping_list_repository.delete_recipe_from_shopping_list(request_user, recipe_id):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -187,33 +381,40 @@ async def delete_recipe_from_shopping_cart(
     "/{recipe_id}/favorite/",
     response_model=RecipeSimpleRetriveSchema,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(TOGGLE_BUDGET)],
 )
 async def add_recipe_to_favorite(
     recipe_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
 ):
-    recipe = await get_object_or_404(db, Recipe, Recipe.id == recipe_id)
     favorite_list_repository = UserFavoritesRepository(db)
-    try:
-        recipe = await favorite_list_repository.add_recipe_to_shopping_list(request_user, recipe)
-        return recipe
-    except IntegrityError:
+    recipe = await favorite_list_repository.add_recipe_to_shopping_list(request_user, recipe_id)
+    if recipe is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Страницы не существует.",
+        )
+    if not recipe.added:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Уже в избранном",
         )
+    return recipe._asdict()
 
 
-@router.delete("/{recipe_id}/favorite/", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{recipe_id}/favorite/",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
 async def delete_recipe_from_favorites(
     recipe_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
 ):
-    recipe = await get_object_or_404(db, Recipe, Recipe.id == recipe_id)
     favorite_list_repository = UserFavoritesRepository(db)
-    if await favorite_list_repository.delete_recipe_from_shopping_list(request_user, recipe):
+    if await favorite_list_repository.delete_recipe_from_shopping_list(request_user, recipe_id):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Callable, Coroutine, Any
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.exc import DBAPIError
+
+from alchemy.slow_queries import current_route
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    DEFAULT_DEADLINE,
+    DEFAULT_STATEMENT_TIMEOUT,
+    TOGGLE_DEADLINE,
+    TOGGLE_STATEMENT_TIMEOUT,
+    AUTH_DEADLINE,
+    AUTH_STATEMENT_TIMEOUT,
+    EXPORT_DEADLINE,
+    EXPORT_STATEMENT_TIMEOUT,
+    UPLOAD_DEADLINE,
+    UPLOAD_STATEMENT_TIMEOUT,
+)
+
+
+QUERY_CANCELED = "57014"
+
+
+class RequestBudget:
+    """
+    Бюджет времени маршрута: дедлайн обработчика и statement_timeout запросов к БД (секунды).
+
+    Подключается зависимостью роутера или маршрута (`dependencies=[Depends(budget)]`),
+    зависимость маршрута переопределяет зависимость роутера. Дедлайн отсчитывается
+    от начала обработки запроса и работает только с `route_class=BudgetRoute`,
+    statement_timeout применяет `get_db` в начале каждой транзакции.
+    """
+
+    def __init__(self, name: str, deadline: float, statement_timeout: float) -> None:
+        self.name = name
+        self.deadline = deadline
+        self.statement_timeout = statement_timeout
+
+    async def __call__(self, request: Request) -> None:
+        request.state.budget = self
+        timeout: asyncio.Timeout | None = getattr(request.state, "deadline", None)
+        if timeout is not None:
+            timeout.reschedule(request.state.started + self.deadline)
+
+
+DEFAULT_BUDGET = RequestBudget("default", DEFAULT_DEADLINE, DEFAULT_STATEMENT_TIMEOUT)
+TOGGLE_BUDGET = RequestBudget("toggle", TOGGLE_DEADLINE, TOGGLE_STATEMENT_TIMEOUT)
+AUTH_BUDGET = RequestBudget("auth", AUTH_DEADLINE, AUTH_STATEMENT_TIMEOUT)
+EXPORT_BUDGET = RequestBudget("export", EXPORT_DEADLINE, EXPORT_STATEMENT_TIMEOUT)
+UPLOAD_BUDGET = RequestBudget("upload", UPLOAD_DEADLINE, UPLOAD_STATEMENT_TIMEOUT)
+
+
+def is_query_canceled(error: DBAPIError) -> bool:
+    orig = error.orig
+    return (getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)) == QUERY_CANCELED
+
+
+class BudgetRoute(APIRoute):
+    """
+    Маршрут с дедлайном: обработчик отменяется по истечении бюджета, сессия
+    закрывается и соединение возвращается в пул, клиенту уходит 504.
+    Запрос, отмененный по statement_timeout, отдает 503.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def budget_handler(request: Request) -> Response:
+            request.state.started = asyncio.get_running_loop().time()
+            current_route.set(f"{request.method} {self.path}")
+            try:
+                async with asyncio.timeout(None) as deadline:
+                    request.state.deadline = deadline
+                    return await handler(request)
+            except TimeoutError:
+                if not deadline.expired():
+                    raise
+                metrics.inc(f"budget.{self._budget_name(request)}.deadline_exceeded")
+                return JSONResponse(
+                    {"detail": "Превышено время обработки запроса"},
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                )
+            except DBAPIError as error:
+                if not is_query_canceled(error):
+                    raise
+                metrics.inc(f"budget.{self._budget_name(request)}.statement_timeout")
+                return JSONResponse(
+                    {"detail": "Превышено время запроса к базе данных"},
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "1"},
+                )
+
+        return budget_handler
+
+    @staticmethod
+    def _budget_name(request: Request) -> str:
+        budget = getattr(request.state, "budget", None)
+        return budget.name if budget else "none"
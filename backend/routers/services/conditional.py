@@ -0,0 +1,59 @@
+"""
+Условные GET запросы (ETag / Last-Modified).
+
+ETag слабый: строится из версии строк (updated_at) и флагов конкретного пользователя,
+поэтому разный для разных зрителей. If-None-Match имеет приоритет над If-Modified-Since.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+
+def make_etag(prefix: str, *parts) -> str:
+    values = []
+    for part in parts:
+        if isinstance(part, datetime):
+            part = int(part.timestamp() * 1_000_000)
+        elif isinstance(part, bool):
+            part = int(part)
+        values.append(str(part))
+    return f'W/"{prefix}-{"-".join(values)}"'
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque_tag = etag.removeprefix("W/")
+        return any(
+            tag.strip().removeprefix("W/") == opaque_tag
+            for tag in if_none_match.split(",")
+        )
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: datetime) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = format_datetime(
+        last_modified.astimezone(timezone.utc),
+        usegmt=True,
+    )
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified_response(etag: str, last_modified: datetime) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,72 @@
+import asyncio
+
+from email_validator import validate_email, EmailNotValidError
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from foodgram_fastapi.settings import (
+    EMAIL_CHECK_DELIVERABILITY,
+    EMAIL_DNS_TIMEOUT,
+    EMAIL_DOMAIN_CACHE_MAXSIZE,
+    EMAIL_DOMAIN_CACHE_TTL,
+)
+from repositories.services.cache import LRUCache
+
+
+# domain -> текст ошибки или None, если домен принимает почту:
+domain_cache = LRUCache(EMAIL_DOMAIN_CACHE_MAXSIZE, EMAIL_DOMAIN_CACHE_TTL)
+_MISSING = object()
+_pending: dict[str, asyncio.Future[str | None]] = {}
+
+
+def _check_domain(email: str) -> str | None:
+    try:
+        validate_email(email, check_deliverability=True, timeout=int(EMAIL_DNS_TIMEOUT))
+    except EmailNotValidError as error:
+        return str(error)
+    return None
+
+
+async def _check_domain_once(domain: str, email: str) -> str | None:
+    pending = _pending.get(domain)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # Первый запрос отменили, проверяем сами.
+    future: asyncio.Future[str | None] = asyncio.get_running_loop().create_future()
+    _pending[domain] = future
+    try:
+        error = await run_in_threadpool(_check_domain, email)
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        if _pending.get(domain) is future:
+            del _pending[domain]
+    domain_cache.set(domain, error)
+    future.set_result(error)
+    return error
+
+
+async def check_email_deliverability(email: str) -> None:
+    """
+    Проверка доставляемости (MX/A записи домена), если включена EMAIL_CHECK_DELIVERABILITY.
+
+    Блокирующий DNS запрос выполняется в пуле потоков, результат кэшируется по домену,
+    одновременные проверки одного домена ждут один запрос. Email должен быть уже
+    провалидирован по синтаксису схемой.
+    """
+    if not EMAIL_CHECK_DELIVERABILITY:
+        return
+    domain = email.rsplit("@", 1)[-1].lower()
+    error = domain_cache.get(domain, _MISSING)
+    if error is _MISSING:
+        error = await _check_domain_once(domain, email)
+    if error:
+        raise HTTPException(
+            detail={"email": error},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,189 @@
+"""
+Server-sent events о новых рецептах авторов, на которых подписан пользователь.
+
+`RecipeRepository.create_recipe` публикует событие `recipe_created` в транзакции рецепта
+(`publish_event`), после коммита оно через LISTEN приходит во все воркеры, и брокер
+раскладывает его по подключениям подписчиков автора: индекс автор -> подключения,
+сообщение сериализуется один раз на всех получателей.
+
+Простаивающее подключение - одна корутина и пустая очередь, сессия БД берется только
+при изменении подписок пользователя. Пульс (комментарий SSE) один на воркер, раз в
+EVENTS_HEARTBEAT. Очередь подключения ограничена EVENTS_QUEUE_SIZE: если клиент не
+успевает читать, очередь сбрасывается и клиенту уходит `event: resync` - пропущенное
+дочитывается из `/recipes/feed/`.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict, deque
+from typing import AsyncIterator, Iterable
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from alchemy.db import async_session_maker
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    DEFAULT_STATEMENT_TIMEOUT,
+    EVENTS_MAX_SUBSCRIBERS,
+    EVENTS_QUEUE_SIZE,
+    EVENTS_HEARTBEAT,
+    EVENTS_RETRY,
+)
+from repositories.services.changes import on_change, on_event
+from repositories.services.relations import get_user_relations
+
+
+logger = logging.getLogger("events")
+
+PING = b": ping\n\n"
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+def format_event(event: str, data: dict, event_id: int | None = None) -> bytes:
+    message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n{message}"
+    return message.encode()
+
+
+class Subscriber:
+    """Подключение пользователя: ограниченная очередь сообщений и флаги для потока."""
+
+    __slots__ = ("user_id", "authors", "queue", "wakeup", "ping", "overflowed", "stale")
+
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.authors: frozenset[int] = frozenset()
+        self.queue: deque[bytes] = deque()
+        self.wakeup = asyncio.Event()
+        self.ping = False
+        self.overflowed = False
+        self.stale = False
+
+    def push(self, message: bytes) -> None:
+        if len(self.queue) >= EVENTS_QUEUE_SIZE:
+            self.queue.clear()
+            self.overflowed = True
+            metrics.inc("events.overflows")
+        else:
+            self.queue.append(message)
+        self.wakeup.set()
+
+
+class RecipeEventBroker:
+    """Брокер событий процесса, используется только из event loop."""
+
+    def __init__(self) -> None:
+        self._subscribers: set[Subscriber] = set()
+        self._by_author: dict[int, set[Subscriber]] = defaultdict(set)
+        self._by_user: dict[int, set[Subscriber]] = defaultdict(set)
+        self._heartbeat: asyncio.Task[None] | None = None
+        self.closed = False
+        metrics.gauge("events.subscribers", lambda: float(len(self._subscribers)))
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= EVENTS_MAX_SUBSCRIBERS
+
+    def start(self) -> None:
+        self.closed = False
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat(), name="events")
+
+    async def stop(self) -> None:
+        """Завершает потоки подключений, чтобы воркер мог остановиться."""
+        self.closed = True
+        for subscriber in self._subscribers:
+            subscriber.wakeup.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+
+    async def stream(self, user_id: int, authors: Iterable[int]) -> AsyncIterator[bytes]:
+        """Тело ответа text/event-stream, подключение снимается при разрыве."""
+        subscriber = Subscriber(user_id)
+        self._subscribers.add(subscriber)
+        self._by_user[user_id].add(subscriber)
+        self._index(subscriber, authors)
+        try:
+            yield f"retry: {int(EVENTS_RETRY * 1000)}\n\n".encode()
+            while not self.closed:
+                await subscriber.wakeup.wait()
+                subscriber.wakeup.clear()
+                if subscriber.stale:
+                    subscriber.stale = False
+                    await self._reload(subscriber)
+                messages = []
+                if subscriber.overflowed:
+                    subscriber.overflowed = False
+                    messages.append(RESYNC)
+                messages.extend(subscriber.queue)
+                subscriber.queue.clear()
+                if subscriber.ping:
+                    subscriber.ping = False
+                    if not messages:
+                        messages.append(PING)
+                if messages:
+                    yield b"".join(messages)
+        finally:
+            self._index(subscriber, ())
+            self._discard(self._by_user, user_id, subscriber)
+            self._subscribers.discard(subscriber)
+
+    def publish(self, data: dict) -> None:
+        """Обработчик `recipe_created`: сообщение подписчикам автора в этом воркере."""
+        subscribers = self._by_author.get(data["author"]["id"])
+        if not subscribers:
+            return
+        message = format_event("recipe", data, data["id"])
+        for subscriber in subscribers:
+            subscriber.push(message)
+        metrics.inc("events.delivered", len(subscribers))
+
+    def user_changed(self, user_id: int) -> None:
+        """Подписки могли измениться - перечитываются потоком подключения."""
+        for subscriber in self._by_user.get(user_id, ()):
+            subscriber.stale = True
+            subscriber.wakeup.set()
+
+    def _index(self, subscriber: Subscriber, authors: Iterable[int]) -> None:
+        authors = frozenset(authors)
+        for author_id in subscriber.authors - authors:
+            self._discard(self._by_author, author_id, subscriber)
+        for author_id in authors - subscriber.authors:
+            self._by_author[author_id].add(subscriber)
+        subscriber.authors = authors
+
+    @staticmethod
+    def _discard(index: dict[int, set[Subscriber]], key: int, subscriber: Subscriber) -> None:
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+    async def _reload(self, subscriber: Subscriber) -> None:
+        try:
+            async with async_session_maker() as session:
+                session.info["statement_timeout"] = DEFAULT_STATEMENT_TIMEOUT
+                relations = await get_user_relations(session, subscriber.user_id)
+        except (SQLAlchemyError, OSError):
+            logger.warning("Подписки %s не перечитаны", subscriber.user_id, exc_info=True)
+            return
+        self._index(subscriber, relations.subscriptions)
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(EVENTS_HEARTBEAT)
+            for subscriber in self._subscribers:
+                subscriber.ping = True
+                subscriber.wakeup.set()
+
+
+recipe_events = RecipeEventBroker()
+on_event("recipe_created", recipe_events.publish)
+on_change("user", recipe_events.user_changed, own=True)
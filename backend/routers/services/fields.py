@@ -0,0 +1,32 @@
+from fastapi import HTTPException, status
+
+
+FieldSpec = dict[str, frozenset[str] | None]
+Fields = dict[str, frozenset[str]]
+
+
+def parse_fields(value: str, allowed: FieldSpec) -> Fields:
+    """
+    Разбор `fields=id,name,author.username` по допустимым полям.
+
+    `allowed`: поле -> допустимые вложенные поля (None - вложенных нет).
+    Результат: поле -> запрошенные вложенные поля (пустое множество - все).
+    """
+    fields: dict[str, set[str]] = {}
+    unknown = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, nested = item.partition(".")
+        if name not in allowed or (nested and nested not in (allowed[name] or ())):
+            unknown.append(item)
+            continue
+        requested = fields.setdefault(name, set())
+        if nested:
+            requested.add(nested)
+        elif allowed[name]:
+            requested.update(allowed[name])  # type: ignore
+    if unknown or not fields:
+        raise HTTPException(
+            detail={"fields": f"Неизвестные поля: {', '.join(unknown) or value}"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    return {name: frozenset(nested) for name, nested in fields.items()}
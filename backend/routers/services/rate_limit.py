@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from math import ceil
+from time import monotonic
+
+from fastapi import HTTPException, status
+
+from foodgram_fastapi.metrics import metrics
+from foodgram_fastapi.settings import (
+    LOGIN_RATE_LIMIT,
+    LOGIN_RATE_BURST,
+    LOGIN_RATE_MAX_KEYS,
+)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket по ключу (например, email): `rate` попыток в секунду, запас `burst`.
+
+    Хранится не больше `max_keys` ключей, самые давно использованные вытесняются:
+    вытесненный ключ начинает с полного запаса, что безопасно.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_keys: int) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def acquire(self, key: str) -> float:
+        """Списывает токен. Возвращает 0 или сколько секунд ждать до следующей попытки."""
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1 - tokens) / self.rate
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def check(self, key: str) -> None:
+        """Зависимость-проверка: 429 с `Retry-After`, если лимит исчерпан."""
+        wait = self.acquire(key)
+        if wait:
+            metrics.inc(f"rate_limit.{self.name}.rejected")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много попыток, повторите позже",
+                headers={"Retry-After": str(ceil(wait))},
+            )
+
+
+login_limiter = TokenBucketLimiter(
+    "login",
+    rate=LOGIN_RATE_LIMIT,
+    burst=LOGIN_RATE_BURST,
+    max_keys=LOGIN_RATE_MAX_KEYS,
+)
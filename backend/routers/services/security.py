@@ -16,6 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 
 from alchemy.db_depends import get_db
+from foodgram_fastapi.settings import ADMIN_EMAILS
 from models.user import User, UserBaseToken
 
 
@@ -83,6 +84,21 @@ class AuthToken:
 
         return user
 
+    @classmethod
+    async def get_user_id_from_token(cls, db: AsyncSession, token: str) -> int:
+        """id пользователя по токену, без загрузки пользователя."""
+        user_id = await db.scalar(
+            select(User.id)
+            .join(User.token)
+            .where(UserBaseToken.token == token)
+        )
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Необходима аутентификация",
+            )
+        return user_id
+
     @classmethod
     async def __create_token(cls, db: AsyncSession, user: User) -> str:
         """Создание токена в бд."""
@@ -92,7 +108,7 @@ class AuthToken:
             user_id=user.id,
         )
         db.add(token)
-        await db.commit()
+        await db.flush()
         return generated_token
 
     @classmethod
@@ -104,3 +120,13 @@ class AuthToken:
 async def current_user(user: Annotated[User, Depends(AuthToken.get_user_from_token)]):
     """Просто текущий пользователь."""
     return user
+
+
+async def admin_user(user: Annotated[User, Depends(current_user)]):
+    """Текущий пользователь, если он администратор (ADMIN_EMAILS)."""
+    if user.email not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Только для администраторов",
+        )
+    return user
@@ -0,0 +1,382 @@
+"""
+Загрузка изображений: base64 в JSON или файл в multipart/form-data.
+
+multipart разбирается потоком по мере чтения тела запроса: файл пишется чанками
+во временный файл в MEDIA_ROOT (в пуле потоков) с лимитом UPLOAD_MAX_SIZE, тип
+определяется по сигнатуре первых байт, а не по заголовкам клиента. Остальные поля
+формы ограничены UPLOAD_FIELD_MAX_SIZE. В поле схемы попадает URL файла (MEDIA_URL).
+
+Форма: часть `data` - JSON как в теле обычного запроса (без изображения),
+часть с именем поля изображения - файл.
+
+Файл живет вместе с транзакцией запроса: при откате загруженный файл удаляется,
+прежний файл поля (замена, удаление) - только после коммита (`replace_media`).
+Файлы лежат в MEDIA_ROOT/<subdir>/<id пользователя>/: удаляются только файлы
+владельца, а чужой URL в поле изображения не принимается.
+"""
+
+import json
+import os
+from functools import partial
+from typing import Annotated, Any, AsyncIterator, Awaitable, BinaryIO, Callable
+from uuid import uuid4
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from alchemy.db_depends import get_db, on_commit, on_rollback
+from models.user import User
+from routers.services.security import current_user
+from foodgram_fastapi.settings import (
+    MEDIA_ROOT,
+    MEDIA_URL,
+    UPLOAD_MAX_SIZE,
+    UPLOAD_FIELD_MAX_SIZE,
+)
+
+
+AVATARS_DIR = "avatars"
+RECIPES_DIR = "recipes"
+
+MAX_PARTS = 16
+MAX_PART_HEADERS_SIZE = 8 * 1024
+SNIFF_SIZE = 12
+
+
+def sniff_image(head: bytes) -> str | None:
+    """Расширение файла по сигнатуре или None, если это не поддерживаемое изображение."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _bad_request(field: str, message: str) -> HTTPException:
+    return HTTPException(detail={field: message}, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def _get_boundary(content_type: str) -> bytes:
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary" and value.strip('"'):
+            return value.strip('"').encode("latin-1")
+    raise _bad_request("detail", "Нет boundary в Content-Type")
+
+
+def _parse_part_headers(raw: bytes) -> dict[str, str]:
+    """Имя поля и имя файла из Content-Disposition части."""
+    disposition: dict[str, str] = {}
+    for line in raw.decode("utf-8", "replace").split("\r\n"):
+        header, _, value = line.partition(":")
+        if header.strip().lower() != "content-disposition":
+            continue
+        for param in value.split(";")[1:]:
+            name, _, param_value = param.strip().partition("=")
+            disposition[name.lower()] = param_value.strip('"')
+    if "name" not in disposition:
+        raise _bad_request("detail", "Часть формы без имени")
+    return disposition
+
+
+async def iter_multipart(
+    chunks: AsyncIterator[bytes],
+    boundary: bytes,
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    События разбора multipart: ("part", заголовки), ("data", bytes), ("end", None).
+
+    В памяти держится только хвост длиной в разделитель, данные части отдаются
+    по мере поступления.
+    """
+    delimiter = b"\r\n--" + boundary
+    keep = len(delimiter) + 1
+    # Первому разделителю не предшествует CRLF, добавляем его для единообразного поиска.
+    buffer = b"\r\n"
+    state = "preamble"
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            if state in ("preamble", "data"):
+                index = buffer.find(delimiter)
+                if index < 0:
+                    if len(buffer) > keep:
+                        if state == "data":
+                            yield "data", buffer[:-keep]
+                        buffer = buffer[-keep:]
+                    break
+                if state == "data":
+                    if index:
+                        yield "data", buffer[:index]
+                    yield "end", None
+                buffer = buffer[index + len(delimiter):]
+                state = "delimiter"
+            if state == "delimiter":
+                if len(buffer) < 2:
+                    break
+                if buffer.startswith(b"--"):
+                    return
+                if not buffer.startswith(b"\r\n"):
+                    raise _bad_request("detail", "Некорректное тело multipart")
+                buffer = buffer[2:]
+                state = "headers"
+            if state == "headers":
+                index = buffer.find(b"\r\n\r\n")
+                if index < 0:
+                    if len(buffer) > MAX_PART_HEADERS_SIZE:
+                        raise _bad_request("detail", "Слишком большие заголовки части")
+                    break
+                yield "part", _parse_part_headers(buffer[:index])
+                buffer = buffer[index + 4:]
+                state = "data"
+    raise _bad_request("detail", "Тело multipart оборвано")
+
+
+class _ImageWriter:
+    """Временный файл изображения в MEDIA_ROOT/<subdir>, переименовывается после проверки."""
+
+    def __init__(self, field: str, subdir: str) -> None:
+        self.field = field
+        self.directory = os.path.join(MEDIA_ROOT, subdir)
+        self.subdir = subdir
+        self.path = os.path.join(self.directory, f".upload-{uuid4().hex}")
+        self.file: BinaryIO | None = None
+        self.head = b""
+        self.extension: str | None = None
+        self.size = 0
+
+    def _open(self) -> BinaryIO:
+        os.makedirs(self.directory, exist_ok=True)
+        return open(self.path, "wb")
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > UPLOAD_MAX_SIZE:
+            raise HTTPException(
+                detail={self.field: f"Файл больше {UPLOAD_MAX_SIZE} байт"},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if self.extension is None:
+            self.head += data
+            if len(self.head) < SNIFF_SIZE:
+                return
+            self.extension = sniff_image(self.head)
+            if self.extension is None:
+                raise _bad_request(self.field, "Поддерживаются изображения PNG, JPEG, GIF, WEBP")
+            data, self.head = self.head, b""
+            self.file = await run_in_threadpool(self._open)
+        await run_in_threadpool(self.file.write, data)  # type: ignore
+
+    async def save(self) -> str:
+        """Закрывает файл и возвращает его URL."""
+        if self.extension is None:
+            raise _bad_request(self.field, "Пустой или слишком короткий файл")
+        name = f"{uuid4().hex}.{self.extension}"
+        await run_in_threadpool(self.file.close)  # type: ignore
+        await run_in_threadpool(os.replace, self.path, os.path.join(self.directory, name))
+        self.file = None
+        return f"{MEDIA_URL}{self.subdir}/{name}"
+
+    async def discard(self) -> None:
+        if self.file is not None:
+            await run_in_threadpool(self.file.close)
+            await run_in_threadpool(_remove, self.path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_media(url: str | None) -> None:
+    """Удаляет файл, загруженный через multipart (base64 значения пропускаются)."""
+    if not url or not url.startswith(MEDIA_URL):
+        return
+    root = os.path.realpath(MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, url.removeprefix(MEDIA_URL)))
+    if os.path.commonpath((root, path)) == root:
+        _remove(path)
+
+
+def media_prefix(subdir: str, owner_id: int) -> str:
+    """Начало URL файлов, загруженных пользователем `owner_id` в `subdir`."""
+    return f"{MEDIA_URL}{subdir}/{owner_id}/"
+
+
+def replace_media(
+    db: AsyncSession,
+    prefix: str,
+    previous: str | None,
+    current: str | None = None,
+) -> None:
+    """
+    Прежний файл поля удаляется после коммита, если значение поля сменилось
+    и файл загружен владельцем (URL начинается с `prefix`, см. `media_prefix`).
+    """
+    if previous and previous != current and previous.startswith(prefix):
+        on_commit(db, partial(remove_media, previous))
+
+
+async def read_multipart_image(
+    request: Request,
+    field: str,
+    subdir: str,
+) -> tuple[dict[str, str], str | None]:
+    """Поля формы и URL сохраненного изображения (None, если файл не передан)."""
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and (
+        int(content_length) > UPLOAD_MAX_SIZE + MAX_PARTS * UPLOAD_FIELD_MAX_SIZE
+    ):
+        raise HTTPException(
+            detail={field: f"Файл больше {UPLOAD_MAX_SIZE} байт"},
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    boundary = _get_boundary(request.headers["content-type"])
+    fields: dict[str, str] = {}
+    value = bytearray()
+    writer: _ImageWriter | None = None
+    url = None
+    name = ""
+    in_file = False
+    parts = 0
+    try:
+        async for event, payload in iter_multipart(request.stream(), boundary):
+            if event == "part":
+                parts += 1
+                if parts > MAX_PARTS:
+                    raise _bad_request("detail", "Слишком много частей формы")
+                name = payload["name"]
+                # Браузер шлет пустую часть с filename="", если файл не выбран.
+                in_file = name == field and bool(payload.get("filename"))
+                if in_file:
+                    if writer is not None:
+                        raise _bad_request(field, "Ожидается один файл")
+                    writer = _ImageWriter(field, subdir)
+            elif event == "data":
+                if in_file:
+                    await writer.write(payload)  # type: ignore
+                else:
+                    value += payload
+                    if len(value) > UPLOAD_FIELD_MAX_SIZE:
+                        raise _bad_request(name, "Слишком длинное значение")
+            elif in_file:
+                url = await writer.save()  # type: ignore
+            else:
+                fields[name] = value.decode("utf-8", "replace")
+                value = bytearray()
+    except BaseException:
+        if writer is not None:
+            await writer.discard()
+        remove_media(url)
+        raise
+    return fields, url
+
+
+class ImageBody:
+    """
+    Тело запроса схемы `schema` с изображением в поле `field`.
+
+    application/json - как раньше, изображение base64 строкой в поле схемы;
+    multipart/form-data - JSON в части `data`, файл в части `field`, в схему
+    подставляется URL файла. Подключается через `Depends(ImageBody(...))`,
+    файл удаляется при откате транзакции запроса (`get_db`).
+
+    URL файла (MEDIA_URL) вместо изображения принимается, только если это текущее
+    значение поля (`current`), иначе можно было бы подставить чужой файл.
+    """
+
+    def __init__(
+        self,
+        schema: type[BaseModel],
+        field: str,
+        subdir: str,
+        current: Callable[[AsyncSession, Request, User], Awaitable[str | None]] | None = None,
+    ) -> None:
+        self.schema = schema
+        self.field = field
+        self.subdir = subdir
+        self.current = current
+
+    async def __call__(
+        self,
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_db)],
+        user: Annotated[User, Depends(current_user)],
+    ) -> Any:
+        content_type = request.headers.get("content-type", "")
+        if not content_type.lower().startswith("multipart/form-data"):
+            data = self._validate(await request.body())
+            await self._check_media_url(data, db, request, user)
+            return data
+
+        fields, url = await read_multipart_image(
+            request, self.field, f"{self.subdir}/{user.id}"
+        )
+        if url is not None:
+            on_rollback(db, partial(remove_media, url))
+        try:
+            data = json.loads(fields.get("data") or "{}")
+        except ValueError:
+            data = None
+        try:
+            if not isinstance(data, dict):
+                raise _bad_request("data", "Ожидается JSON объект")
+            if url is not None:
+                data[self.field] = url
+            validated = self._validate(data)
+            if url is None:
+                await self._check_media_url(validated, db, request, user)
+            return validated
+        except (HTTPException, RequestValidationError):
+            remove_media(url)
+            raise
+
+    async def _check_media_url(
+        self,
+        data: BaseModel,
+        db: AsyncSession,
+        request: Request,
+        user: User,
+    ) -> None:
+        value = getattr(data, self.field)
+        if not value or not value.startswith(MEDIA_URL):
+            return
+        if self.current is None or value != await self.current(db, request, user):
+            raise _bad_request(self.field, "Изображение нужно загрузить, а не ссылаться на файл")
+
+    def _validate(self, data: bytes | dict[str, Any]) -> Any:
+        try:
+            if isinstance(data, dict):
+                return self.schema.model_validate(data)
+            return self.schema.model_validate_json(data or b"{}")
+        except ValidationError as error:
+            raise RequestValidationError(error.errors(include_url=False))
+
+    def openapi(self) -> dict[str, Any]:
+        """`openapi_extra` маршрута: тело не объявлено параметром, описываем его вручную."""
+        return {
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/json": {"schema": self.schema.model_json_schema()},
+                    "multipart/form-data": {
+                        "schema": {
+                            "type": "object",
+                            "properties": {
+                                "data": {"type": "string", "description": "JSON без изображения"},
+                                self.field: {"type": "string", "format": "binary"},
+                            },
+                        },
+                    },
+                },
+            },
+        }
@@ -1,14 +1,13 @@
 from fastapi import HTTPException, status
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from repositories.services.loader import get_loader
 
-async def get_object_or_404(db: AsyncSession, model, expression):
-    request_object = await db.scalar(
-        select(model)
-        .where(expression)
-    )
+
+async def get_object_or_404(db: AsyncSession, model, object_id: int):
+    """Объект по id через загрузчик сессии: повторные и одновременные запросы батчатся."""
+    request_object = await get_loader(db, model).load(object_id)
     if request_object:
         return request_object
     raise HTTPException(
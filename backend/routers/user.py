@@ -19,6 +19,8 @@ from schemas.user import (
     UserPasswordChangeSchema,
     UserAvatarSchema,
     UserWithRecipesSchema,
+    BulkIdsSchema,
+    BulkItemResultSchema,
 )
 from models.user import User
 from repositories.user_repositories import (
@@ -26,12 +28,38 @@ from repositories.user_repositories import (
     UserSubscriptionRepository,
 )
 from routers.services.validators import validate_user_exist
+from routers.services.deliverability import check_email_deliverability
 from routers.services.pagination import CustomPage, MyPage, MyParams
 from routers.services.utils import get_object_or_404
 from routers.services.security import current_user
+from routers.services.conditional import (
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_validators,
+)
+from routers.services.budget import (
+    BudgetRoute,
+    DEFAULT_BUDGET,
+    TOGGLE_BUDGET,
+    UPLOAD_BUDGET,
+)
+from routers.services.uploads import AVATARS_DIR, ImageBody
+
+
+router = APIRouter(
+    prefix="/users",
+    tags=["User"],
+    route_class=BudgetRoute,
+    dependencies=[Depends(DEFAULT_BUDGET)],
+)
+
 
+async def current_avatar(db: AsyncSession, request: Request, user: User) -> str | None:
+    return user.avatar
 
-router = APIRouter(prefix="/users", tags=["User"])
+
+avatar_body = ImageBody(UserAvatarSchema, "avatar", AVATARS_DIR, current_avatar)
 
 
 @router.post("/", response_model=UserRetrieveSchema, status_code=status.HTTP_201_CREATED)
@@ -40,6 +68,7 @@ async def create_user(
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     await validate_user_exist(db, user_email=user_data.email, username=user_data.username)
+    await check_email_deliverability(user_data.email)
     user_repository = UserRepository(db)
     return await user_repository.create_user(user_data)
 
@@ -68,11 +97,17 @@ async def get_current_user(
     return current_user
 
 
-@router.put("/me/avatar/", response_model=UserAvatarSchema, status_code=status.HTTP_200_OK)
+@router.put(
+    "/me/avatar/",
+    response_model=UserAvatarSchema,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(UPLOAD_BUDGET)],
+    openapi_extra=avatar_body.openapi(),
+)
 async def creaete_user_avatar(
-    avatar_data: UserAvatarSchema,
-    db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
+    avatar_data: Annotated[UserAvatarSchema, Depends(avatar_body)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
     user_repository = UserRepository(db)
     return await user_repository.add_avatar(request_user, avatar_data)
@@ -125,10 +160,41 @@ async def get_user_subscriptions(
     return CustomPage(**paginated_data.__dict__)
 
 
+@router.post(
+    "/subscribe/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def subscribe_users_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    subscription_repository = UserSubscriptionRepository(db)
+    return await subscription_repository.follow_users_bulk(request_user, bulk_data.ids)
+
+
+@router.delete(
+    "/subscribe/bulk/",
+    response_model=list[BulkItemResultSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
+async def unsubscribe_users_bulk(
+    bulk_data: BulkIdsSchema,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request_user: Annotated[User, Depends(current_user)],
+):
+    subscription_repository = UserSubscriptionRepository(db)
+    return await subscription_repository.unfollow_bulk(request_user, bulk_data.ids)
+
+
 @router.post(
     "/{user_id}/subscribe/",
     response_model=UserRetrieveSchema,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(TOGGLE_BUDGET)],
 )
 async def subscribe_user(
     user_id: Annotated[int, Path()],
@@ -136,7 +202,7 @@ async def subscribe_user(
     request_user: Annotated[User, Depends(current_user)]
 ):
     subscription_repository = UserSubscriptionRepository(db)
-    target_user = await get_object_or_404(db, User, User.id == user_id)
+    target_user = await get_object_or_404(db, User, user_id)
     try:
         await subscription_repository.follow_user(request_user, target_user)
         return {
@@ -150,14 +216,18 @@ async def subscribe_user(
         )
 
 
-@router.delete("/{user_id}/subscribe/", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{user_id}/subscribe/",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(TOGGLE_BUDGET)],
+)
 async def unsubscribe_user(
     user_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)]
 ):
     subscription_repository = UserSubscriptionRepository(db)
-    target_user = await get_object_or_404(db, User, User.id == user_id)
+    target_user = await get_object_or_404(db, User, user_id)
     if await subscription_repository.unfollow(request_user, target_user):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     raise HTTPException(
@@ -171,8 +241,16 @@ async def get_user_by_id(
     user_id: Annotated[int, Path()],
     db: Annotated[AsyncSession, Depends(get_db)],
     request_user: Annotated[User, Depends(current_user)],
+    request: Request,
+    response: Response,
 ):
     user_repository = UserRepository(db)
+    version = await user_repository.get_version(user_id, request_user)
+    if version:
+        etag = make_etag("user", user_id, *version)
+        if is_not_modified(request, etag, version.updated_at):
+            return not_modified_response(etag, version.updated_at)
+        set_validators(response, etag, version.updated_at)
     user = await user_repository.get_user_by_id(user_id, request_user)
     if user:
         return await user_repository.to_shema(user)
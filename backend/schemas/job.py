@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+
+
+class JobEnqueuedSchema(BaseModel):
+    job_id: int
@@ -1,4 +1,5 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Literal
 
 from fastapi import Query
 from pydantic import (
@@ -42,6 +43,8 @@ class RecipeRetrieveSchema(BaseModel):
     cooking_time: int
     is_favorited: bool = False
     is_in_shopping_cart: bool = False
+    favorites_count: int = 0
+    in_carts_count: int = 0
 
 
 class RecipeSimpleRetriveSchema(BaseModel):
@@ -55,3 +58,38 @@ class RecipeFilters(BaseModel):
     is_favorited: Annotated[bool | None, Query()] = None
     is_in_shopping_cart: Annotated[bool | None, Query()] = None
     author: Annotated[int | None, Query()] = None
+    search: Annotated[str | None, Query(min_length=1, max_length=200)] = None
+    tags_match_all: Annotated[bool, Query()] = False
+    ordering: Annotated[
+        Literal["-created_at", "created_at", "cooking_time", "-cooking_time", "name", "-name"]
+        | None,
+        Query(description="По умолчанию новые первыми, с search - по релевантности"),
+    ] = None
+
+
+class RecipeExchangeIngredientSchema(BaseModel):
+    name: str = Field(max_length=128)
+    measurement_unit: str = Field(max_length=64)
+    amount: int = Field(ge=1, le=1000)
+
+
+class RecipeExchangeSchema(BaseModel):
+    """Строка NDJSON выгрузки рецептов. Автор - email, теги - slug."""
+    name: str = Field(max_length=256)
+    text: str = Field(max_length=1000)
+    cooking_time: int = Field(ge=1, le=1000)
+    author: str = Field(max_length=254)
+    tags: list[str] = []
+    ingredients: list[RecipeExchangeIngredientSchema] = []
+    image: str | None = None
+    created_at: datetime | None = None
+
+
+class RecipeImportResultSchema(BaseModel):
+    imported: int
+    skipped: int
+
+
+class RecipeFeedPageSchema(BaseModel):
+    next: str | None
+    results: list[RecipeRetrieveSchema]
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from fastapi import HTTPException, status
 from pydantic import (
     BaseModel,
@@ -53,6 +55,8 @@ class UserRetrieveSchema(BaseModel):
     last_name: str
     avatar: str | None
     is_subscribed: bool = False
+    recipes_count: int = 0
+    followers_count: int = 0
 
 
 class RecipeSimpleRetriveSchema(BaseModel):
@@ -73,3 +77,17 @@ class UserPasswordChangeSchema(BaseModel):
 
 class UserAvatarSchema(BaseModel):
     avatar: str
+
+
+class BulkIdsSchema(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=500)
+
+    @field_validator("ids")
+    @classmethod
+    def unique_ids(cls, value: list[int]):
+        return list(dict.fromkeys(value))
+
+
+class BulkItemResultSchema(BaseModel):
+    id: int
+    status: Literal["added", "exists", "removed", "not_found", "forbidden"]
@@ -0,0 +1,220 @@
+"""
+Тесты идут на отдельной базе PostgreSQL: имя берется из TEST_POSTGRES_DB, остальные
+параметры подключения - из POSTGRES_*. Без TEST_POSTGRES_DB тесты с базой
+пропускаются, рабочая база POSTGRES_DB не трогается. Схема накатывается миграциями.
+"""
+
+import json
+import os
+import re
+import tempfile
+from uuid import uuid4
+
+import pytest
+
+TEST_POSTGRES_DB = os.getenv("TEST_POSTGRES_DB")
+if TEST_POSTGRES_DB:
+    # До импорта приложения: настройки читаются при импорте.
+    os.environ["POSTGRES_DB"] = TEST_POSTGRES_DB
+    os.environ["MEDIA_ROOT"] = tempfile.mkdtemp(prefix="foodgram-media-")
+
+
+_WRITE = re.compile(r"\b(?:INSERT INTO|UPDATE \w+ SET|DELETE FROM)\b", re.IGNORECASE)
+_READ = re.compile(r"(?:SELECT|WITH)\b.*\bFROM\b", re.IGNORECASE)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    if not TEST_POSTGRES_DB:
+        pytest.skip("не задана тестовая база TEST_POSTGRES_DB")
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "..", "alembic.ini")), "head")
+
+
+@pytest.fixture
+async def engine(migrated):
+    from alchemy.db import engine
+
+    yield engine
+    # Пул привязан к event loop теста.
+    await engine.dispose()
+
+
+def multipart(data: dict, files: dict[str, bytes]) -> tuple[bytes, bytes]:
+    boundary = uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="data"\r\n\r\n'.encode()
+        + json.dumps(data).encode()
+    ]
+    for name, content in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+            f'filename="{name}.png"\r\nContent-Type: image/png\r\n\r\n'.encode()
+            + content
+        )
+    body = b"\r\n".join(parts) + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}".encode()
+
+
+class Client:
+    """Вызов ASGI приложения без сервера, как в `commands.benchmark_compression`."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        token: str | None = None,
+        json_body: dict | None = None,
+        files: dict[str, bytes] | None = None,
+    ) -> tuple[int, dict | list | None]:
+        """С `files` тело - multipart/form-data: `json_body` в части `data` и файлы."""
+        if files is not None:
+            body, content_type = multipart(json_body or {}, files)
+        else:
+            body = json.dumps(json_body).encode() if json_body is not None else b""
+            content_type = b"application/json"
+        headers = [(b"host", b"localhost"), (b"content-type", content_type)]
+        if token:
+            headers.append((b"authorization", f"Token {token}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "root_path": "/api",
+            "path": "/api" + path,
+            "raw_path": ("/api" + path).encode(),
+            "query_string": b"",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        response: dict = {"body": []}
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        content = b"".join(response["body"])
+        return response["status"], json.loads(content) if content else None
+
+
+@pytest.fixture
+async def client(engine):
+    from main import app
+
+    return Client(app)
+
+
+@pytest.fixture
+async def make_user(engine):
+    """Пользователь с токеном, напрямую в базе."""
+    from alchemy.db import async_session_maker
+    from models.user import User, UserBaseToken
+
+    async def make() -> tuple[User, str]:
+        suffix = uuid4().hex[:12]
+        async with async_session_maker() as session:
+            user = User(
+                email=f"{suffix}@example.com",
+                username=f"user_{suffix}",
+                password="-",
+                first_name="Тест",
+                last_name="Тестов",
+            )
+            session.add(user)
+            await session.flush()
+            token = UserBaseToken(token=uuid4().hex, user_id=user.id)
+            session.add(token)
+            await session.commit()
+            return user, token.token
+
+    return make
+
+
+@pytest.fixture
+async def recipe_data(engine):
+    """Тело создания рецепта с новыми тегом и ингредиентом."""
+    from alchemy.db import async_session_maker
+    from models.core import Ingredient, Tag
+
+    suffix = uuid4().hex[:12]
+    async with async_session_maker() as session:
+        tag = Tag(name=f"tag_{suffix}", slug=f"tag_{suffix}")
+        ingredient = Ingredient(name=f"ingredient_{suffix}", measurement_unit="г")
+        session.add_all([tag, ingredient])
+        await session.commit()
+        return {
+            "name": "Рецепт",
+            "image": None,
+            "text": "Описание",
+            "cooking_time": 10,
+            "tags": [tag.id],
+            "ingredients": [{"id": ingredient.id, "amount": 100}],
+        }
+
+
+class Statements:
+    """SQL запросы и коммиты движка за время `with`."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine.sync_engine
+        self.statements: list[str] = []
+        self.commits = 0
+
+    def _execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(" ".join(statement.split()))
+
+    def _commit(self, conn) -> None:
+        self.commits += 1
+
+    def __enter__(self) -> "Statements":
+        from sqlalchemy import event
+
+        event.listen(self.engine, "before_cursor_execute", self._execute)
+        event.listen(self.engine, "commit", self._commit)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self._execute)
+        event.remove(self.engine, "commit", self._commit)
+
+    def reads_after_write(self) -> list[str]:
+        """Чтения таблиц после первого INSERT/UPDATE/DELETE, в т.ч. внутри WITH."""
+        reads = []
+        written = False
+        for statement in self.statements:
+            if _WRITE.search(statement):
+                written = True
+            elif written and _READ.match(statement):
+                reads.append(statement)
+        return reads
+
+
+@pytest.fixture
+def statements(engine):
+    return lambda: Statements(engine)
@@ -0,0 +1,124 @@
+"""Внутрипроцессные кэши репозиториев."""
+
+import pytest
+
+from repositories.services import cache as cache_module
+from repositories.services.cache import (
+    CARD_OVERHEAD,
+    IntSet,
+    LRUCache,
+    UserRelations,
+    card_size,
+)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_lru_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module, "monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+
+    now[0] = 104.0
+    assert cache.get("a") == 1
+    now[0] = 106.0
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_lru_maxbytes():
+    cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    assert cache.bytes == 8
+
+    cache.set("c", "xxxx")
+
+    assert "a" not in cache
+    assert cache.bytes == 8
+
+
+def test_lru_oversized_value_not_cached():
+    cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+
+    cache.set("big", "x" * 11)
+
+    assert "big" not in cache
+    assert cache.get("a") == "xxxx"
+
+
+@pytest.mark.parametrize("operation", ["replace", "pop", "clear"])
+def test_lru_byte_accounting(operation):
+    cache = LRUCache(maxsize=100, maxbytes=100, sizeof=len)
+    cache.set("a", "xxxx")
+    if operation == "replace":
+        cache.set("a", "xx")
+        assert cache.bytes == 2
+    elif operation == "pop":
+        assert cache.pop("a") == "xxxx"
+        assert cache.bytes == 0
+    else:
+        cache.clear()
+        assert (cache.bytes, len(cache)) == (0, 0)
+
+
+def test_card_size_counts_image():
+    card = {"id": 1, "name": "Суп", "image": "data:image/png;base64," + "A" * 1000}
+
+    assert card_size((None, card)) == CARD_OVERHEAD + len(card["name"]) + len(card["image"])
+
+
+def test_intset_sorted_and_unique():
+    items = IntSet([5, 1, 3, 1, 5])
+
+    assert list(items) == [1, 3, 5]
+    assert len(items) == 3
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(0, False), (1, True), (2, False), (5, True), (6, False), (-1, False)],
+)
+def test_intset_contains(value, expected):
+    assert (value in IntSet([1, 3, 5])) is expected
+
+
+def test_intset_contains_empty():
+    assert 1 not in IntSet()
+
+
+def test_intset_add_keeps_order():
+    items = IntSet([1, 5])
+    for value in (3, 0, 7, 3):
+        items.add(value)
+
+    assert list(items) == [0, 1, 3, 5, 7]
+
+
+def test_intset_discard():
+    items = IntSet([1, 3, 5])
+    items.discard(3)
+    items.discard(4)
+    items.discard(3)
+
+    assert list(items) == [1, 5]
+    assert 3 not in items
+
+
+def test_user_relations_size():
+    relations = UserRelations(favorites=[1, 2], shopping_cart=[2], subscriptions=[7, 7])
+
+    assert relations.size == 4
+    assert 2 in relations.shopping_cart and 7 in relations.subscriptions
@@ -0,0 +1,30 @@
+"""Заголовок Cache-Control у каталога ингредиентов."""
+
+import pytest
+from fastapi import Response
+
+from repositories.core_repositories import IngredientRepository
+from routers.core import get_all_ingredients
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_query(monkeypatch):
+    async def get_all_ibgredients(self, request_query_params):
+        return []
+
+    monkeypatch.setattr(IngredientRepository, "get_all_ibgredients", get_all_ibgredients)
+
+
+@pytest.mark.parametrize(
+    ("request_query_params", "cached"),
+    [(None, True), ("", True), ("сах", False)],
+)
+async def test_only_full_catalog_is_public(request_query_params, cached):
+    response = Response()
+
+    await get_all_ingredients(None, response, request_query_params)
+
+    assert ("cache-control" in response.headers) is cached
@@ -0,0 +1,76 @@
+"""Сжатие ответов: br при наличии в Accept-Encoding, Vary и у несжатых по размеру ответов."""
+
+import brotli
+import pytest
+
+from middlewares.compression import CompressionMiddleware
+
+
+pytestmark = pytest.mark.anyio
+
+
+def make_app(body: bytes, headers: tuple[tuple[bytes, bytes], ...] = ()):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return CompressionMiddleware(
+        app,
+        minimum_size=500,
+        threadpool_size=1 << 20,
+        large_size=1 << 20,
+        gzip_levels=(6, 1, 9),
+        brotli_levels=(4, 1, 11),
+        cache_maxsize=8,
+    )
+
+
+async def call(app, accept_encoding: bytes) -> tuple[dict[bytes, bytes], bytes]:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding)],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return dict(messages[0]["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+async def test_brotli():
+    body = b'{"items": [' + b", ".join(b'"value"' for _ in range(200)) + b"]}"
+
+    headers, content = await call(make_app(body), b"gzip, deflate, br")
+
+    assert headers[b"content-encoding"] == b"br"
+    assert headers[b"vary"] == b"accept-encoding"
+    assert brotli.decompress(content) == body
+
+
+async def test_small_response_varies_on_accept_encoding():
+    headers, content = await call(make_app(b"{}"), b"gzip, br")
+
+    assert b"content-encoding" not in headers
+    assert headers[b"vary"] == b"accept-encoding"
+    assert content == b"{}"
+
+
+async def test_small_response_keeps_vary():
+    headers, _ = await call(make_app(b"{}", ((b"vary", b"Origin"),)), b"gzip")
+
+    assert headers[b"vary"] == b"origin, accept-encoding"
@@ -0,0 +1,153 @@
+"""Брокер событий: раздача подписчикам автора, переполнение очереди, соединение пула."""
+
+import anyio
+import pytest
+
+from routers.services import events
+from routers.services.events import RESYNC, RecipeEventBroker, format_event
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stream_releases_connection(engine, make_user):
+    from main import app
+    from routers.services.events import recipe_events
+
+    _, token = await make_user()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "root_path": "/api",
+        "path": "/api/recipes/events/",
+        "raw_path": b"/api/recipes/events/",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"authorization", f"Token {token}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    started = anyio.Event()
+    disconnected = anyio.Event()
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body":
+            started.set()
+
+    recipe_events.closed = False
+    async with anyio.create_task_group() as group:
+        group.start_soon(app, scope, receive, send)
+        with anyio.fail_after(5):
+            await started.wait()
+
+        assert messages[0]["status"] == 200
+        assert messages[1]["body"].startswith(b"retry:")
+        assert engine.sync_engine.pool.checkedout() == 0
+
+        disconnected.set()
+
+
+def recipe(recipe_id: int, author_id: int) -> dict:
+    return {"id": recipe_id, "name": "Суп", "author": {"id": author_id}}
+
+
+async def connect(broker: RecipeEventBroker, user_id: int, authors: list[int]):
+    stream = broker.stream(user_id, authors)
+    assert (await stream.__anext__()).startswith(b"retry:")
+    return stream
+
+
+async def receive(stream) -> bytes:
+    with anyio.fail_after(1):
+        return await stream.__anext__()
+
+
+async def test_publish_to_author_subscribers():
+    broker = RecipeEventBroker()
+    first = await connect(broker, 1, [10, 11])
+    second = await connect(broker, 2, [10])
+    other = await connect(broker, 3, [12])
+
+    broker.publish(recipe(5, 10))
+
+    message = format_event("recipe", recipe(5, 10), 5)
+    assert await receive(first) == message
+    assert await receive(second) == message
+    assert [len(subscriber.queue) for subscriber in broker._by_author[12]] == [0]
+    for stream in (first, second, other):
+        await stream.aclose()
+
+
+async def test_publish_without_subscribers():
+    broker = RecipeEventBroker()
+
+    broker.publish(recipe(5, 10))
+
+    assert not broker._by_author
+
+
+async def test_overflow_sends_resync(monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 2)
+    broker = RecipeEventBroker()
+    stream = await connect(broker, 1, [10])
+
+    for recipe_id in range(1, 5):
+        broker.publish(recipe(recipe_id, 10))
+
+    assert await receive(stream) == RESYNC + format_event("recipe", recipe(4, 10), 4)
+    broker.publish(recipe(5, 10))
+    assert await receive(stream) == format_event("recipe", recipe(5, 10), 5)
+    await stream.aclose()
+
+
+async def test_disconnect_unindexes():
+    broker = RecipeEventBroker()
+    stream = await connect(broker, 1, [10, 11])
+
+    await stream.aclose()
+
+    assert (broker._subscribers, broker._by_author, broker._by_user) == (set(), {}, {})
+
+
+async def test_user_changed_reindexes(monkeypatch):
+    broker = RecipeEventBroker()
+    reloaded = anyio.Event()
+
+    async def reload(subscriber):
+        broker._index(subscriber, [11])
+        reloaded.set()
+
+    monkeypatch.setattr(broker, "_reload", reload)
+    stream = await connect(broker, 1, [10])
+    other = await connect(broker, 2, [10])
+    received = []
+
+    async def read():
+        received.append(await receive(stream))
+
+    async with anyio.create_task_group() as group:
+        group.start_soon(read)
+        broker.user_changed(1)
+        with anyio.fail_after(1):
+            await reloaded.wait()
+        broker.publish(recipe(5, 11))
+        broker.publish(recipe(6, 10))
+
+    assert received == [format_event("recipe", recipe(5, 11), 5)]
+    assert await receive(other) == format_event("recipe", recipe(6, 10), 6)
+    assert {subscriber.user_id for subscriber in broker._by_author[10]} == {2}
+    await stream.aclose()
+    await other.aclose()
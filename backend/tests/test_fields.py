@@ -0,0 +1,50 @@
+"""Разбор параметра `fields=` списка рецептов."""
+
+import pytest
+from fastapi import HTTPException
+
+from routers.services.fields import parse_fields
+
+
+ALLOWED = {
+    "id": None,
+    "name": None,
+    "author": frozenset({"id", "username"}),
+}
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("id", {"id": frozenset()}),
+        ("id,name", {"id": frozenset(), "name": frozenset()}),
+        (" id , ,name,", {"id": frozenset(), "name": frozenset()}),
+        ("id,id", {"id": frozenset()}),
+        ("author", {"author": frozenset({"id", "username"})}),
+        ("author.username", {"author": frozenset({"username"})}),
+        ("author.username,author.id", {"author": frozenset({"id", "username"})}),
+        ("author.id,author", {"author": frozenset({"id", "username"})}),
+    ],
+)
+def test_parse_fields(value, expected):
+    assert parse_fields(value, ALLOWED) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "unknown"),
+    [
+        ("email", "email"),
+        ("id,email", "email"),
+        ("author.email", "author.email"),
+        ("name.length", "name.length"),
+        ("id,password,author.token", "password, author.token"),
+        (",", ","),
+        ("", ""),
+    ],
+)
+def test_parse_fields_unknown(value, unknown):
+    with pytest.raises(HTTPException) as error:
+        parse_fields(value, ALLOWED)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == {"fields": f"Неизвестные поля: {unknown}"}
@@ -0,0 +1,66 @@
+"""EntityLoader: один запрос на проход event loop, память до конца сессии, без повторов."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from models.core import Tag
+from repositories.services.loader import get_loader
+
+
+pytestmark = pytest.mark.anyio
+
+
+class Session:
+    """Сессия с таблицей в памяти: отвечает на запрос загрузчика `id = ANY(:entity_ids)`."""
+
+    def __init__(self, ids):
+        self.info = {}
+        self.rows = {entity_id: SimpleNamespace(id=entity_id) for entity_id in ids}
+        self.batches = []
+
+    async def scalars(self, statement):
+        ids = statement.compile().params["entity_ids"]
+        self.batches.append(sorted(ids))
+        await asyncio.sleep(0)
+        return SimpleNamespace(all=lambda: [self.rows[i] for i in ids if i in self.rows])
+
+
+async def test_load_many_dedupes_and_keeps_order():
+    session = Session([1, 2, 3])
+
+    tags = await get_loader(session, Tag).load_many([3, 1, 3, 1, 2])
+
+    assert [tag.id for tag in tags] == [3, 1, 2]
+    assert session.batches == [[1, 2, 3]]
+
+
+async def test_concurrent_loads_are_batched():
+    session = Session([1, 2])
+    loader = get_loader(session, Tag)
+
+    first, second, missing = await asyncio.gather(loader.load(1), loader.load(2), loader.load(9))
+
+    assert (first.id, second.id, missing) == (1, 2, None)
+    assert session.batches == [[1, 2, 9]]
+
+
+async def test_memo_and_forget():
+    session = Session([1])
+    loader = get_loader(session, Tag)
+
+    await loader.load(1)
+    await loader.load_many([1, 1])
+    assert session.batches == [[1]]
+
+    loader.forget(1)
+    await loader.load(1)
+    assert session.batches == [[1], [1]]
+
+
+async def test_loader_per_session_and_model():
+    session = Session([])
+
+    assert get_loader(session, Tag) is get_loader(session, Tag)
+    assert get_loader(Session([]), Tag) is not get_loader(session, Tag)
@@ -0,0 +1,182 @@
+"""Потоковый разбор multipart/form-data без базы."""
+
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from routers.services import uploads
+from routers.services.uploads import (
+    MAX_PART_HEADERS_SIZE,
+    MAX_PARTS,
+    iter_multipart,
+    read_multipart_image,
+)
+
+
+pytestmark = pytest.mark.anyio
+
+BOUNDARY = b"xyz"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(32)
+BODY = (
+    b"preamble\r\n"
+    b"--xyz\r\n"
+    b'Content-Disposition: form-data; name="data"\r\n\r\n'
+    b'{"name": "\xd0\xa1\xd1\x83\xd0\xbf"}\r\n'
+    b"--xyz\r\n"
+    b'Content-Disposition: form-data; name="image"; filename="a.png"\r\n'
+    b"Content-Type: image/png\r\n\r\n"
+    b"\r\n--xy not a delimiter\r\n"
+    b"--xyz--\r\n"
+)
+EVENTS = [
+    ("part", {"name": "data"}),
+    ("data", '{"name": "Суп"}'.encode()),
+    ("end", None),
+    ("part", {"name": "image", "filename": "a.png"}),
+    ("data", b"\r\n--xy not a delimiter"),
+    ("end", None),
+]
+
+
+async def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def parse(body: bytes, size: int, boundary: bytes = BOUNDARY) -> list:
+    """События разбора, соседние куски данных одной части склеены."""
+    events: list = []
+    async for event, payload in iter_multipart(chunked(body, size), boundary):
+        if event == "data" and events and events[-1][0] == "data":
+            events[-1] = ("data", events[-1][1] + payload)
+        else:
+            events.append((event, payload))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, len(BODY)])
+async def test_chunk_boundaries(size):
+    assert await parse(BODY, size) == EVENTS
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b"--xyz\r\n",
+        b'--xyz\r\nContent-Disposition: form-data; name="data"\r\n',
+        b'--xyz\r\nContent-Disposition: form-data; name="data"\r\n\r\n{}',
+        b'--xyz\r\nContent-Disposition: form-data; name="data"\r\n\r\n{}\r\n--xyz',
+    ],
+)
+async def test_truncated(body):
+    with pytest.raises(HTTPException) as error:
+        await parse(body, 3)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == {"detail": "Тело multipart оборвано"}
+
+
+@pytest.mark.parametrize(
+    ("body", "message"),
+    [
+        (b"--xyzjunk", "Некорректное тело multipart"),
+        (b"--xyz\r\nContent-Type: text/plain\r\n\r\n", "Часть формы без имени"),
+        (
+            b"--xyz\r\nX-Padding: " + b"a" * MAX_PART_HEADERS_SIZE,
+            "Слишком большие заголовки части",
+        ),
+    ],
+)
+async def test_malformed(body, message):
+    with pytest.raises(HTTPException) as error:
+        await parse(body, 1024)
+
+    assert error.value.detail == {"detail": message}
+
+
+def form(data: dict, files: dict[str, bytes]) -> tuple[bytes, bytes]:
+    parts = [
+        b'--xyz\r\nContent-Disposition: form-data; name="data"\r\n\r\n'
+        + json.dumps(data).encode()
+    ]
+    for name, content in files.items():
+        parts.append(
+            f'--xyz\r\nContent-Disposition: form-data; name="{name}"; '
+            f'filename="{name}.png"\r\n\r\n'.encode()
+            + content
+        )
+    return b"\r\n".join(parts) + b"\r\n--xyz--\r\n", b"multipart/form-data; boundary=xyz"
+
+
+def make_request(body: bytes, content_type: bytes) -> Request:
+    chunks = [body[start:start + 5] for start in range(0, len(body), 5)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request(
+        {
+            "type": "http",
+            "method": "PUT",
+            "path": "/",
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        },
+        receive,
+    )
+
+
+@pytest.fixture
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "MEDIA_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def saved_files(root) -> list[str]:
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+async def test_read_multipart_image(media_root):
+    body, content_type = form({"name": "Суп"}, {"image": PNG})
+
+    fields, url = await read_multipart_image(make_request(body, content_type), "image", "recipes")
+
+    assert json.loads(fields["data"]) == {"name": "Суп"}
+    assert url.startswith(f"{uploads.MEDIA_URL}recipes/") and url.endswith(".png")
+    with open(os.path.join(media_root, url.removeprefix(uploads.MEDIA_URL)), "rb") as file:
+        assert file.read() == PNG
+
+
+async def test_too_many_parts(media_root):
+    files = {f"field{number}": b"x" for number in range(MAX_PARTS)}
+    body, content_type = form({}, {"image": PNG, **files})
+
+    with pytest.raises(HTTPException) as error:
+        await read_multipart_image(make_request(body, content_type), "image", "recipes")
+
+    assert error.value.detail == {"detail": "Слишком много частей формы"}
+    assert saved_files(media_root) == []
+
+
+@pytest.mark.parametrize(
+    ("content", "message"),
+    [
+        (b"GIF", "Пустой или слишком короткий файл"),
+        (b"<svg>" + bytes(32), "Поддерживаются изображения PNG, JPEG, GIF, WEBP"),
+    ],
+)
+async def test_rejected_image_leaves_no_file(media_root, content, message):
+    body, content_type = form({}, {"image": content})
+
+    with pytest.raises(HTTPException) as error:
+        await read_multipart_image(make_request(body, content_type), "image", "recipes")
+
+    assert error.value.detail == {"image": message}
+    assert saved_files(media_root) == []
@@ -0,0 +1,105 @@
+"""Профилирование по требованию: флаг запроса и отказ не администраторам."""
+
+import pytest
+
+from middlewares import profiling
+from middlewares.profiling import ProfilingMiddleware
+
+
+TOKEN = "ab" * 32
+
+
+def scope(headers=(), query_string=b""):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/recipes/",
+        "query_string": query_string,
+        "headers": list(headers),
+    }
+
+
+@pytest.mark.parametrize("headers, query_string, requested", [
+    ((), b"", False),
+    (((b"x-profile", b"1"),), b"", True),
+    (((b"x-profile", b"TRUE"),), b"", True),
+    (((b"x-profile", b"0"),), b"profile=1", False),
+    ((), b"profile=1", True),
+    ((), b"limit=6&profile=yes", True),
+    ((), b"profile=0", False),
+    ((), b"profiles=1", False),
+    ((), b"no_profile=1", False),
+])
+def test_requested(headers, query_string, requested):
+    assert ProfilingMiddleware._requested(scope(headers, query_string)) is requested
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Запросы владельца токена к БД вместо настоящей сессии."""
+    calls = []
+
+    async def token_email(token):
+        calls.append(token)
+        return "admin@example.com" if token == TOKEN else None
+
+    monkeypatch.setattr(profiling, "ADMIN_EMAILS", ["admin@example.com"])
+    monkeypatch.setattr(profiling, "_token_email", token_email)
+    profiling._token_emails.clear()
+    return calls
+
+
+async def call(headers):
+    messages = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def send(message):
+        messages.append(message)
+
+    await ProfilingMiddleware(app)(scope(headers, b"profile=1"), None, send)
+    return dict(messages[0]["headers"])
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("authorization", [b"", b"Token not-a-token", b"Token " + b"z" * 64])
+async def test_malformed_token_denied_without_lookup(lookups, authorization):
+    headers = await call([(b"authorization", authorization)])
+
+    assert headers[b"x-profile"] == b"denied"
+    assert lookups == []
+
+
+@pytest.mark.anyio
+async def test_unknown_token_lookup_cached(lookups):
+    unknown = "cd" * 32
+
+    for _ in range(3):
+        headers = await call([(b"authorization", f"Token {unknown}".encode())])
+        assert headers[b"x-profile"] == b"denied"
+
+    assert lookups == [unknown]
+
+
+@pytest.mark.anyio
+async def test_non_admin_denied(lookups, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_EMAILS", ["other@example.com"])
+
+    headers = await call([(b"authorization", f"Token {TOKEN}".encode())])
+
+    assert headers[b"x-profile"] == b"denied"
+    assert b"x-profile-id" not in headers
+
+
+@pytest.mark.anyio
+async def test_admin_profiled(lookups, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    headers = await call([(b"authorization", f"Token {TOKEN}".encode())])
+
+    profile = profiling.load_profile(headers[b"x-profile-id"].decode())
+    assert profile["path"] == "/api/recipes/"
+    assert profile["status"] == 200
+    assert b"x-profile" not in headers
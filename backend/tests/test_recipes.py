@@ -0,0 +1,28 @@
+"""Создание и изменение рецептов."""
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_duplicate_tags_and_ingredients(client, make_user, recipe_data):
+    _, token = await make_user()
+    ingredient = recipe_data["ingredients"][0]
+    duplicated = {
+        **recipe_data,
+        "tags": recipe_data["tags"] * 2,
+        "ingredients": [ingredient, {**ingredient, "amount": 5}],
+    }
+
+    status, created = await client.request("POST", "/recipes/", token, duplicated)
+    assert status == 201, created
+    assert [tag["id"] for tag in created["tags"]] == recipe_data["tags"]
+    assert len(created["ingredients"]) == 1
+
+    status, updated = await client.request(
+        "PATCH", f"/recipes/{created['id']}/", token, duplicated
+    )
+    assert status == 200, updated
+    assert [tag["id"] for tag in updated["tags"]] == recipe_data["tags"]
+    assert len(updated["ingredients"]) == 1
@@ -0,0 +1,132 @@
+"""Журнал медленных запросов: нормализация, маскирование параметров, агрегаты."""
+
+from datetime import datetime
+
+import pytest
+
+from alchemy import slow_queries
+from alchemy.slow_queries import SlowQueryLog, current_route, fingerprint, normalize, redact
+
+
+@pytest.mark.parametrize("statement, normalized", [
+    (
+        "SELECT users.id FROM users WHERE users.id = $1::INTEGER",
+        "SELECT users.id FROM users WHERE users.id = ?",
+    ),
+    (
+        "SELECT * FROM t WHERE name = 'it''s' AND n = 42 AND x > -1.5",
+        "SELECT * FROM t WHERE name = ? AND n = ? AND x > ?",
+    ),
+    (
+        "SELECT * FROM t WHERE id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER)",
+        "SELECT * FROM t WHERE id IN (?+)",
+    ),
+    ("SELECT * FROM t WHERE id IN (1, 2, 3)", "SELECT * FROM t WHERE id IN (?+)"),
+    (
+        "INSERT INTO t (a, b) VALUES ($1::INTEGER, $2::VARCHAR), ($3::INTEGER, $4::VARCHAR)",
+        "INSERT INTO t (a, b) VALUES (?+), ...",
+    ),
+    ("SELECT * FROM t WHERE id = ANY ($1::INTEGER[])", "SELECT * FROM t WHERE id = ANY (?)"),
+    (
+        "SELECT * FROM t WHERE id = %(id_1)s AND name = :name",
+        "SELECT * FROM t WHERE id = ? AND name = ?",
+    ),
+    (
+        "SELECT t1.col2, x::text FROM t1\n   WHERE  a = 1",
+        "SELECT t1.col2, x::text FROM t1 WHERE a = ?",
+    ),
+])
+def test_normalize(statement, normalized):
+    assert normalize(statement) == normalized
+
+
+def test_lists_of_any_length_share_fingerprint():
+    two = normalize("SELECT * FROM t WHERE id IN ($1::INTEGER, $2::INTEGER)")
+    five = normalize("SELECT * FROM t WHERE id IN (" + ", ".join(["1"] * 5) + ")")
+
+    assert fingerprint(two) == fingerprint(five)
+
+
+@pytest.mark.parametrize("value, redacted", [
+    (None, None),
+    (True, True),
+    (42, 42),
+    (1.5, 1.5),
+    ("secret@example.com", "<str:18>"),
+    (b"\x00\x01", "<bytes:2>"),
+    (datetime(2026, 1, 1), "<datetime>"),
+    (("token", 7), ["<str:5>", 7]),
+    ({"password": "hunter2"}, {"password": "<str:7>"}),
+    (list(range(12)), [*range(10), "..."]),
+])
+def test_redact(value, redacted):
+    assert redact(value) == redacted
+
+
+def test_redact_never_keeps_strings():
+    parameters = ("alice@example.com", ["hunter2", {"token": "abcdef"}], "Суп")
+
+    assert not any(
+        secret in repr(redact(parameters))
+        for secret in ("alice", "hunter2", "abcdef", "Суп")
+    )
+
+
+@pytest.fixture
+def log(monkeypatch):
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_EXPLAIN_RATE", 0)
+    return SlowQueryLog()
+
+
+def test_record_aggregates_by_fingerprint(log):
+    token = current_route.set("GET /recipes/")
+    try:
+        log.record("SELECT * FROM t WHERE id = $1::INTEGER", (1,), 0.2, False)
+        log.record("SELECT * FROM t WHERE id = $1::INTEGER", (2,), 0.4, False)
+        log.record("SELECT * FROM t WHERE id = $1::INTEGER", ("x",), 0.6, False, "cancelled")
+    finally:
+        current_route.reset(token)
+
+    [stats] = log.snapshot()
+    assert stats["count"] == 3
+    assert stats["max_ms"] == 600
+    assert stats["total_ms"] == pytest.approx(1200)
+    assert stats["cancelled"] == 1
+    assert stats["routes"] == {"GET /recipes/": 3}
+    assert stats["last_parameters"] == ["<str:1>"]
+
+
+def test_record_evicts_cheapest_fingerprint(log, monkeypatch):
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_MAX_FINGERPRINTS", 2)
+    log.record("SELECT * FROM a", None, 0.5, False)
+    log.record("SELECT * FROM b", None, 0.1, False)
+
+    log.record("SELECT * FROM c", None, 0.3, False)
+
+    assert [stats["statement"] for stats in log.snapshot()] == [
+        "SELECT * FROM a", "SELECT * FROM c",
+    ]
+
+
+@pytest.mark.anyio
+async def test_cancelled_statement_recorded(engine, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    import alchemy.db_depends  # noqa: F401 - statement_timeout из session.info
+    from alchemy.db import async_session_maker
+    from alchemy.slow_queries import slow_query_log
+
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_THRESHOLD", 0.05)
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_EXPLAIN_RATE", 0)
+    slow_query_log.clear()
+
+    async with async_session_maker() as session:
+        session.info["statement_timeout"] = 0.1
+        with pytest.raises(DBAPIError):
+            await session.execute(text("SELECT pg_sleep(1)"))
+
+    [stats] = slow_query_log.snapshot()
+    assert stats["statement"] == "SELECT pg_sleep(?)"
+    assert stats["cancelled"] == 1
+    assert stats["max_ms"] >= 100
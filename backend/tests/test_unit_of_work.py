@@ -0,0 +1,68 @@
+"""
+Изменяющие запросы - один коммит на запрос и без перечитывания записанного:
+серверные значения приходят из RETURNING.
+"""
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_create_recipe(client, make_user, recipe_data, statements):
+    _, token = await make_user()
+
+    with statements() as recorded:
+        status, body = await client.request("POST", "/recipes/", token, recipe_data)
+
+    assert status == 201, body
+    assert body["author"]["recipes_count"] == 1
+    assert recorded.commits <= 1
+    assert recorded.reads_after_write() == []
+
+
+async def test_update_recipe(client, make_user, recipe_data, statements):
+    _, token = await make_user()
+    _, created = await client.request("POST", "/recipes/", token, recipe_data)
+
+    with statements() as recorded:
+        status, body = await client.request(
+            "PATCH", f"/recipes/{created['id']}/", token, {**recipe_data, "name": "Новое"}
+        )
+
+    assert status == 200, body
+    assert body["name"] == "Новое"
+    assert recorded.commits <= 1
+    assert recorded.reads_after_write() == []
+
+
+async def test_delete_recipe(client, make_user, recipe_data, statements):
+    _, token = await make_user()
+    _, created = await client.request("POST", "/recipes/", token, recipe_data)
+
+    with statements() as recorded:
+        status, body = await client.request("DELETE", f"/recipes/{created['id']}/", token)
+
+    assert status == 204, body
+    assert recorded.commits <= 1
+    assert recorded.reads_after_write() == []
+
+
+async def test_follow_unfollow(client, make_user, statements):
+    _, token = await make_user()
+    author, _ = await make_user()
+
+    with statements() as recorded:
+        status, body = await client.request("POST", f"/users/{author.id}/subscribe/", token)
+
+    assert status == 201, body
+    assert body["followers_count"] == 1
+    assert recorded.commits <= 1
+    assert recorded.reads_after_write() == []
+
+    with statements() as recorded:
+        status, body = await client.request("DELETE", f"/users/{author.id}/subscribe/", token)
+
+    assert status == 204, body
+    assert recorded.commits <= 1
+    assert recorded.reads_after_write() == []
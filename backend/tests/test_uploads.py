@@ -0,0 +1,139 @@
+"""
+Файлы изображений живут вместе с транзакцией запроса: загруженный файл удаляется
+при откате, прежний - после коммита замены или удаления.
+"""
+
+import os
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(32)
+
+
+def media_path(url: str) -> str:
+    from foodgram_fastapi.settings import MEDIA_ROOT, MEDIA_URL
+
+    return os.path.join(MEDIA_ROOT, url.removeprefix(MEDIA_URL))
+
+
+def media_files(subdir: str) -> set[str]:
+    from foodgram_fastapi.settings import MEDIA_ROOT
+
+    return {
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(os.path.join(MEDIA_ROOT, subdir))
+        for name in names
+    }
+
+
+async def test_upload_removed_on_rollback(client, make_user, recipe_data):
+    _, author_token = await make_user()
+    _, other_token = await make_user()
+    _, created = await client.request("POST", "/recipes/", author_token, recipe_data)
+    before = media_files("recipes")
+
+    status, _ = await client.request(
+        "PATCH", f"/recipes/{created['id']}/", other_token, recipe_data, files={"image": PNG}
+    )
+
+    assert status == 403
+    assert media_files("recipes") == before
+
+
+async def test_recipe_image_replaced_and_deleted(client, make_user, recipe_data):
+    _, token = await make_user()
+    status, created = await client.request(
+        "POST", "/recipes/", token, recipe_data, files={"image": PNG}
+    )
+    assert status == 201, created
+    assert os.path.exists(media_path(created["image"]))
+
+    status, updated = await client.request(
+        "PATCH", f"/recipes/{created['id']}/", token, recipe_data, files={"image": PNG}
+    )
+    assert status == 200, updated
+    assert not os.path.exists(media_path(created["image"]))
+    assert os.path.exists(media_path(updated["image"]))
+
+    status, _ = await client.request("DELETE", f"/recipes/{created['id']}/", token)
+    assert status == 204
+    assert not os.path.exists(media_path(updated["image"]))
+
+
+async def test_avatar_replaced_and_deleted(client, make_user):
+    _, token = await make_user()
+    status, first = await client.request("PUT", "/users/me/avatar/", token, files={"avatar": PNG})
+    assert status == 200, first
+
+    status, second = await client.request("PUT", "/users/me/avatar/", token, files={"avatar": PNG})
+    assert status == 200, second
+    assert not os.path.exists(media_path(first["avatar"]))
+    assert os.path.exists(media_path(second["avatar"]))
+
+    status, _ = await client.request("DELETE", "/users/me/avatar/", token)
+    assert status == 204
+    assert not os.path.exists(media_path(second["avatar"]))
+
+
+async def test_foreign_file_not_accepted(client, make_user, recipe_data):
+    _, author_token = await make_user()
+    _, other_token = await make_user()
+    _, created = await client.request(
+        "POST", "/recipes/", author_token, recipe_data, files={"image": PNG}
+    )
+
+    status, body = await client.request(
+        "PUT", "/users/me/avatar/", other_token, {"avatar": created["image"]}
+    )
+    assert status == 400, body
+
+    _, own = await client.request(
+        "POST", "/recipes/", other_token, recipe_data, files={"image": PNG}
+    )
+    status, body = await client.request(
+        "PATCH", f"/recipes/{own['id']}/", other_token, {**recipe_data, "image": created["image"]}
+    )
+    assert status == 400, body
+    assert os.path.exists(media_path(created["image"]))
+
+
+async def test_same_file_kept_on_update(client, make_user, recipe_data):
+    _, token = await make_user()
+    _, created = await client.request(
+        "POST", "/recipes/", token, recipe_data, files={"image": PNG}
+    )
+
+    status, updated = await client.request(
+        "PATCH", f"/recipes/{created['id']}/", token, {**recipe_data, "image": created["image"]}
+    )
+
+    assert status == 200, updated
+    assert updated["image"] == created["image"]
+    assert os.path.exists(media_path(created["image"]))
+
+
+async def test_foreign_file_not_removed(client, make_user, recipe_data):
+    """Чужой URL, уже записанный в поле (например, до проверки), при замене не удаляется."""
+    from sqlalchemy import update
+
+    from alchemy.db import async_session_maker
+    from models.user import User
+
+    _, author_token = await make_user()
+    other, other_token = await make_user()
+    _, created = await client.request(
+        "POST", "/recipes/", author_token, recipe_data, files={"image": PNG}
+    )
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.id == other.id).values(avatar=created["image"])
+        )
+        await session.commit()
+
+    status, _ = await client.request("DELETE", "/users/me/avatar/", other_token)
+
+    assert status == 204
+    assert os.path.exists(media_path(created["image"]))